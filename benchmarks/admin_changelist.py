@@ -0,0 +1,95 @@
+"""
+Temps de réponse de la liste des projets de l'admin sur une grosse table.
+
+Insère ``ROWS`` projets (répartis sur trois ans, 1000 propriétaires) dans une
+base SQLite sur disque, puis compare ``ProjectAdmin`` à un admin offrant les
+mêmes recherche et hiérarchie de dates avec les réglages par défaut de Django.
+Usage : python -m benchmarks.admin_changelist [lignes]
+"""
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.common import best_of, setup
+
+ROWS = 1_000_000
+OWNERS = 1000
+
+
+def populate(rows):
+    from django.contrib.auth.hashers import make_password
+    from django.db import connection, transaction
+
+    from project_manager.models import Project, User
+
+    password = make_password('x')
+    User.objects.bulk_create([
+        User(username=f'owner{i}', email=f'owner{i}@example.com', password=password) for i in range(OWNERS)
+    ])
+    owner_ids = list(User.objects.values_list('id', flat=True))
+    start = datetime(2023, 1, 1, tzinfo=timezone.utc)
+    step = timedelta(days=3 * 365) / rows
+    # Insertion SQL directe : bulk_create sur un million d'objets prendrait plusieurs minutes
+    sql = (
+        f'INSERT INTO {Project._meta.db_table} (title, description, created_at, updated_at, owner_id) '
+        'VALUES (%s, %s, %s, %s, %s)'
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        for offset in range(0, rows, 50_000):
+            batch = []
+            for i in range(offset, min(offset + 50_000, rows)):
+                created = start + step * i
+                batch.append((f'Projet {i:07d}', 'desc', created, created, owner_ids[i % len(owner_ids)]))
+            cursor.executemany(sql, batch)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else ROWS
+    with tempfile.TemporaryDirectory() as directory:
+        setup(directory)
+        from django.contrib import admin
+        from django.test import RequestFactory
+
+        from project_manager.admin import ProjectAdmin
+        from project_manager.models import Project, User
+
+        class NaiveAdmin(admin.ModelAdmin):
+            # Mêmes fonctionnalités, réglages par défaut de Django
+            list_display = ['id', 'title', 'owner', 'created_at', 'updated_at']
+            search_fields = ['id', 'title']
+            date_hierarchy = 'created_at'
+
+        populate(rows)
+        user = User.objects.create_superuser('root', 'root@example.com', 'x')
+        factory = RequestFactory()
+        cases = {
+            'liste': {},
+            'recherche titre': {'q': 'projet 00042'},
+            'recherche id': {'q': '123456'},
+            'année 2024': {'created_at__year': '2024'},
+            'mois 2024-06': {'created_at__year': '2024', 'created_at__month': '6'},
+        }
+
+        def changelist(model_admin, params):
+            # Vue appelée directement : les URL de l'admin restent liées à l'instance enregistrée
+            request = factory.get('/admin/project_manager/project/', params)
+            request.user = user
+            response = model_admin.changelist_view(request)
+            response.render()
+            assert response.status_code == 200, response.status_code
+
+        print(f"Liste des projets de l'admin — {rows} projets, SQLite sur disque (meilleure de 3 séries)")
+        print(f"{'':<16} {'NaiveAdmin':>12} {'ProjectAdmin':>13}")
+        admins = [NaiveAdmin(Project, admin.site), ProjectAdmin(Project, admin.site)]
+        for case, params in cases.items():
+            timings = []
+            for model_admin in admins:
+                changelist(model_admin, params)
+                timings.append(best_of(lambda: changelist(model_admin, params), 1, repeat=3))
+            print(f"{case:<16} " + " ".join(f"{t * 1000:9.1f} ms" for t in timings))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+Lecture de 100 projets par id : boucle de ``GET /api/projects/<id>/``
+contre un seul ``POST /api/projects/batch-get/``, client authentifié (JWT).
+Usage : python -m benchmarks.batch_get
+"""
+from benchmarks.common import best_of, setup
+
+IDS = 100
+
+
+def main():
+    setup()
+    from rest_framework.test import APIClient
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from project_manager.models import Project, User
+
+    owner = User.objects.create_user(username='bench', email='bench@example.com', password='pass1234')
+    Project.objects.bulk_create([Project(title=f'Projet {i}', description='x' * 100, owner=owner) for i in range(1000)])
+    ids = list(Project.objects.order_by('?').values_list('id', flat=True)[:IDS])
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(owner)}')
+
+    def one_by_one():
+        for pk in ids:
+            assert client.get(f'/api/projects/{pk}/').status_code == 200
+
+    def batch():
+        response = client.post('/api/projects/batch-get/', {'ids': ids}, format='json')
+        assert response.status_code == 200 and not response.data['missing']
+
+    print(f"Lecture de {IDS} projets par id (meilleure de 5 séries)")
+    for label, func, number in [('GET par id', one_by_one, 3), ('batch-get', batch, 20)]:
+        elapsed = best_of(func, number)
+        print(f"  {label:<12} {elapsed * 1000:8.2f} ms  {IDS / elapsed:10.0f} projets/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""
+Outils communs aux benchmarks.
+
+Chaque benchmark se lance depuis la racine du dépôt (``python -m benchmarks.<nom>``)
+et travaille sur une base de test jetable : ``db.sqlite3`` n'est jamais modifiée.
+"""
+import os
+import time
+
+
+def setup(directory=None):
+    """
+    Crée les bases de test ; en mémoire, ou dans ``directory`` pour mesurer
+    de vraies écritures disque.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'exam.settings')
+    import django
+    django.setup()
+
+    from django.db import connections
+    from django.test.utils import override_settings, setup_test_environment
+    setup_test_environment()
+    # Un seul processus : cache en mémoire, dont les accès ne comptent pas comme requêtes SQL
+    override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}).enable()
+    for alias in connections:
+        if directory is not None:
+            connections[alias].settings_dict['TEST']['NAME'] = os.path.join(directory, f'{alias}.sqlite3')
+        connections[alias].creation.create_test_db(verbosity=0, autoclobber=True)
+
+
+def best_of(func, number, repeat=5):
+    """
+    Durée moyenne d'un appel (en secondes), meilleure de ``repeat`` séries de ``number`` appels.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+    return min(timings)
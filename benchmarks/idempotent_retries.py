@@ -0,0 +1,50 @@
+"""
+Coût d'un POST rejoué avec la même ``Idempotency-Key`` : traitement complet
+(première requête) contre réponse rejouée depuis le cache.
+Usage : python -m benchmarks.idempotent_retries
+"""
+import itertools
+
+from benchmarks.common import best_of, setup
+
+NUMBER = 50
+
+
+def main():
+    setup()
+    from django.core.cache import cache
+    from rest_framework.test import APIClient
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from project_manager.models import User
+
+    owner = User.objects.create_user(username='bench', email='bench@example.com', password='pass1234')
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(owner)}')
+    counter = itertools.count()
+
+    def register(key=None):
+        i = next(counter) if key is None else key
+        data = {'username': f'user{i}', 'email': f'user{i}@example.com', 'password': 'strongpassword123'}
+        headers = {'HTTP_IDEMPOTENCY_KEY': key or f'register-{i}'}
+        response = APIClient().post('/api/users/register/', data, format='json', **headers)
+        assert response.status_code == 201, response.content
+
+    def create_project(key=None):
+        i = next(counter) if key is None else key
+        headers = {'HTTP_IDEMPOTENCY_KEY': key or f'project-{i}'}
+        response = client.post('/api/projects/', {'title': f'Projet {i}', 'description': 'x'}, format='json', **headers)
+        assert response.status_code == 201, response.content
+
+    print(f"Durée d'un POST (meilleure de 5 séries de {NUMBER})")
+    print(f"{'':<28} {'traité':>10} {'rejoué':>10}")
+    for label, post in [('POST /api/users/register/', register), ('POST /api/projects/', create_project)]:
+        cache.clear()
+        post('rejeu')
+        fresh = best_of(post, NUMBER)
+        replayed = best_of(lambda: post('rejeu'), NUMBER)
+        print(f"{label:<28} {fresh * 1000:7.2f} ms {replayed * 1000:7.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Page de 50 projets avec les propriétaires : ``GET /api/projects/`` puis un
+appel par propriétaire (``GET /api/users/<username>/``, coût d'un
+aller-retour), contre un seul ``GET /api/projects/?include=owner``.
+Usage : python -m benchmarks.include_owner
+"""
+from benchmarks.common import best_of, setup
+
+PAGE_SIZE = 50
+OWNERS = 25
+
+
+def main():
+    setup()
+    from rest_framework.test import APIClient
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from project_manager.models import Project, User
+
+    owners = [
+        User.objects.create_user(username=f'owner{i}', email=f'owner{i}@example.com', password='pass1234')
+        for i in range(OWNERS)
+    ]
+    Project.objects.bulk_create(
+        [Project(title=f'Projet {i}', description='x' * 100, owner=owners[i % OWNERS]) for i in range(1000)]
+    )
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(owners[0])}')
+    usernames = {owner.pk: owner.username for owner in owners}
+
+    def one_plus_n():
+        response = client.get('/api/projects/', {'page_size': PAGE_SIZE})
+        for owner_id in {project['owner'] for project in response.data['results']}:
+            assert client.get(f'/api/users/{usernames[owner_id]}/').status_code == 200
+
+    def compound():
+        response = client.get('/api/projects/', {'page_size': PAGE_SIZE, 'include': 'owner'})
+        assert len(response.data['included']['owners']) == OWNERS
+
+    print(f"Page de {PAGE_SIZE} projets, {OWNERS} propriétaires distincts (meilleure de 5 séries)")
+    for label, func, calls in [('1 + N appels', one_plus_n, 1 + OWNERS), ('?include=owner', compound, 1)]:
+        print(f"  {label:<16} {calls:>3} appel(s) {best_of(func, 20) * 1000:8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
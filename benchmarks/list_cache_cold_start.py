@@ -0,0 +1,109 @@
+"""
+Démarrage à froid de la liste des projets : ``THREADS`` clients demandent
+en même temps les premières pages de ``GET /api/projects/`` (formes de
+``LIST_CACHE_WARM_QUERIES``), cache vide. Compte les requêtes SQL avec et
+sans cache, sans puis avec verrou de recalcul, et après ``warm_cache``.
+Usage : python -m benchmarks.list_cache_cold_start
+"""
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+
+from benchmarks.common import setup
+
+PROJECTS = 50_000
+THREADS = 16
+REQUESTS = 9  # Par client : chaque page préchauffée, dans le même ordre pour tous
+
+
+def burst(paths):
+    from django.db import connection
+    from django.test import Client
+
+    queries, lock = [0], threading.Lock()
+    barrier = threading.Barrier(THREADS)
+
+    def count(execute, sql, params, many, context):
+        with lock:
+            queries[0] += 1
+        return execute(sql, params, many, context)
+
+    def client_thread():
+        client = Client()
+        barrier.wait()
+        with connection.execute_wrapper(count):
+            for i in range(REQUESTS):
+                response = client.get(paths[i % len(paths)])
+                assert response.status_code == 200, response.status_code
+        connection.close()
+
+    threads = [threading.Thread(target=client_thread) for _ in range(THREADS)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return queries[0], time.perf_counter() - started
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        setup(directory)
+        from django.conf import settings
+        from django.core.cache import cache, caches
+        from django.test import override_settings
+
+        from project_manager import list_cache
+        from project_manager.models import Project, User
+
+        owner = User.objects.create_user(username='bench', email='bench@example.com', password='pass1234')
+        Project.objects.bulk_create(
+            [Project(title=f'Projet {i:06d}', description='x' * 100, owner=owner) for i in range(PROJECTS)],
+            batch_size=1000,
+        )
+        paths = [
+            f"/api/projects/?{query}{'&' if query else ''}page={page}"
+            for query in settings.LIST_CACHE_WARM_QUERIES
+            for page in range(1, settings.LIST_CACHE_MAX_PAGE + 1)
+        ]
+
+        def cold():
+            cache.clear()
+            return burst(paths)
+
+        def warmed():
+            cache.clear()
+            list_cache.warm()
+            return burst(paths)
+
+        # Une instance du backend par thread : le verrou est neutralisé sur la classe
+        backend = type(caches['default'])
+        add = backend.add
+
+        def add_without_lock(self, key, *args, **kwargs):
+            # Verrou de recalcul toujours obtenu : chaque requête sans page fraîche recalcule
+            return True if key.endswith(':lock') else add(self, key, *args, **kwargs)
+
+        modes = [
+            ('sans cache', lambda: override_settings(LIST_CACHE_ENABLED=False)),
+            ('cache sans verrou', lambda: patch.object(backend, 'add', add_without_lock)),
+            ('cache + verrou', None),
+        ]
+        total = THREADS * REQUESTS
+        print(f"{THREADS} clients × {REQUESTS} GET sur {len(paths)} pages, {PROJECTS} projets, cache vide")
+        print(f"{'':<20} {'requêtes SQL':>13} {'durée':>10}")
+        for label, context in modes:
+            if context is None:
+                queries, elapsed = cold()
+            else:
+                with context():
+                    queries, elapsed = cold()
+            print(f"{label:<20} {queries:>13} {elapsed * 1000:7.0f} ms")
+        queries, elapsed = warmed()
+        print(f"{'après warm_cache':<20} {queries:>13} {elapsed * 1000:7.0f} ms")
+        print(f"({total} requêtes HTTP)")
+
+
+if __name__ == '__main__':
+    main()
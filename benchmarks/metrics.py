@@ -0,0 +1,56 @@
+"""
+Coût des métriques : surcoût par requête de ``MetricsMiddleware`` (vue quasi
+gratuite, puis détail d'un projet), et durée d'un ``GET /metrics`` avec
+``WORKERS`` instantanés de workers dans ``METRICS_DIR``.
+Usage : python -m benchmarks.metrics
+"""
+import tempfile
+
+from benchmarks.common import best_of, setup
+
+WORKERS = 8
+
+
+def main(number=2000):
+    setup()
+    from django.conf import settings
+    from django.test import Client, override_settings
+
+    from project_manager import metrics
+    from project_manager.models import Project, User
+
+    owner = User.objects.create_user(username='bench', email='bench@example.com', password='pass1234')
+    project = Project.objects.create(title='Projet mesuré', owner=owner)
+    without = [name for name in settings.MIDDLEWARE if name != 'project_manager.metrics.MetricsMiddleware']
+    paths = ['/api/projects/autocomplete/', f'/api/projects/{project.pk}/']
+
+    print(f"Surcoût par requête ({number} requêtes, meilleure de 5 séries)")
+    for path in paths:
+        timings = []
+        for middleware in (without, settings.MIDDLEWARE):
+            with override_settings(MIDDLEWARE=middleware):
+                client = Client()
+                client.get(path)
+                timings.append(best_of(lambda: client.get(path), number))
+        print(f"  GET {path:<28} {timings[0] * 1e6:7.1f} → {timings[1] * 1e6:7.1f} µs"
+              f"  (+{(timings[1] - timings[0]) * 1e6:.1f} µs)")
+
+    with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+        client = Client()
+        for _ in range(100):
+            for path in paths:
+                client.get(path)
+        metrics.flush(force=True)
+        # Les autres workers : copies de l'instantané de celui-ci, sous d'autres pid
+        with open(f'{directory}/metrics-{metrics.snapshot()["pid"]}.json') as file:
+            payload = file.read()
+        for pid in range(1, WORKERS):
+            with open(f'{directory}/metrics-{10 ** 8 + pid}.json', 'w') as file:
+                file.write(payload.replace(f'"pid": {metrics.snapshot()["pid"]}', f'"pid": {10 ** 8 + pid}', 1))
+        lines = len(client.get('/metrics').content.splitlines())
+        elapsed = best_of(lambda: client.get('/metrics'), 100)
+        print(f"GET /metrics, {WORKERS} workers, {lines} lignes : {elapsed * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Surcoût par requête de la pile de middlewares pour les routes /api/.
+
+Compare la pile Django standard à la pile allégée de ``exam.middleware`` sur
+une vue quasi gratuite (autocomplétion sans ``q``), pour isoler le coût des
+middlewares. Usage : python -m benchmarks.middleware
+"""
+from benchmarks.common import best_of, setup
+
+STOCK_MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'project_manager.query_budget.QueryBudgetMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+
+def measure(middleware, path, number):
+    from django.test import Client, override_settings
+
+    with override_settings(MIDDLEWARE=middleware):
+        client = Client()
+        client.get(path)  # Chargement de la pile et des imports
+        return best_of(lambda: client.get(path), number)
+
+
+def main(number=2000):
+    setup()
+    from django.conf import settings
+
+    path = '/api/projects/autocomplete/'
+    stock = measure(STOCK_MIDDLEWARE, path, number)
+    lean = measure(settings.MIDDLEWARE, path, number)
+    print(f"GET {path} ({number} requêtes, meilleure de 5 séries)")
+    print(f"  pile standard : {stock * 1e6:8.1f} µs/requête")
+    print(f"  pile allégée  : {lean * 1e6:8.1f} µs/requête")
+    print(f"  gain          : {(stock - lean) * 1e6:8.1f} µs/requête ({(1 - lean / stock) * 100:.0f} %)")
+
+
+if __name__ == '__main__':
+    main()
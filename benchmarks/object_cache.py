@@ -0,0 +1,64 @@
+"""
+Lectures par objet : ``GET /api/projects/<id>/``, ``POST
+/api/projects/batch-get/`` et ``GET /api/users/<username>/``, sans cache,
+avec le cache partagé puis avec le cache L1 du worker en plus.
+Usage : python -m benchmarks.object_cache
+"""
+from benchmarks.common import best_of, setup
+
+IDS = 100
+
+
+def main():
+    setup()
+    from django.core.cache import cache
+    from django.test import override_settings
+    from rest_framework.test import APIClient
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from project_manager.models import Project, User
+    from project_manager.object_cache import project_cache, user_cache
+
+    owner = User.objects.create_user(username='bench', email='bench@example.com', password='pass1234')
+    Project.objects.bulk_create([Project(title=f'Projet {i}', description='x' * 100, owner=owner) for i in range(1000)])
+    ids = list(Project.objects.order_by('?').values_list('id', flat=True)[:IDS])
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(owner)}')
+
+    def details():
+        for pk in ids:
+            assert client.get(f'/api/projects/{pk}/').status_code == 200
+
+    def batch():
+        response = client.post('/api/projects/batch-get/', {'ids': ids}, format='json')
+        assert response.status_code == 200 and not response.data['missing']
+
+    def profile():
+        assert client.get('/api/users/bench/').status_code == 200
+
+    modes = [
+        ('sans cache', {'OBJECT_CACHE_ENABLED': False}),
+        ('cache partagé', {'OBJECT_CACHE_ENABLED': True}),
+        ('+ L1 du worker', {'OBJECT_CACHE_ENABLED': True, 'OBJECT_CACHE_L1_MAX_ENTRIES': 1000}),
+    ]
+    cases = [
+        (f'{IDS} × GET projet', details, 3),
+        (f'batch-get de {IDS}', batch, 20),
+        ('GET profil', profile, 200),
+    ]
+    print("Durée moyenne d'un appel (meilleure de 5 séries)")
+    print(f"{'':<18}" + ''.join(f"{label:>16}" for label, _ in modes))
+    for case, func, number in cases:
+        timings = []
+        for _, options in modes:
+            cache.clear()
+            project_cache.local.clear()
+            user_cache.local.clear()
+            with override_settings(**options):
+                func()  # Remplit le cache
+                timings.append(best_of(func, number))
+        print(f"{case:<18}" + ''.join(f"{elapsed * 1000:13.2f} ms" for elapsed in timings))
+
+
+if __name__ == '__main__':
+    main()
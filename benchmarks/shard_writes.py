@@ -0,0 +1,85 @@
+"""
+Débit d'écriture des projets selon le nombre de shards.
+
+Des threads créent des projets en parallèle (``Project.objects.create``, avec
+les signaux comme dans l'API) pour 64 propriétaires répartis sur les shards.
+Les bases sont de vrais fichiers SQLite dans un dossier temporaire.
+
+SQLite n'accepte qu'un écrivain à la fois par fichier : chaque création est
+faite dans une transaction qui garde le verrou d'écriture ``hold`` ms (travail
+fait pendant la transaction, comme une vue avec ``ATOMIC_REQUESTS``). Avec
+``hold = 0``, la mesure est limitée par le CPU (GIL), pas par le verrou. Usage :
+
+    PROJECT_SHARD_COUNT=4 python -m benchmarks.shard_writes
+"""
+import os
+import tempfile
+import threading
+import time
+
+from benchmarks.common import setup
+
+THREADS = 8
+PROJECTS_PER_THREAD = 100
+HOLDS = [0, 0.005]  # Secondes passées dans la transaction, verrou tenu
+
+
+def run(owners, shard_count, hold, label):
+    from django.db import connections, transaction
+    from django.test import override_settings
+
+    from project_manager.models import Project
+    from project_manager.sharding import shard_for_owner
+
+    def writer(thread):
+        try:
+            for i in range(PROJECTS_PER_THREAD):
+                owner = owners[(thread + i * THREADS) % len(owners)]
+                with transaction.atomic(using=shard_for_owner(owner.pk)):
+                    Project.objects.create(title=f'Projet {label}-{thread}-{i}', description='desc', owner=owner)
+                    time.sleep(hold)
+        finally:
+            connections.close_all()
+
+    with override_settings(PROJECT_SHARD_COUNT=shard_count):
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(THREADS)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    return THREADS * PROJECTS_PER_THREAD / elapsed
+
+
+def main():
+    max_shards = int(os.environ.get('PROJECT_SHARD_COUNT', 1))
+    if max_shards < 2:
+        raise SystemExit("Lancer avec PROJECT_SHARD_COUNT=2 (ou plus) pour déclarer les bases des shards.")
+    with tempfile.TemporaryDirectory() as directory:
+        setup(directory)
+        from django.db import connections
+
+        from project_manager.models import User
+
+        for alias in connections:
+            # Sur un seul fichier, un écrivain peut attendre le verrou plus que les 5 s par défaut
+            connections[alias].settings_dict['OPTIONS']['timeout'] = 60
+
+        owners = [
+            User.objects.create_user(username=f'bench{i}', email=f'bench{i}@example.com', password='x')
+            for i in range(64)
+        ]
+        counts = [n for n in (1, 2, 4, 8) if n <= max_shards]
+        print(f"{THREADS} threads × {PROJECTS_PER_THREAD} projets, SQLite sur disque, {os.cpu_count()} CPU")
+        for hold in HOLDS:
+            print(f"verrou tenu {hold * 1000:.0f} ms par écriture :")
+            base = None
+            for n in counts:
+                rate = run(owners, n, hold, f'{hold}-{n}')
+                base = base or rate
+                print(f"  {n} shard(s) : {rate:8.0f} projets/s (x{rate / base:.1f})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Pic mémoire d'une grande page de ``GET /api/projects/`` : réponse classique
+(résultats et corps JSON construits en mémoire) contre réponse streamée
+(``?stream=1``), sous WSGI et sous ASGI. Usage : python -m benchmarks.streaming_memory
+"""
+import gc
+import tracemalloc
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+
+from benchmarks.common import setup
+
+PAGE_SIZES = [1000, 5000, 20000]
+
+
+def peak(client, path, params):
+    gc.collect()
+    tracemalloc.start()
+    response = client.get(path, params)
+    if response.streaming:
+        size = sum(len(chunk) for chunk in response.streaming_content)
+    else:
+        size = len(response.content)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak_bytes, size
+
+
+def peak_asgi(client, path, params):
+    async def fetch():
+        response = await client.get(path, params)
+        size = 0
+        async for chunk in response.streaming_content:
+            size += len(chunk)
+        return size
+
+    gc.collect()
+    tracemalloc.start()
+    size = async_to_sync(fetch)()
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak_bytes, size
+
+
+def main():
+    setup()
+    from django.test import AsyncClient
+    from rest_framework.test import APIClient
+
+    from project_manager.models import Project, User
+    from project_manager.pagination import CustomPagination
+
+    owner = User.objects.create_user(username='bench', email='bench@example.com', password='pass123')
+    Project.objects.bulk_create(
+        [Project(title=f'Projet {i}', description='x' * 200, owner=owner) for i in range(max(PAGE_SIZES))],
+        batch_size=1000,
+    )
+    client, async_client = APIClient(), AsyncClient()
+    path = '/api/projects/'
+    client.get(path, {'stream': 1, 'ordering': 'id'})  # Chargement des imports
+    peak_asgi(async_client, path, {'stream': 1, 'ordering': 'id'})
+
+    print(f"GET {path} : pic mémoire (tracemalloc) par taille de page")
+    print(f"{'page_size':>10} {'classique':>12} {'streamée':>12} {'ASGI':>12} {'corps':>10}")
+    # La limite de 50 est levée pour mesurer le coût de la réponse classique
+    with patch.object(CustomPagination, 'max_page_size', max(PAGE_SIZES)):
+        for page_size in PAGE_SIZES:
+            params = {'page_size': page_size, 'ordering': 'id'}
+            buffered, size = peak(client, path, params)
+            streamed, _ = peak(client, path, {**params, 'stream': 1})
+            asgi, _ = peak_asgi(async_client, path, {**params, 'stream': 1})
+            print(
+                f"{page_size:>10} {buffered / 2**20:>9.1f} Mo {streamed / 2**20:>9.1f} Mo "
+                f"{asgi / 2**20:>9.1f} Mo {size / 2**20:>7.1f} Mo"
+            )
+
+
+if __name__ == '__main__':
+    main()
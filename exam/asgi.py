@@ -9,8 +9,14 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'exam.settings')
 
 application = get_asgi_application()
+
+# Préchauffage du cache de la liste des projets, en arrière-plan
+if settings.LIST_CACHE_WARM_ON_STARTUP:
+    from project_manager.list_cache import warm_in_background
+    warm_in_background()
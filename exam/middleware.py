@@ -0,0 +1,49 @@
+"""
+Middlewares Django court-circuités pour les routes de l'API.
+
+L'API s'authentifie uniquement par JWT : sessions, CSRF, messages et
+protection anti-clickjacking ne servent qu'à l'admin et aux pages HTML.
+Ces sous-classes laissent passer directement les requêtes dont le chemin
+commence par ``API_PATH_PREFIX`` ; les autres traversent la pile complète.
+"""
+from django.conf import settings
+from django.contrib.auth import middleware as auth
+from django.contrib.messages import middleware as messages
+from django.contrib.sessions import middleware as sessions
+from django.middleware import clickjacking, csrf
+
+
+def is_api_request(request):
+    return request.path_info.startswith(settings.API_PATH_PREFIX)
+
+
+class SkipForAPIMixin:
+    def __call__(self, request):
+        if is_api_request(request):
+            # En mode async, get_response renvoie une coroutine que le handler attend
+            return self.get_response(request)
+        return super().__call__(request)
+
+
+class SessionMiddleware(SkipForAPIMixin, sessions.SessionMiddleware):
+    pass
+
+
+class CsrfViewMiddleware(SkipForAPIMixin, csrf.CsrfViewMiddleware):
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        # process_view est appelé par le handler, en dehors de __call__
+        if is_api_request(request):
+            return None
+        return super().process_view(request, callback, callback_args, callback_kwargs)
+
+
+class AuthenticationMiddleware(SkipForAPIMixin, auth.AuthenticationMiddleware):
+    pass
+
+
+class MessageMiddleware(SkipForAPIMixin, messages.MessageMiddleware):
+    pass
+
+
+class XFrameOptionsMiddleware(SkipForAPIMixin, clickjacking.XFrameOptionsMiddleware):
+    pass
@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -25,6 +27,8 @@ SECRET_KEY = 'django-insecure-+=(ko1rylc)+t%xo9+i12^=)h4aj+@9*po@6ca_y0bgm)=bnh4
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
+TESTING = sys.argv[1:2] == ['test']
+
 ALLOWED_HOSTS = ['0.0.0.0', '127.0.0.1', 'localhost']
 
 
@@ -44,16 +48,21 @@ INSTALLED_APPS = [
     'drf_spectacular_sidecar'
 ]
 
+# Sessions, CSRF, messages et clickjacking sont ignorés pour API_PATH_PREFIX (JWT uniquement)
 MIDDLEWARE = [
+    'project_manager.metrics.MetricsMiddleware',  # En premier : mesure toute la pile
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'project_manager.query_budget.QueryBudgetMiddleware',
+    'exam.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'exam.middleware.CsrfViewMiddleware',
+    'exam.middleware.AuthenticationMiddleware',
+    'exam.middleware.MessageMiddleware',
+    'exam.middleware.XFrameOptionsMiddleware',
 ]
 
+API_PATH_PREFIX = '/api/'
+
 ROOT_URLCONF = 'exam.urls'
 
 TEMPLATES = [
@@ -72,6 +81,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'exam.wsgi.application'
+ASGI_APPLICATION = 'exam.asgi.application'
 
 
 # Database
@@ -84,6 +94,19 @@ DATABASES = {
     }
 }
 
+# Projets répartis sur PROJECT_SHARD_COUNT bases (voir project_manager/sharding.py) :
+# shard 0 = 'default', shard n = 'shard_<n>'. En test, 'shard_1' existe toujours
+# pour que les tests du sharding puissent passer à 2 shards.
+PROJECT_SHARD_COUNT = int(os.environ.get('PROJECT_SHARD_COUNT', 1))
+for _index in range(1, max(PROJECT_SHARD_COUNT, 2 if TESTING else 1)):
+    DATABASES[f'shard_{_index}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'db_shard_{_index}.sqlite3',
+    }
+DATABASE_ROUTERS = ['project_manager.sharding.ShardRouter']
+# Une réservation de titre dont la transaction n'a pas abouti est reprise après ce délai
+PROJECT_TITLE_RESERVATION_TIMEOUT = 60
+
 AUTH_USER_MODEL = 'project_manager.User'
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -124,6 +147,21 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Cache (réponses idempotentes, liste et objets), partagé par tous les processus
+# (workers web, run_worker, warm_cache) : table en base, créée par
+# ``manage.py createcachetable``. En production, préférer Redis ou Memcached avec
+# une éviction LRU (maxmemory-policy allkeys-lru pour Redis).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_cache',
+        'OPTIONS': {'MAX_ENTRIES': 50000},  # Au-delà, une partie des entrées est évincée
+    }
+}
+if TESTING:
+    # Tests dans un seul processus : cache en mémoire, sans requêtes SQL supplémentaires
+    CACHES['default'] = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'OPTIONS': {'MAX_ENTRIES': 50000}}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -134,11 +172,79 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 5 ,# Nombre de projets par page
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'project_manager.authentication.RevocableJWTAuthentication',
     ),
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
-}
\ No newline at end of file
+}
+
+# Flux de synchronisation : les écritures plus récentes que ce délai attendent le prochain appel
+SYNC_LAG_SECONDS = 5
+
+# Flux SSE des projets (/api/projects/events/, servi en ASGI)
+PROJECT_EVENTS_QUEUE_SIZE = 100  # Événements en attente max par connexion avant resynchro
+PROJECT_EVENTS_HEARTBEAT_SECONDS = 15  # Commentaire keepalive pour les connexions inactives
+PROJECT_EVENTS_MAX_SUBSCRIBERS = 10000  # Connexions simultanées max par worker
+
+# Purge en arrière-plan des projets d'un compte supprimé
+PROJECT_PURGE_BATCH_SIZE = 500  # Projets supprimés par transaction
+PROJECT_PURGE_PAUSE_SECONDS = 0.05  # Pause entre deux lots pour laisser passer les autres écritures
+
+# File de jobs en base (python manage.py run_worker)
+JOB_WORKER_CONCURRENCY = 4
+JOB_MAX_ATTEMPTS = 3
+JOB_TIMEOUT_SECONDS = 300
+JOB_RETRY_BACKOFF_SECONDS = 5  # Doublé à chaque nouvel essai
+JOB_RETRY_BACKOFF_MAX_SECONDS = 3600
+JOB_LEASE_GRACE_SECONDS = 60  # Marge avant qu'un job d'un worker arrêté soit repris
+
+# Autocomplétion des titres (/api/projects/autocomplete/)
+AUTOCOMPLETE_MAX_ENTRIES = 100000  # Au-delà, l'index est tronqué et la base prend le relais
+AUTOCOMPLETE_REFRESH_SECONDS = 5  # Délai max avant de voir les écritures des autres workers
+
+# Budget de requêtes SQL par vue (attribut query_budget des vues)
+QUERY_BUDGET_ENFORCE = TESTING  # En test, un dépassement fait échouer la requête
+QUERY_BUDGET_SAMPLE_RATE = 0.01  # En production, proportion de requêtes contrôlées (dépassements journalisés)
+
+SIMPLE_JWT = {
+    'TOKEN_REFRESH_SERIALIZER': 'project_manager.serializers.RevocableTokenRefreshSerializer',
+}
+
+# Révocation des JWT (filtre de Bloom par worker, voir project_manager/revocation.py)
+REVOCATION_BLOOM_CAPACITY = 100000  # Jetons révoqués attendus avant agrandissement du filtre
+REVOCATION_BLOOM_ERROR_RATE = 0.001  # Taux de faux positifs (vérifiés en base)
+REVOCATION_REFRESH_SECONDS = 2  # Délai max avant de voir une révocation faite par un autre worker
+REVOCATION_REBUILD_SECONDS = 3600  # Reconstruction du filtre et purge des révocations expirées
+
+# Clés d'idempotence des POST (en-tête Idempotency-Key, voir project_manager/idempotency.py)
+IDEMPOTENCY_TTL_SECONDS = 24 * 3600  # Durée de conservation de la première réponse
+IDEMPOTENCY_LOCK_SECONDS = 30  # Expiration du verrou si le worker meurt pendant le traitement
+IDEMPOTENCY_WAIT_SECONDS = 10  # Attente max d'un doublon pendant le traitement de l'original (puis 409)
+
+# Cache des premières pages de GET /api/projects/ (voir project_manager/list_cache.py)
+LIST_CACHE_ENABLED = not TESTING
+LIST_CACHE_MAX_PAGE = 3  # Pages 1 à 3 de chaque forme de requête
+LIST_CACHE_TTL_SECONDS = 30  # Durée de fraîcheur d'une page
+LIST_CACHE_STALE_SECONDS = 300  # Une page périmée reste servie pendant son recalcul jusqu'à ce délai
+LIST_CACHE_LOCK_SECONDS = 30  # Expiration du verrou de recalcul si le worker meurt
+LIST_CACHE_WAIT_SECONDS = 5  # Attente max d'une page absente en cours de calcul (puis calcul direct)
+LIST_CACHE_WARM_QUERIES = ['', 'ordering=-created_at', 'ordering=title']  # Formes préchauffées
+LIST_CACHE_WARM_ON_STARTUP = LIST_CACHE_ENABLED  # Préchauffage en arrière-plan au démarrage des workers
+
+# POST /api/projects/batch-get/
+PROJECT_BATCH_GET_MAX_IDS = 100  # Id max par appel
+
+# Cache des projets et profils sérialisés, par objet (voir project_manager/object_cache.py)
+OBJECT_CACHE_ENABLED = not TESTING
+OBJECT_CACHE_TTL_SECONDS = 3600  # Durée de vie max d'une entrée (invalidée dès l'écriture)
+OBJECT_CACHE_L1_MAX_ENTRIES = 0  # Cache L1 propre au worker (LRU) ; 0 : désactivé
+OBJECT_CACHE_L1_TTL_SECONDS = 1  # Retard max d'un worker sur les écritures faites par un autre
+
+# Métriques Prometheus (GET /metrics, voir project_manager/metrics.py)
+METRICS_DIR = os.environ.get('METRICS_DIR')  # Dossier partagé par les workers ; vide : métriques du seul worker qui répond
+METRICS_FLUSH_SECONDS = 5  # Retard max des métriques d'un worker dans /metrics servi par un autre
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']  # Adresses servies sans jeton (derrière un proxy : celle du proxy)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # Sinon : en-tête Authorization: Bearer <jeton>
@@ -9,8 +9,14 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'exam.settings')
 
 application = get_wsgi_application()
+
+# Préchauffage du cache de la liste des projets, en arrière-plan
+if settings.LIST_CACHE_WARM_ON_STARTUP:
+    from project_manager.list_cache import warm_in_background
+    warm_in_background()
@@ -1,6 +1,142 @@
+from datetime import timedelta
+
 from django.contrib import admin
+from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.paginator import Paginator
+from django.db.models import F, Max, Min, Q
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .models import LAST_CHAR, User, Project, ProjectQuerySet, AccountPurge, Job
+
+
+class CappedCountPaginator(Paginator):
+    """
+    Compte au plus ``max_count`` lignes : sur une grande table, le
+    ``COUNT(*)`` complet coûte plus cher que la page elle-même.
+    Au-delà, la liste annonce ``max_count`` résultats.
+    """
+    max_count = 10000
+
+    @cached_property
+    def count(self):
+        return self.object_list[:self.max_count].count()
+
+
+def _next_period(start, kind):
+    if kind == 'year':
+        return start.replace(year=start.year + 1)
+    if kind == 'month':
+        return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    return start + timedelta(days=1)
+
+
+def _is_field_bound(aggregate):
+    return (
+        isinstance(aggregate, (Min, Max)) and aggregate.filter is None
+        and len(aggregate.source_expressions) == 1 and isinstance(aggregate.source_expressions[0], F)
+    )
+
+
+class DateProbeQuerySet(ProjectQuerySet):
+    """
+    ``aggregate()`` et ``datetimes()`` servent la hiérarchie de dates de
+    l'admin. L'implémentation standard de ``datetimes()`` tronque la date de
+    chaque ligne (fonction Python sous SQLite). Ici, on saute de période en
+    période : une requête « première date après la fin de la période
+    courante » par année / mois / jour non vide, servie par l'index
+    ``project_created_idx``.
+    """
+
+    def aggregate(self, *args, **kwargs):
+        # SQLite ne lit le MIN ou le MAX dans l'index que s'il est seul dans la requête
+        if args or not kwargs or not all(_is_field_bound(aggregate) for aggregate in kwargs.values()):
+            return super().aggregate(*args, **kwargs)
+        bounds = {}
+        for key, aggregate in kwargs.items():
+            name = aggregate.source_expressions[0].name
+            ordering = name if isinstance(aggregate, Min) else f'-{name}'
+            queryset = self.filter(**{f'{name}__isnull': False}).order_by(ordering)
+            bounds[key] = queryset.values_list(name, flat=True).first()
+        return bounds
+
+    def datetimes(self, field_name, kind, order='ASC', tzinfo=None):
+        if kind not in ('year', 'month', 'day'):
+            return super().datetimes(field_name, kind, order, tzinfo)
+        tz = tzinfo or timezone.get_current_timezone()
+        periods = []
+        current = self.order_by(field_name).values_list(field_name, flat=True).first()
+        while current is not None:
+            start = timezone.localtime(current, tz).replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+            if kind != 'day':
+                start = start.replace(day=1)
+            if kind == 'year':
+                start = start.replace(month=1)
+            periods.append(timezone.make_aware(start, tz))
+            after = {f'{field_name}__gte': timezone.make_aware(_next_period(start, kind), tz)}
+            # La borne de la période en premier : SQLite n'utilise qu'une borne
+            # inférieure par colonne pour parcourir l'index, la première rencontrée
+            probe = self.model._default_manager.using(self._db).filter(**after) & self
+            current = probe.order_by(field_name).values_list(field_name, flat=True).first()
+        return periods[::-1] if order == 'DESC' else periods
+
+
+@admin.register(User)
+class UserAdmin(BaseUserAdmin):
+    list_display = ['username', 'email', 'is_staff', 'is_active', 'deleted_at']
+    list_filter = ['is_staff', 'is_superuser', 'is_active']
+    # Recherche par début du nom d'utilisateur ou de l'email (sensible à la casse), via les index uniques
+    search_fields = ['username', 'email']
+    show_full_result_count = False
+    paginator = CappedCountPaginator
+    fieldsets = BaseUserAdmin.fieldsets + (("Suppression", {'fields': ['deleted_at']}),)
+    add_fieldsets = (
+        (None, {'classes': ['wide'], 'fields': ['username', 'email', 'password1', 'password2']}),
+    )
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        prefix = {'__gte': term, '__lt': term + LAST_CHAR}
+        query = Q(**{f'username{k}': v for k, v in prefix.items()}) | Q(**{f'email{k}': v for k, v in prefix.items()})
+        if term.isdigit():
+            query |= Q(pk=int(term))
+        return queryset.filter(query), False
+
+
+@admin.register(Project)
+class ProjectAdmin(admin.ModelAdmin):
+    list_display = ['id', 'title', 'owner', 'created_at', 'updated_at']
+    list_select_related = ['owner']
+    # Recherche par id exact ou début du titre (voir get_search_results)
+    search_fields = ['=id', '^title']
+    date_hierarchy = 'created_at'
+    ordering = ['-created_at', '-id']  # Parcours de project_created_idx, sans tri
+    autocomplete_fields = ['owner']
+    readonly_fields = ['created_at', 'updated_at']
+    show_full_result_count = False
+    paginator = CappedCountPaginator
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return DateProbeQuerySet(self.model, query=queryset.query, using=queryset._db)
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if term.isdigit():
+            return queryset.filter(pk=int(term)), False
+        return queryset.title_startswith(term), False
+
 
-from .models import User, Project
+@admin.register(AccountPurge)
+class AccountPurgeAdmin(admin.ModelAdmin):
+    list_display = ['username', 'user_id', 'deleted', 'total', 'progress', 'started_at', 'finished_at']
+    readonly_fields = list_display
 
-admin.site.register(User)
-admin.site.register(Project)
\ No newline at end of file
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'status', 'priority', 'attempts', 'max_attempts', 'run_at', 'finished_at']
+    list_filter = ['status', 'name']
@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ProjectManagerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'project_manager'
+
+    def ready(self):
+        from . import signals  # noqa: F401 (enregistre les receivers)
+        from .sharding import seed_id_sequence
+        post_migrate.connect(seed_id_sequence, sender=self)
@@ -0,0 +1,17 @@
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .revocation import revocation_list
+
+
+class RevocableJWTAuthentication(JWTAuthentication):
+    """
+    Authentification JWT qui refuse les jetons révoqués (déconnexion).
+    """
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if revocation_list.is_revoked(token[api_settings.JTI_CLAIM]):
+            raise InvalidToken("Ce jeton a été révoqué.")
+        return token
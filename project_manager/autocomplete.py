@@ -0,0 +1,149 @@
+"""
+Index en mémoire des titres de projets pour l'autocomplétion.
+
+Chaque worker garde une liste triée de ``(titre en minuscules, id)`` : une
+recherche par préfixe est un ``bisect`` suivi de la lecture des K entrées
+suivantes, sans accès à la base. L'index est construit au premier appel,
+tenu à jour par les signaux du worker courant, et rattrape les écritures des
+autres workers via le flux de synchronisation (``sync.get_changes``) au plus
+une fois toutes les ``AUTOCOMPLETE_REFRESH_SECONDS``. Un index tronqué par
+``AUTOCOMPLETE_MAX_ENTRIES`` est reconstruit au rattrapage dès que des
+suppressions le ramènent sous le plafond.
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+
+from . import query_budget, sharding
+from .models import Project
+from .sync import current_token, get_changes
+
+
+def _key(title):
+    return title.casefold()
+
+
+class TitleIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._entries = []  # [(clé, id)] triée
+        self._titles = {}  # {id: (titre, owner_id)}
+        self._token = None
+        self._synced_at = 0.0
+        self.complete = False  # False si le plafond mémoire a tronqué l'index
+        self.ready = False
+
+    def build(self):
+        """
+        (Re)construit l'index depuis la base, dans la limite de ``AUTOCOMPLETE_MAX_ENTRIES``.
+        """
+        limit = settings.AUTOCOMPLETE_MAX_ENTRIES
+        # Jeton pris avant la lecture : un changement concurrent sera rejoué au rattrapage
+        token = current_token()
+        rows = Project.objects.alive().order_by('id').values_list('id', 'title', 'owner_id')[:limit + 1]
+        rows = sorted(row for query in sharding.each_shard(rows) for row in query)[:limit + 1]
+        complete = len(rows) <= limit
+        rows = rows[:limit]
+        with self._lock:
+            self._titles = {pk: (title, owner_id) for pk, title, owner_id in rows}
+            self._entries = sorted((_key(title), pk) for pk, title, _ in rows)
+            self._token = token
+            self._synced_at = time.monotonic()
+            self.complete = complete
+            self.ready = True
+
+    def add(self, pk, title, owner_id):
+        with self._lock:
+            if not self.ready:
+                return
+            self._discard(pk)
+            if len(self._titles) >= settings.AUTOCOMPLETE_MAX_ENTRIES:
+                self.complete = False
+                return
+            self._titles[pk] = (title, owner_id)
+            insort(self._entries, (_key(title), pk))
+
+    def remove(self, pk):
+        with self._lock:
+            if self.ready:
+                self._discard(pk)
+
+    def remove_owner(self, owner_id):
+        with self._lock:
+            for pk in [pk for pk, (_, owner) in self._titles.items() if owner == owner_id]:
+                self._discard(pk)
+
+    def _discard(self, pk):
+        current = self._titles.pop(pk, None)
+        if current is None:
+            return
+        key = (_key(current[0]), pk)
+        i = bisect_left(self._entries, key)
+        if i < len(self._entries) and self._entries[i] == key:
+            del self._entries[i]
+
+    def refresh(self):
+        """
+        Applique les changements faits par les autres workers depuis le dernier rattrapage.
+        Un seul thread rattrape à la fois ; les autres servent l'index courant.
+        """
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            token, has_more = self._token, True
+            while has_more:
+                changes, token, has_more = get_changes(token, 500)
+                for action, obj in changes:
+                    if action == 'upsert':
+                        self.add(obj.id, obj.title, obj.owner_id)
+                    else:
+                        self.remove(obj.project_id)
+            with self._lock:
+                self._token = token
+                self._synced_at = time.monotonic()
+                # Des suppressions ont libéré de la place : l'index peut redevenir complet
+                truncated = not self.complete and len(self._titles) < settings.AUTOCOMPLETE_MAX_ENTRIES
+            if truncated:
+                self.build()
+        finally:
+            self._refresh_lock.release()
+
+    def ensure_fresh(self):
+        # Coût amorti sur toutes les recherches du worker : hors budget de la requête courante
+        with query_budget.exempt():
+            if not self.ready:
+                with self._refresh_lock:
+                    if not self.ready:
+                        self.build()
+            elif time.monotonic() - self._synced_at > settings.AUTOCOMPLETE_REFRESH_SECONDS:
+                self.refresh()
+
+    def search(self, prefix, limit):
+        """
+        Retourne au plus ``limit`` projets ``{'id', 'title'}`` dont le titre
+        commence par ``prefix`` (insensible à la casse), par ordre alphabétique.
+        """
+        key = _key(prefix)
+        results = []
+        with self._lock:
+            i = bisect_left(self._entries, (key,))
+            while i < len(self._entries) and len(results) < limit:
+                title_key, pk = self._entries[i]
+                if not title_key.startswith(key):
+                    break
+                results.append({'id': pk, 'title': self._titles[pk][0]})
+                i += 1
+        return results
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+
+title_index = TitleIndex()
@@ -0,0 +1,127 @@
+"""
+Diffusion en mémoire des changements de projets vers les clients SSE.
+
+Un seul ``Broadcaster`` par worker est alimenté par les signaux du modèle :
+chaque événement est sérialisé une fois, puis la même chaîne d'octets est
+déposée dans la file (bornée) de chaque abonné concerné. La base n'est donc
+jamais interrogée par abonné.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from rest_framework.utils.encoders import JSONEncoder
+
+# Envoyé à un abonné trop lent : il doit se resynchroniser via /api/projects/changes/
+RESYNC = b'event: resync\ndata: {}\n\n'
+KEEPALIVE = b': keepalive\n\n'
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class Subscription:
+    __slots__ = ('queue', 'owner_id', 'loop')
+
+    def __init__(self, loop, owner_id, maxsize):
+        self.loop = loop
+        self.owner_id = owner_id
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def push(self, payload):
+        """
+        Dépose un événement sans jamais bloquer l'émetteur. Si la file est
+        pleine, on la vide et on ne garde que l'ordre de resynchronisation :
+        la mémoire par abonné reste bornée quel que soit son retard.
+        """
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+
+class Broadcaster:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # {boucle asyncio: {owner_id ou None: {abonnements}}}
+        self._subscriptions = {}
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def subscribe(self, owner_id=None):
+        """
+        Crée un abonnement ; doit être appelé depuis la boucle asyncio qui le consommera.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._count >= settings.PROJECT_EVENTS_MAX_SUBSCRIBERS:
+                raise TooManySubscribers()
+            subscription = Subscription(loop, owner_id, settings.PROJECT_EVENTS_QUEUE_SIZE)
+            by_owner = self._subscriptions.setdefault(loop, defaultdict(set))
+            by_owner[owner_id].add(subscription)
+            self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            by_owner = self._subscriptions.get(subscription.loop, {})
+            subscriptions = by_owner.get(subscription.owner_id)
+            if not subscriptions or subscription not in subscriptions:
+                return
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del by_owner[subscription.owner_id]
+            if not by_owner:
+                del self._subscriptions[subscription.loop]
+            self._count -= 1
+
+    def publish(self, event, owner_id, data):
+        """
+        Publie un événement ; peut être appelé depuis n'importe quel thread.
+        """
+        payload = f"event: {event}\ndata: {json.dumps(data, cls=JSONEncoder)}\n\n".encode()
+        with self._lock:
+            loops = list(self._subscriptions)
+        for loop in loops:
+            try:
+                loop.call_soon_threadsafe(self._deliver, loop, owner_id, payload)
+            except RuntimeError:
+                # Boucle fermée : ses abonnés ne liront plus rien
+                pass
+
+    def _deliver(self, loop, owner_id, payload):
+        with self._lock:
+            by_owner = self._subscriptions.get(loop, {})
+            targets = list(by_owner.get(None, ())) + list(by_owner.get(owner_id, ()))
+        for subscription in targets:
+            subscription.push(payload)
+
+
+broadcaster = Broadcaster()
+
+
+async def stream(subscription):
+    """
+    Générateur asynchrone des octets SSE d'un abonnement.
+    """
+    heartbeat = settings.PROJECT_EVENTS_HEARTBEAT_SECONDS
+    try:
+        yield b'retry: 5000\n\n'
+        while True:
+            try:
+                payload = await asyncio.wait_for(subscription.queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield KEEPALIVE
+                continue
+            yield payload
+            if payload is RESYNC:
+                break
+    finally:
+        broadcaster.unsubscribe(subscription)
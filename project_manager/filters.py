@@ -0,0 +1,62 @@
+"""
+Filtres de la liste des projets (``GET /api/projects/``).
+
+Chaque filtre est traduit en une recherche servie par un index :
+``owner`` et ``owner__in`` par l'index de la clé étrangère,
+``owner__username`` par l'index unique des noms d'utilisateur,
+``created_at__gte`` / ``created_at__lt`` par ``project_created_idx`` et
+``title__istartswith`` par ``project_title_lower_idx``. Seul ``title``
+(sous-chaîne) parcourt toute la table.
+"""
+from django import forms
+from django_filters import rest_framework as filters
+
+from . import sharding
+from .models import Project, User
+
+
+class SQLiteIntegerField(forms.IntegerField):
+    """
+    Entier borné à 64 bits signés : au-delà, SQLite lève OverflowError (500).
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('min_value', -2**63)
+        kwargs.setdefault('max_value', 2**63 - 1)
+        super().__init__(**kwargs)
+
+
+class IntegerFilter(filters.NumberFilter):
+    field_class = SQLiteIntegerField
+
+
+class IntegerInFilter(filters.BaseInFilter, IntegerFilter):
+    pass
+
+
+class ProjectFilter(filters.FilterSet):
+    owner = IntegerFilter(method='filter_owner', label="Id du propriétaire")
+    owner__in = IntegerInFilter(field_name='owner_id', lookup_expr='in', label="Id de propriétaires, séparés par des virgules")
+    owner__username = filters.CharFilter(method='filter_owner_username', label="Nom d'utilisateur du propriétaire")
+    created_at__gte = filters.IsoDateTimeFilter(field_name='created_at', lookup_expr='gte', label="Créés à partir de (ISO 8601)")
+    created_at__lt = filters.IsoDateTimeFilter(field_name='created_at', lookup_expr='lt', label="Créés avant (ISO 8601)")
+    title = filters.CharFilter(field_name='title', lookup_expr='icontains', label="Sous-chaîne du titre (parcours complet)")
+    title__istartswith = filters.CharFilter(method='filter_title_prefix', label="Début du titre, insensible à la casse")
+
+    class Meta:
+        model = Project
+        fields = []
+
+    def filter_owner(self, queryset, name, value):
+        # Les projets d'un propriétaire sont tous sur son shard
+        return queryset.for_owner(value)
+
+    def filter_owner_username(self, queryset, name, value):
+        if not sharding.is_sharded():
+            return queryset.filter(owner__username=value)
+        # Pas de jointure entre bases : l'id est lu sur ``default``
+        owner_id = User.objects.filter(username=value).values_list('id', flat=True).first()
+        return queryset.none() if owner_id is None else queryset.for_owner(owner_id)
+
+    def filter_title_prefix(self, queryset, name, value):
+        return queryset.title_startswith(value)
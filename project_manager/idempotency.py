@@ -0,0 +1,117 @@
+"""
+Clés d'idempotence pour les ``POST`` de création.
+
+Un client qui rejoue un ``POST`` après un timeout envoie le même en-tête
+``Idempotency-Key``. La première réponse (statut, en-têtes, corps) est
+conservée dans le cache pendant ``IDEMPOTENCY_TTL_SECONDS`` ; les doublons la
+reçoivent telle quelle, avec l'en-tête ``Idempotent-Replayed: true``, sans
+sérialiseur ni écriture en base.
+
+- La clé est lue après l'authentification, les permissions et le throttling
+  de DRF : un rejeu avec un jeton expiré ou révoqué reçoit ``401``, et les
+  réponses ``401`` / ``403`` ne sont jamais conservées.
+- La clé est propre à l'utilisateur authentifié (un jeton rafraîchi garde
+  la même portée) et au chemin de la requête. Les ``POST`` anonymes
+  (inscription) partagent une portée : la clé doit être aléatoire (UUID).
+- Le corps de la requête est mémorisé par son empreinte : réutiliser une clé
+  avec un autre corps est refusé (``422``).
+- Un doublon qui arrive pendant le traitement de la première requête attend
+  sa réponse (verrou posé avec ``cache.add``) au plus
+  ``IDEMPOTENCY_WAIT_SECONDS``, puis reçoit ``409``.
+- Les réponses ``5xx`` ne sont pas conservées : le client peut réessayer.
+
+Le cache doit être partagé entre les workers (``CACHES``) pour que les
+doublons reçus par un autre worker soient reconnus.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from rest_framework.response import Response
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+POLL_SECONDS = 0.05
+
+
+def _digest(*parts):
+    return hashlib.sha256(b'\0'.join(parts)).hexdigest()
+
+
+def cache_key(user, path, key):
+    """
+    Clé de cache de la réponse ; le verrou de traitement est ``<clé>:lock``.
+    """
+    scope = f'user:{user.pk}' if user.is_authenticated else 'anonymous'
+    return 'idempotency:' + _digest(scope.encode(), path.encode(), key.encode())
+
+
+def _replay(record):
+    response = HttpResponse(record['content'], status=record['status'])
+    for name, value in record['headers']:
+        response[name] = value
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+class IdempotentMixin:
+    """
+    Rend idempotents les ``POST`` d'une vue qui reçoivent un en-tête ``Idempotency-Key``.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        # (clé de cache, empreinte du corps) quand ``post`` traite la requête sous verrou
+        self.idempotency_record = None
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+            if self.idempotency_record is not None and response.status_code < 500 and not response.streaming:
+                response_key, fingerprint = self.idempotency_record
+                if hasattr(response, 'render'):
+                    response.render()
+                cache.set(response_key, {
+                    'fingerprint': fingerprint,
+                    'status': response.status_code,
+                    'headers': list(response.items()),
+                    'content': response.content,
+                }, settings.IDEMPOTENCY_TTL_SECONDS)
+            return response
+        finally:
+            if self.idempotency_record is not None:
+                cache.delete(f'{self.idempotency_record[0]}:lock')
+
+    def post(self, request, *args, **kwargs):
+        # Appelé par DRF une fois l'utilisateur authentifié et autorisé
+        key = request.headers.get(HEADER)
+        if key is None:
+            return super().post(request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'detail': f"L'en-tête {HEADER} doit faire entre 1 et {MAX_KEY_LENGTH} caractères."}, status=400
+            )
+
+        response_key = cache_key(request.user, request.path, key)
+        lock_key = f'{response_key}:lock'
+        fingerprint = _digest(request.body)
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+
+        while True:
+            record = cache.get(response_key)
+            if record is not None:
+                if record['fingerprint'] != fingerprint:
+                    return Response({'detail': f"{HEADER} déjà utilisée pour une autre requête."}, status=422)
+                return _replay(record)
+            # Le verrou expire seul si le worker meurt pendant le traitement
+            if cache.add(lock_key, fingerprint, settings.IDEMPOTENCY_LOCK_SECONDS):
+                break
+            if time.monotonic() >= deadline:
+                return Response(
+                    {'detail': "Une requête avec cette clé est en cours de traitement, réessayez plus tard."},
+                    status=409,
+                )
+            time.sleep(POLL_SECONDS)
+
+        self.idempotency_record = (response_key, fingerprint)
+        return super().post(request, *args, **kwargs)
@@ -0,0 +1,61 @@
+"""
+Documents composés : ``?include=owner`` ajoute aux réponses des projets
+(liste, détail, ``batch-get``) un dictionnaire ``included`` des
+propriétaires, chacun une seule fois, indexé par id :
+
+    {"results": [...], "included": {"owners": {"3": {"id": 3, "username": "alice", ...}}}}
+
+Les propriétaires sont lus par une seule requête ``IN`` sur les id présents
+dans la réponse, après les caches (liste et objets) : un profil modifié est
+vu sans invalider les projets. Comme dans ``UserDetail``, l'email d'un
+propriétaire n'est inclus que pour lui-même (et pour le staff).
+"""
+from rest_framework.exceptions import ValidationError
+
+from .models import User
+from .serializers import OwnerSummarySerializer
+
+INCLUDE_PARAM = 'include'
+INCLUDES = ('owner',)
+
+
+def requested(request):
+    """
+    Relations demandées par ``?include=`` (séparées par des virgules).
+    """
+    value = request.query_params.get(INCLUDE_PARAM, '')
+    names = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = sorted(names - set(INCLUDES))
+    if unknown:
+        raise ValidationError({INCLUDE_PARAM: [
+            f"Valeur inconnue : {', '.join(unknown)} (valeurs possibles : {', '.join(INCLUDES)})."
+        ]})
+    return names
+
+
+def owners(request, projects):
+    """
+    Propriétaires des représentations ``projects``, par id, en une requête ``IN``.
+    """
+    owner_ids = {project['owner'] for project in projects}
+    if not owner_ids:
+        return {}
+    queryset = User.objects.filter(pk__in=owner_ids).order_by('pk')
+    serializer = OwnerSummarySerializer(queryset, many=True, context={'request': request})
+    return {str(owner['id']): owner for owner in serializer.data}
+
+
+class IncludeMixin:
+    """
+    Vérifie ``?include=`` avant le traitement de la requête, et ajoute
+    ``included`` aux réponses.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.includes = requested(request)
+
+    def add_included(self, data, projects):
+        if 'owner' in self.includes:
+            data['included'] = {'owners': owners(self.request, projects)}
+        return data
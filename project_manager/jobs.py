@@ -0,0 +1,267 @@
+"""
+File de tâches différées stockée dans la base de données.
+
+Les tâches sont de simples fonctions enregistrées avec ``@task`` dans le module
+``tasks.py`` d'une application. Le web les planifie avec ``enqueue()``, un ou
+plusieurs ``manage.py run_worker`` les réclament et les exécutent.
+"""
+import os
+import socket
+import time
+import traceback
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from .models import Job
+
+_registry = {}
+
+
+class UnknownTask(Exception):
+    pass
+
+
+def task(name):
+    """
+    Enregistre une fonction comme tâche sous le nom ``name``.
+    Ses arguments doivent être sérialisables en JSON.
+    """
+    def decorator(func):
+        _registry[name] = func
+        return func
+    return decorator
+
+
+def autodiscover():
+    autodiscover_modules('tasks')
+
+
+def enqueue(name, *args, priority=0, delay=0, max_attempts=None, timeout=None, **kwargs):
+    return Job.objects.create(
+        name=name,
+        args=list(args),
+        kwargs=kwargs,
+        priority=priority,
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=settings.JOB_MAX_ATTEMPTS if max_attempts is None else max_attempts,
+        timeout=settings.JOB_TIMEOUT_SECONDS if timeout is None else timeout,
+    )
+
+
+def _abandoned(now):
+    # En cours, mais le worker s'est arrêté sans rendre le job (bail expiré)
+    return Q(status=Job.RUNNING, locked_until__lt=now)
+
+
+def _ready(now):
+    # En attente et échue, ou abandonnée avec encore des essais
+    return Q(status=Job.QUEUED, run_at__lte=now) | (_abandoned(now) & Q(attempts__lt=F('max_attempts')))
+
+
+def claim(worker_id, limit):
+    """
+    Réclame au plus ``limit`` jobs prêts, par priorité puis ancienneté.
+
+    La réservation est un seul ``UPDATE`` conditionnel : deux workers qui
+    visent le même job ne peuvent pas l'obtenir tous les deux, le second
+    ne modifie simplement aucune ligne.
+    """
+    now = timezone.now()
+    # Un job qui tue son worker (OOM, segfault) n'atteint jamais mark_failed : sans cela, il serait relancé sans fin
+    Job.objects.filter(_abandoned(now), attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, finished_at=now, locked_until=None,
+        last_error="Worker arrêté pendant le dernier essai (bail expiré).",
+    )
+    ids = list(
+        Job.objects.filter(_ready(now))
+        .order_by('-priority', 'run_at', 'id')
+        .values_list('id', flat=True)[:limit]
+    )
+    if not ids:
+        return []
+
+    token = f"{worker_id}:{uuid.uuid4().hex[:12]}"
+    claimed = Job.objects.filter(_ready(now), id__in=ids).update(
+        status=Job.RUNNING, locked_by=token, locked_until=None, attempts=F('attempts') + 1,
+    )
+    if not claimed:
+        return []
+
+    jobs = list(Job.objects.filter(locked_by=token, status=Job.RUNNING).order_by('-priority', 'run_at', 'id'))
+    leases = {
+        timeout: now + timedelta(seconds=timeout + settings.JOB_LEASE_GRACE_SECONDS)
+        for timeout in {job.timeout for job in jobs}
+    }
+    for timeout, lease in leases.items():
+        Job.objects.filter(locked_by=token, timeout=timeout).update(locked_until=lease)
+    for job in jobs:
+        job.locked_until = leases[job.timeout]
+    return jobs
+
+
+def execute(name, args, kwargs):
+    """
+    Exécute une tâche ; appelée dans un thread ou un processus du pool.
+    """
+    func = _registry.get(name)
+    if func is None:
+        raise UnknownTask(name)
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+def extend_lease(job):
+    """
+    Prolonge le bail d'un job encore en cours d'exécution de ``JOB_LEASE_GRACE_SECONDS``.
+    """
+    job.locked_until = timezone.now() + timedelta(seconds=settings.JOB_LEASE_GRACE_SECONDS)
+    return Job.objects.filter(pk=job.pk, locked_by=job.locked_by, status=Job.RUNNING).update(
+        locked_until=job.locked_until,
+    )
+
+
+def mark_done(job):
+    return Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(
+        status=Job.DONE, finished_at=timezone.now(), locked_until=None, last_error='',
+    )
+
+
+def mark_failed(job, error):
+    """
+    Replanifie le job avec un backoff exponentiel, ou l'abandonne après
+    ``max_attempts`` essais (et tout de suite pour une tâche inconnue).
+    """
+    if isinstance(error, BaseException):
+        message = ''.join(traceback.format_exception(error))
+    else:
+        message = str(error)
+    now = timezone.now()
+    fields = {'last_error': message[-5000:], 'locked_until': None}
+
+    if job.attempts >= job.max_attempts or isinstance(error, UnknownTask):
+        fields.update(status=Job.FAILED, finished_at=now)
+    else:
+        backoff = min(
+            settings.JOB_RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1),
+            settings.JOB_RETRY_BACKOFF_MAX_SECONDS,
+        )
+        fields.update(status=Job.QUEUED, run_at=now + timedelta(seconds=backoff))
+    return Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(**fields)
+
+
+def _init_process():
+    import django
+    django.setup()
+    autodiscover()
+
+
+class Worker:
+    """
+    Boucle de réclamation / exécution des jobs sur un pool de threads ou de processus.
+    """
+
+    def __init__(self, concurrency=4, pool='thread', poll_interval=1.0, worker_id=None, log=None):
+        self.concurrency = concurrency
+        self.pool = pool
+        self.poll_interval = poll_interval
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.log = log or (lambda message: None)
+        self.stopping = False
+        self.processed = self.succeeded = self.failed = 0
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def _executor(self):
+        if self.pool == 'process':
+            # Les processus fils ne doivent pas hériter des connexions du parent
+            connections.close_all()
+            return ProcessPoolExecutor(max_workers=self.concurrency, initializer=_init_process)
+        return ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='job')
+
+    def run(self, burst=False, max_jobs=None):
+        """
+        Traite les jobs jusqu'à ``stop()`` ; avec ``burst``, s'arrête dès que
+        la file est vide. Retourne le débit en jobs/s.
+
+        Un job qui dépasse son ``timeout`` garde son slot et son bail jusqu'à
+        la fin de son exécution. Il est alors compté en échec s'il a levé une
+        exception, terminé sinon. ``stop()`` attend donc aussi la fin des
+        jobs en timeout.
+        """
+        started = time.monotonic()
+        # future -> (job, échéance ou None tant que le job n'a pas démarré, timeout dépassé)
+        running = {}
+        executor = self._executor()
+        try:
+            while True:
+                # Un job en timeout garde son slot : le pool n'a pas de thread libre pour un autre
+                free = self.concurrency - len(running)
+                if max_jobs is not None:
+                    free = min(free, max_jobs - self.processed - len(running))
+                if free > 0 and not self.stopping:
+                    for job in claim(self.worker_id, free):
+                        future = executor.submit(execute, job.name, job.args, job.kwargs)
+                        running[future] = (job, None, False)
+
+                if not running:
+                    if self.stopping or burst or (max_jobs is not None and self.processed >= max_jobs):
+                        break
+                    time.sleep(self.poll_interval)
+                    continue
+
+                done, _ = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job, _, timed_out = running.pop(future)
+                    error = future.exception()
+                    if timed_out and error is not None:
+                        error = TimeoutError(f"Timeout après {job.timeout}s")
+                    elif timed_out:
+                        # Travail fait : le relancer l'exécuterait une seconde fois
+                        self.log(f"Job {job} terminé après son timeout ({job.timeout}s)")
+                    self._finish(job, error)
+                now = time.monotonic()
+                for future, (job, deadline, timed_out) in list(running.items()):
+                    if deadline is None:
+                        # Le délai court à partir du début de l'exécution, pas de la soumission
+                        if future.running():
+                            running[future] = (job, now + job.timeout, False)
+                    elif timed_out:
+                        # Un thread ne peut pas être interrompu : le job garde son bail jusqu'à la
+                        # fin du thread, pour qu'aucun autre worker ne le relance en parallèle
+                        if job.locked_until - timezone.now() < timedelta(seconds=settings.JOB_LEASE_GRACE_SECONDS / 2):
+                            extend_lease(job)
+                    elif now > deadline:
+                        running[future] = (job, deadline, True)
+                        self.log(f"Job {job} en timeout après {job.timeout}s, en attente de la fin de son exécution")
+        finally:
+            # Après une erreur, ne pas attendre les jobs encore en cours
+            executor.shutdown(wait=not running, cancel_futures=True)
+
+        elapsed = time.monotonic() - started
+        rate = self.processed / elapsed if elapsed else 0.0
+        self.log(
+            f"{self.processed} jobs traités en {elapsed:.2f}s ({rate:.1f} jobs/s) — "
+            f"{self.succeeded} succès, {self.failed} échecs"
+        )
+        return rate
+
+    def _finish(self, job, error):
+        self.processed += 1
+        if error is None:
+            self.succeeded += 1
+            mark_done(job)
+        else:
+            self.failed += 1
+            mark_failed(job, error)
+            self.log(f"Job {job} en échec (essai {job.attempts}/{job.max_attempts}) : {error!r}")
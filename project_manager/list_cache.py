@@ -0,0 +1,182 @@
+"""
+Cache des premières pages de la liste des projets (``GET /api/projects/``).
+
+Les pages ``1`` à ``LIST_CACHE_MAX_PAGE`` sont conservées dans le cache, par
+forme de requête (chemin et paramètres triés, liens ``next`` / ``previous``
+exclus : ils sont recalculés pour chaque requête).
+
+- Toute écriture sur un projet (ou la suppression d'un compte) incrémente
+  une version globale : les pages enregistrées sous une autre version sont
+  périmées.
+- Une page est fraîche pendant ``LIST_CACHE_TTL_SECONDS`` ; elle reste
+  ensuite disponible, périmée, jusqu'à ``LIST_CACHE_STALE_SECONDS``.
+- Sur une page absente ou périmée, une seule requête par forme la recalcule
+  (verrou ``cache.add``). Les autres reçoivent la page périmée, ou attendent
+  le résultat au plus ``LIST_CACHE_WAIT_SECONDS`` si aucune n'existe.
+
+``warm()`` (commande ``warm_cache``, et au démarrage des workers si
+``LIST_CACHE_WARM_ON_STARTUP``) précalcule les formes de
+``LIST_CACHE_WARM_QUERIES``.
+
+Le verrou et le préchauffage par ``warm_cache`` ne valent entre workers
+qu'avec un cache partagé (``is_shared``).
+"""
+import hashlib
+import logging
+import threading
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connections
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'project-list:version'
+METRICS_NAME = 'project-list'
+POLL_SECONDS = 0.02
+# Sans effet sur la page en cache : ``included`` est calculé après le cache
+UNCACHED_PARAMS = {'include'}
+
+
+def is_shared():
+    """
+    Le cache est-il commun à tous les processus ? ``LocMemCache`` est propre
+    à chacun : son contenu disparaît avec le processus.
+    """
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Valeur inédite : les pages d'une version évincée du cache ne redeviennent pas fraîches
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        current_version()
+
+
+def key_for(request, page_query_param='page'):
+    """
+    Clé de cache de la page demandée, ``None`` si elle n'est pas mise en cache.
+    """
+    if not settings.LIST_CACHE_ENABLED:
+        return None
+    params = sorted(
+        (name, value) for name, values in request.query_params.lists() for value in values
+        if name not in UNCACHED_PARAMS
+    )
+    page = request.query_params.get(page_query_param, '1')
+    if not page.isdigit() or not 1 <= int(page) <= settings.LIST_CACHE_MAX_PAGE:
+        return None
+    if page == '1':
+        params = [(name, value) for name, value in params if name != page_query_param]
+    digest = hashlib.sha256(f'{request.path}?{urlencode(params)}'.encode()).hexdigest()
+    return f'project-list:{digest}'
+
+
+def _is_fresh(entry, version):
+    return entry is not None and entry['version'] == version and entry['expires'] > time.time()
+
+
+def get_or_compute(key, compute):
+    """
+    Page en cache sous ``key``, ou calculée par ``compute()`` par une seule requête à la fois.
+    """
+    version = current_version()
+    entry = cache.get(key)
+    if _is_fresh(entry, version):
+        metrics.record_cache(METRICS_NAME, True)
+        return entry['value']
+
+    lock_key = f'{key}:lock'
+    deadline = time.monotonic() + settings.LIST_CACHE_WAIT_SECONDS
+    while not cache.add(lock_key, 1, settings.LIST_CACHE_LOCK_SECONDS):
+        if entry is not None:
+            metrics.record_cache(METRICS_NAME, True)
+            return entry['value']  # Périmée : servie pendant le recalcul
+        if time.monotonic() >= deadline:
+            metrics.record_cache(METRICS_NAME, False)
+            return compute()
+        time.sleep(POLL_SECONDS)
+        entry = cache.get(key)
+        if entry is not None and entry['version'] == version:
+            metrics.record_cache(METRICS_NAME, True)
+            return entry['value']
+
+    try:
+        # Une autre requête a pu terminer le calcul entre la lecture et le verrou
+        entry = cache.get(key)
+        if _is_fresh(entry, version):
+            metrics.record_cache(METRICS_NAME, True)
+            return entry['value']
+        metrics.record_cache(METRICS_NAME, False)
+        value = compute()
+        cache.set(key, {
+            'version': version,
+            'expires': time.time() + settings.LIST_CACHE_TTL_SECONDS,
+            'value': value,
+        }, settings.LIST_CACHE_STALE_SECONDS)
+        return value
+    finally:
+        cache.delete(lock_key)
+
+
+def warm():
+    """
+    Précalcule les pages ``1`` à ``LIST_CACHE_MAX_PAGE`` des formes de
+    ``LIST_CACHE_WARM_QUERIES`` ; retourne le nombre de pages en cache.
+    """
+    from django.http import HttpRequest, QueryDict
+    from django.urls import reverse
+    from rest_framework.exceptions import NotFound
+
+    from .views import ProjectListCreate
+
+    if not settings.LIST_CACHE_ENABLED:
+        return 0
+    path = reverse('project-list')
+    warmed = 0
+    for query in settings.LIST_CACHE_WARM_QUERIES:
+        for page in range(1, settings.LIST_CACHE_MAX_PAGE + 1):
+            request = HttpRequest()
+            request.method, request.path = 'GET', path
+            request.GET = QueryDict(f"{query}{'&' if query else ''}page={page}")
+            view = ProjectListCreate()
+            view.setup(request)
+            view.request, view.format_kwarg = view.initialize_request(request), None
+            try:
+                get_or_compute(key_for(view.request, view.paginator.page_query_param), view.get_page_data)
+            except NotFound:
+                break  # Page au-delà de la dernière
+            warmed += 1
+    return warmed
+
+
+def warm_in_background():
+    """
+    Hook de démarrage des workers : préchauffe sans retarder le démarrage.
+    """
+    def run():
+        try:
+            started = time.monotonic()
+            warmed = warm()
+            logger.info("Cache de la liste des projets : %d pages en %.2fs", warmed, time.monotonic() - started)
+        except Exception:
+            logger.exception("Échec du préchauffage du cache de la liste des projets")
+        finally:
+            connections.close_all()
+
+    threading.Thread(target=run, name='list-cache-warm', daemon=True).start()
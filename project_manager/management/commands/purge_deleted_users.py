@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from project_manager.models import User
+from project_manager.purge import purge_user
+
+
+class Command(BaseCommand):
+    help = "Termine la purge des comptes marqués comme supprimés (reprise après arrêt du serveur)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help="Projets supprimés par transaction")
+
+    def handle(self, *args, **options):
+        pending = User.objects.filter(deleted_at__isnull=False).order_by('deleted_at')
+        for user_id, username in pending.values_list('id', 'username'):
+            self.stdout.write(f"Purge de {username} ...")
+            purge = purge_user(
+                user_id,
+                batch_size=options['batch_size'],
+                on_progress=lambda p: self.stdout.write(f"  {p.deleted}/{p.total} projets ({p.progress}%)"),
+            )
+            self.stdout.write(self.style.SUCCESS(f"  {purge.deleted} projets supprimés, compte supprimé."))
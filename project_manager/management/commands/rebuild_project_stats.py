@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from project_manager import stats
+
+
+class Command(BaseCommand):
+    help = "Recalcule la table ProjectDailyStat, ou vérifie sa cohérence avec --check."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help="Comparer au comptage complet sans rien modifier")
+
+    def handle(self, *args, **options):
+        if options['check']:
+            diffs = stats.check_consistency()
+            for day, owner_id, expected, stored in diffs:
+                self.stdout.write(f"{day} owner={owner_id} : attendu {expected}, stocké {stored}")
+            if diffs:
+                raise CommandError(f"{len(diffs)} bucket(s) incohérent(s), relancer sans --check.")
+            self.stdout.write(self.style.SUCCESS("Statistiques cohérentes."))
+            return
+
+        stats.rebuild()
+        self.stdout.write(self.style.SUCCESS("Statistiques recalculées."))
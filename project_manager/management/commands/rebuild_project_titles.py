@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from project_manager import titles
+
+
+class Command(BaseCommand):
+    help = "Recalcule le registre ProjectTitle (à lancer après tout changement de PROJECT_SHARD_COUNT), ou le vérifie avec --check."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help="Comparer aux titres des projets sans rien modifier")
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            titles.rebuild()
+        diffs = titles.check_consistency()
+        for title, problem in diffs:
+            self.stdout.write(f"{title!r} : {problem}")
+        if options['check'] and diffs:
+            raise CommandError(f"{len(diffs)} titre(s) incohérent(s), relancer sans --check.")
+        if diffs:
+            # Seuls les doublons restent après un recalcul
+            raise CommandError(f"{len(diffs)} titre(s) porté(s) par plusieurs projets : les renommer, puis relancer.")
+        self.stdout.write(self.style.SUCCESS("Registre des titres cohérent." if options['check'] else "Registre des titres recalculé."))
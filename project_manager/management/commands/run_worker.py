@@ -0,0 +1,35 @@
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from project_manager.jobs import Worker, autodiscover
+
+
+class Command(BaseCommand):
+    help = "Exécute les jobs de la file en base (Ctrl+C pour un arrêt propre)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=settings.JOB_WORKER_CONCURRENCY,
+                            help="Nombre de jobs exécutés en parallèle")
+        parser.add_argument('--pool', choices=['thread', 'process'], default='thread',
+                            help="Pool de threads (tâches I/O) ou de processus (tâches CPU)")
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help="Secondes entre deux scrutations quand la file est vide")
+        parser.add_argument('--burst', action='store_true', help="S'arrêter quand la file est vide")
+        parser.add_argument('--max-jobs', type=int, default=None, help="S'arrêter après N jobs")
+
+    def handle(self, *args, **options):
+        autodiscover()
+        worker = Worker(
+            concurrency=options['concurrency'],
+            pool=options['pool'],
+            poll_interval=options['poll_interval'],
+            log=self.stdout.write,
+        )
+        signal.signal(signal.SIGTERM, worker.stop)
+        signal.signal(signal.SIGINT, worker.stop)
+        self.stdout.write(
+            f"Worker {worker.worker_id} démarré ({options['concurrency']} {options['pool']}s)"
+        )
+        worker.run(burst=options['burst'], max_jobs=options['max_jobs'])
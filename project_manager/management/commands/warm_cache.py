@@ -0,0 +1,23 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from project_manager import list_cache
+
+
+class Command(BaseCommand):
+    help = "Précalcule les premières pages de la liste des projets (LIST_CACHE_WARM_QUERIES)."
+
+    def handle(self, *args, **options):
+        if not settings.LIST_CACHE_ENABLED:
+            self.stdout.write(self.style.WARNING("Cache de la liste désactivé (LIST_CACHE_ENABLED)."))
+            return
+        if not list_cache.is_shared():
+            raise CommandError(
+                "Cache propre à chaque processus : les pages préchauffées disparaîtraient avec la commande. "
+                "Configurer un cache partagé dans CACHES."
+            )
+        started = time.monotonic()
+        warmed = list_cache.warm()
+        self.stdout.write(self.style.SUCCESS(f"{warmed} pages en cache en {time.monotonic() - started:.2f}s."))
@@ -0,0 +1,452 @@
+"""
+Métriques d'exploitation au format texte Prometheus (``GET /metrics``).
+
+- ``MetricsMiddleware`` compte les requêtes HTTP par vue (nom d'URL), méthode
+  et statut, mesure leur durée (histogramme) ainsi que le nombre et la durée
+  des requêtes SQL.
+- Les caches de la liste et des objets comptent leurs succès et échecs
+  (``record_cache``). Le taux de succès est calculé à l'exposition.
+- La mémoire résidente de chaque worker est lue dans ``/proc`` à l'exposition.
+
+Chaque thread écrit dans ses propres compteurs : pas de verrou sur le chemin
+des requêtes. L'exposition additionne les compteurs de tous les threads. À
+la fin d'un thread (un par connexion avec ``runserver``), ses compteurs sont
+reportés dans ceux du processus : leur nombre reste borné par celui des
+threads vivants.
+
+``/metrics`` n'est servi qu'aux adresses de ``METRICS_ALLOWED_IPS`` ou aux
+clients qui présentent ``METRICS_TOKEN`` (``Authorization: Bearer <jeton>``).
+
+Avec plusieurs workers (processus), chacun écrit un instantané de ses
+compteurs dans ``METRICS_DIR`` au plus toutes les ``METRICS_FLUSH_SECONDS``.
+Le fichier d'un worker est nommé d'après son pid et sa date de démarrage :
+un pid réutilisé n'écrase pas les totaux d'un worker arrêté. Le worker qui
+sert ``/metrics`` additionne ces fichiers et ses propres compteurs. Ceux
+d'un worker arrêté restent comptés (ils ne doivent pas décroître), mais pas
+sa mémoire : ils sont repliés dans ``metrics-retired.json`` et son fichier
+est supprimé. Sans ``METRICS_DIR``, ``/metrics`` ne
+décrit que le worker qui répond.
+"""
+import hmac
+import json
+import os
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou entre processus
+    fcntl = None
+
+from django.conf import settings
+from django.db import connections
+
+# Type et aide des métriques exposées
+COUNTER, GAUGE, HISTOGRAM = 'counter', 'gauge', 'histogram'
+METRICS = {
+    'exam_http_requests_total': (COUNTER, "Requêtes HTTP traitées, par vue, méthode et statut"),
+    'exam_http_request_duration_seconds': (HISTOGRAM, "Durée des requêtes HTTP, par vue"),
+    'exam_db_queries_total': (COUNTER, "Requêtes SQL exécutées, par vue"),
+    'exam_db_query_duration_seconds_total': (COUNTER, "Durée cumulée des requêtes SQL, par vue"),
+    'exam_cache_requests_total': (COUNTER, "Lectures des caches de l'application, par cache et résultat"),
+    'exam_cache_hit_ratio': (GAUGE, "Proportion de lectures servies par le cache, depuis le démarrage"),
+    'exam_process_resident_memory_bytes': (GAUGE, "Mémoire résidente de chaque worker"),
+}
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_local = threading.local()
+_flush_lock = threading.Lock()
+_next_flush = [0.0]
+_worker = [None]  # (pid, démarrage), voir _identity
+RETIRED = 'metrics-retired.json'
+
+
+class _Store:
+    """
+    Compteurs d'un thread : seul ce thread les modifie.
+    """
+
+    def __init__(self, token=None):
+        self.token = token
+        self.counters = {}
+        self.histograms = {}
+
+    def add_to(self, counters, histograms):
+        # Copie atomique sous le GIL : le thread propriétaire peut continuer à écrire
+        for key, value in dict(self.counters).items():
+            counters[key] = counters.get(key, 0) + value
+        for key, buckets in dict(self.histograms).items():
+            total = histograms.setdefault(key, [0] * len(buckets))
+            for i, value in enumerate(list(buckets)):
+                total[i] += value
+
+
+class _Sentinel:
+    """
+    Référencée par le seul ``threading.local`` : libérée à la fin du thread.
+    """
+
+
+# Jeton renouvelé après un fork ou reset() : les threads abandonnent alors
+# leurs compteurs. ``retired`` cumule ceux des threads terminés.
+_registry = {'token': object(), 'stores': set(), 'retired': _Store()}
+# Réentrant : un thread qui se termine pendant une exposition replie ses compteurs
+_registry_lock = threading.RLock()
+
+
+def _renew():
+    _registry['token'], _registry['stores'], _registry['retired'] = object(), set(), _Store()
+
+
+def _retire(store):
+    with _registry_lock:
+        if store in _registry['stores']:
+            _registry['stores'].discard(store)
+            retired = _registry['retired']
+            store.add_to(retired.counters, retired.histograms)
+
+
+def _after_fork():
+    # Les compteurs du processus parent ne sont pas ceux du worker, et ses
+    # verrous ont pu être copiés pris
+    global _registry_lock, _flush_lock
+    _registry_lock, _flush_lock = threading.RLock(), threading.Lock()
+    _next_flush[0], _worker[0] = 0.0, None
+    _renew()
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+def _store():
+    store = getattr(_local, 'store', None)
+    if store is None or store.token is not _registry['token']:
+        with _registry_lock:
+            store = _Store(_registry['token'])
+            _registry['stores'].add(store)
+        _local.store, _local.sentinel = store, _Sentinel()
+        weakref.finalize(_local.sentinel, _retire, store)
+    return store
+
+
+def inc(name, labels=(), value=1):
+    counters = _store().counters
+    key = (name, labels)
+    counters[key] = counters.get(key, 0) + value
+
+
+def observe(name, value, labels=()):
+    histograms = _store().histograms
+    key = (name, labels)
+    buckets = histograms.get(key)
+    if buckets is None:
+        # Un compteur par intervalle (le dernier pour +Inf), puis la somme
+        buckets = histograms[key] = [0] * (len(BUCKETS) + 2)
+    buckets[bisect_left(BUCKETS, value)] += 1
+    buckets[-1] += value
+
+
+def record_cache(cache_name, hit, count=1):
+    if count:
+        inc('exam_cache_requests_total', (('cache', cache_name), ('result', 'hit' if hit else 'miss')), count)
+
+
+def reset():
+    """
+    Remet à zéro les compteurs de ce worker (tests).
+    """
+    with _registry_lock:
+        _renew()
+
+
+def snapshot():
+    """
+    Compteurs et histogrammes de ce worker, tous threads confondus.
+    """
+    counters, histograms = {}, {}
+    with _registry_lock:
+        stores = list(_registry['stores'])
+        _registry['retired'].add_to(counters, histograms)
+    for store in stores:
+        store.add_to(counters, histograms)
+    return {'pid': os.getpid(), 'counters': counters, 'histograms': histograms}
+
+
+def resident_memory():
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # Maximum atteint, en Ko sous Linux
+
+
+def is_allowed(request):
+    """
+    Adresse de ``METRICS_ALLOWED_IPS``, ou jeton ``METRICS_TOKEN`` présenté.
+    """
+    if request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS:
+        return True
+    token = settings.METRICS_TOKEN
+    header = request.headers.get('Authorization', '')
+    return bool(token) and hmac.compare_digest(header.encode(), f'Bearer {token}'.encode())
+
+
+def _start_time(pid):
+    """
+    Date de démarrage du processus (tops d'horloge depuis le boot), lue dans
+    ``/proc`` ; ``None`` si elle est illisible (processus arrêté, autre OS).
+    """
+    try:
+        with open(f'/proc/{pid}/stat') as stat:
+            # Le nom du processus peut contenir des espaces : champs après la parenthèse fermante
+            return int(stat.read().rsplit(')', 1)[1].split()[19])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _identity():
+    """
+    ``(pid, démarrage)`` de ce worker : un pid réutilisé ne désigne pas le
+    même worker.
+    """
+    pid = os.getpid()
+    if _worker[0] is None or _worker[0][0] != pid:
+        _worker[0] = (pid, _start_time(pid) or time.time_ns())
+    return _worker[0]
+
+
+def _path(directory, pid, started):
+    return os.path.join(directory, f'metrics-{pid}-{started}.json')
+
+
+def _retired_path(directory):
+    return os.path.join(directory, RETIRED)
+
+
+def _write(path, payload):
+    with open(f'{path}.tmp', 'w') as file:
+        json.dump(payload, file)
+    os.replace(f'{path}.tmp', path)  # Les lecteurs ne voient jamais un fichier à moitié écrit
+
+
+def _read(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def flush(force=False):
+    """
+    Écrit l'instantané de ce worker dans ``METRICS_DIR`` (au plus toutes les
+    ``METRICS_FLUSH_SECONDS``, sauf ``force``).
+    """
+    directory = settings.METRICS_DIR
+    if not directory or (not force and time.monotonic() < _next_flush[0]):
+        return
+    # Un seul thread écrit ; les autres ne l'attendent pas
+    if not _flush_lock.acquire(blocking=False):
+        return
+    try:
+        _next_flush[0] = time.monotonic() + settings.METRICS_FLUSH_SECONDS
+        pid, started = _identity()
+        data = snapshot()
+        payload = {
+            'pid': pid,
+            'started': started,
+            'memory': resident_memory(),
+            'counters': [[name, labels, value] for (name, labels), value in data['counters'].items()],
+            'histograms': [[name, labels, buckets] for (name, labels), buckets in data['histograms'].items()],
+        }
+        os.makedirs(directory, exist_ok=True)
+        _write(_path(directory, pid, started), payload)
+    finally:
+        _flush_lock.release()
+
+
+def _is_alive(pid, started=None):
+    """
+    Le worker tourne-t-il encore ? Un pid vivant mais démarré à une autre
+    date a été réutilisé par un autre processus.
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    current = _start_time(pid)
+    return started is None or current is None or current == started
+
+
+def _add(counters, histograms, worker):
+    for metric, labels, value in worker['counters']:
+        key = (metric, tuple(tuple(label) for label in labels))
+        counters[key] = counters.get(key, 0) + value
+    for metric, labels, buckets in worker['histograms']:
+        total = histograms.setdefault((metric, tuple(tuple(label) for label in labels)), [0] * len(buckets))
+        for i, value in enumerate(buckets):
+            total[i] += value
+
+
+@contextmanager
+def _locked(directory):
+    """
+    Verrou exclusif sur ``METRICS_DIR``, entre processus : un worker arrêté
+    n'est replié qu'une fois, et jamais pendant qu'un autre worker lit.
+    """
+    with open(os.path.join(directory, 'metrics.lock'), 'a') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def _fold(directory, dead):
+    """
+    Replie les compteurs des workers arrêtés dans ``metrics-retired.json`` puis
+    supprime leurs fichiers. Le fichier replié est écrit avant les
+    suppressions : une interruption compte au pire deux fois, jamais zéro.
+    """
+    retired = _read(_retired_path(directory)) or {'counters': [], 'histograms': []}
+    counters, histograms = {}, {}
+    _add(counters, histograms, retired)
+    for _, worker in dead:
+        _add(counters, histograms, worker)
+    _write(_retired_path(directory), {
+        'counters': [[name, labels, value] for (name, labels), value in counters.items()],
+        'histograms': [[name, labels, buckets] for (name, labels), buckets in histograms.items()],
+    })
+    for path, _ in dead:
+        os.remove(path)
+
+
+def collect():
+    """
+    Instantané de tous les workers : ce worker, plus les fichiers de
+    ``METRICS_DIR``, dont les workers arrêtés sont repliés au passage.
+    """
+    data = snapshot()
+    counters, histograms = data['counters'], data['histograms']
+    pid, started = _identity()
+    memory = {pid: resident_memory()}
+    directory = settings.METRICS_DIR
+    if not directory or not os.path.isdir(directory):
+        return {'counters': counters, 'histograms': histograms, 'memory': memory}
+    with _locked(directory):
+        dead = []
+        for name in sorted(os.listdir(directory)):
+            if not (name.startswith('metrics-') and name.endswith('.json')) or name == RETIRED:
+                continue
+            path = os.path.join(directory, name)
+            worker = _read(path)
+            if worker is None:
+                continue
+            if (worker['pid'], worker.get('started')) == (pid, started):
+                continue  # Compteurs en mémoire, plus récents que le fichier
+            _add(counters, histograms, worker)
+            if _is_alive(worker['pid'], worker.get('started')):
+                memory[worker['pid']] = worker['memory']
+            else:
+                dead.append((path, worker))
+        retired = _read(_retired_path(directory))
+        if retired is not None:
+            _add(counters, histograms, retired)
+        if dead:
+            _fold(directory, dead)
+    return {'counters': counters, 'histograms': histograms, 'memory': memory}
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(data):
+    """
+    Texte au format d'exposition Prometheus 0.0.4.
+    """
+    samples = {name: [] for name in METRICS}
+    for (name, labels), value in sorted(data['counters'].items()):
+        samples[name].append(f'{name}{_labels(labels)} {_number(value)}')
+    for (name, labels), buckets in sorted(data['histograms'].items()):
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ('+Inf',), buckets):
+            cumulative += count
+            samples[name].append(f'{name}_bucket{_labels(labels + (("le", str(bound)),))} {cumulative}')
+        samples[name].append(f'{name}_sum{_labels(labels)} {_number(buckets[-1])}')
+        samples[name].append(f'{name}_count{_labels(labels)} {cumulative}')
+    reads = {}
+    for (name, labels), value in data['counters'].items():
+        if name == 'exam_cache_requests_total':
+            labels = dict(labels)
+            hits, total = reads.get(labels['cache'], (0, 0))
+            reads[labels['cache']] = (hits + (value if labels['result'] == 'hit' else 0), total + value)
+    for cache_name, (hits, total) in sorted(reads.items()):
+        samples['exam_cache_hit_ratio'].append(
+            f'exam_cache_hit_ratio{_labels((("cache", cache_name),))} {_number(hits / total)}'
+        )
+    for pid, rss in sorted(data['memory'].items()):
+        samples['exam_process_resident_memory_bytes'].append(
+            f'exam_process_resident_memory_bytes{_labels((("pid", pid),))} {rss}'
+        )
+    lines = []
+    for name, (kind, description) in METRICS.items():
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} {kind}', *samples[name]]
+    return '\n'.join(lines) + '\n'
+
+
+class _QueryTimer:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    """
+    Premier middleware de la pile : la durée mesurée inclut tous les autres.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = _QueryTimer()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = request.resolver_match
+        view = (match.url_name or match.view_name) if match is not None else 'unresolved'
+        labels = (('view', view), ('method', request.method), ('status', str(response.status_code)))
+        inc('exam_http_requests_total', labels)
+        observe('exam_http_request_duration_seconds', elapsed, (('view', view),))
+        if timer.count:
+            inc('exam_db_queries_total', (('view', view),), timer.count)
+            inc('exam_db_query_duration_seconds_total', (('view', view),), timer.duration)
+        flush()
+        return response
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:41
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def backfill_stats(apps, schema_editor):
+    Project = apps.get_model('project_manager', 'Project')
+    ProjectDailyStat = apps.get_model('project_manager', 'ProjectDailyStat')
+    buckets = (
+        Project.objects.annotate(day=TruncDate('created_at'))
+        .values('day', 'owner_id').annotate(count=Count('id')).order_by()
+    )
+    ProjectDailyStat.objects.bulk_create(
+        [ProjectDailyStat(day=b['day'], owner_id=b['owner_id'], count=b['count']) for b in buckets],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project_manager', '0005_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('owner_id', models.BigIntegerField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner_id'], name='stat_owner_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'owner_id'), name='unique_stat_bucket')],
+            },
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project_manager', '0007_revokedtoken'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectTitle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=100, unique=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='owner',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='projects', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:11
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project_manager', '0008_project_sharding'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['created_at'], name='project_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(django.db.models.functions.text.Lower('title'), name='project_title_lower_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+from django.db import connections, migrations
+
+from project_manager import sharding
+
+
+def _migrated(alias, model):
+    return model._meta.db_table in connections[alias].introspection.table_names()
+
+
+def backfill_project_titles(apps, schema_editor):
+    """
+    Remplit le registre ``ProjectTitle`` avec les titres existants : sans lui,
+    passer à plusieurs shards accepterait des doublons de tous les titres.
+
+    Chaque base se migre séparément. La base migrée reçoit les titres qui lui
+    reviennent depuis toutes les bases déjà migrées, et envoie les titres de
+    ses projets aux bases déjà migrées : chaque paire de bases est couverte,
+    quel que soit l'ordre des ``migrate``.
+    """
+    Project = apps.get_model('project_manager', 'Project')
+    ProjectTitle = apps.get_model('project_manager', 'ProjectTitle')
+    alias = schema_editor.connection.alias
+    aliases = sharding.shard_aliases()
+    if alias not in aliases:
+        return
+    for source in aliases:
+        if source != alias and not (_migrated(source, Project) and _migrated(source, ProjectTitle)):
+            continue
+        titles = Project.objects.using(source).values_list('title', flat=True).iterator(chunk_size=2000)
+        by_shard = {}
+        for title in titles:
+            target = sharding.shard_for_title(title)
+            if source == alias or target == alias:
+                by_shard.setdefault(target, []).append(ProjectTitle(title=title))
+        for target, registry in by_shard.items():
+            if target == alias or _migrated(target, ProjectTitle):
+                ProjectTitle.objects.using(target).bulk_create(registry, batch_size=500, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project_manager', '0009_project_admin_indexes'),
+    ]
+
+    operations = [
+        # model_name : la migration s'exécute aussi sur les shards (ShardRouter.allow_migrate)
+        migrations.RunPython(
+            backfill_project_titles, migrations.RunPython.noop, hints={'model_name': 'projecttitle'},
+        ),
+    ]
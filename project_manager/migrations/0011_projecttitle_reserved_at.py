@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project_manager', '0010_backfill_project_titles'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projecttitle',
+            name='reserved_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
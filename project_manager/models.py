@@ -1,17 +1,235 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Value
+from django.db.models.functions import Concat, Lower
+from django.utils import timezone
+
+from . import sharding
 
 class User(AbstractUser):
     """
     Modèle pour représenter un user.
     """
     email = models.EmailField(unique=True) # Email unique
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True) # Suppression demandée, purge en cours
+
+# Borne supérieure d'un préfixe : toute chaîne commençant par p est < p + LAST_CHAR
+LAST_CHAR = '\U0010ffff'
+
+def deleted_owners():
+    """
+    Comptes en cours de suppression, à exclure des résultats : sous-requête,
+    ou liste d'id si les projets sont shardés (pas de jointure entre bases).
+    """
+    owners = User.objects.filter(deleted_at__isnull=False).values('id')
+    return list(owners.values_list('id', flat=True)) if sharding.is_sharded() else owners
+
+class ProjectQuerySet(models.QuerySet):
+    def alive(self):
+        """
+        Exclut les projets dont le propriétaire est en cours de suppression.
+        Sous-requête plutôt que jointure : la table des projets reste la
+        table pilote et ses index servent les filtres de la liste.
+        """
+        return self.exclude(owner_id__in=deleted_owners())
+
+    def for_owner(self, owner_id):
+        """
+        Projets d'un propriétaire, lus sur son shard uniquement.
+        """
+        return self.filter(owner_id=owner_id).using(sharding.shard_for_owner(owner_id))
+
+    def title_startswith(self, prefix):
+        """
+        Projets dont le titre commence par ``prefix`` (insensible à la casse),
+        en intervalle sur ``LOWER(title)`` : servi par ``project_title_lower_idx``,
+        contrairement à ``LIKE``.
+        """
+        lower = Lower(Value(prefix))
+        return self.alias(title_lower=Lower('title')).filter(
+            title_lower__gte=lower, title_lower__lt=Concat(lower, Value(LAST_CHAR)),
+        )
+
+    def create(self, **kwargs):
+        if self._db is not None or not sharding.is_sharded():
+            return super().create(**kwargs)
+        owner_id = kwargs['owner'].pk if 'owner' in kwargs else kwargs.get('owner_id')
+        return super(ProjectQuerySet, self.using(sharding.shard_for_owner(owner_id))).create(**kwargs)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        if self._db is not None or not sharding.is_sharded():
+            return super().bulk_create(objs, *args, **kwargs)
+        from . import titles
+
+        objs = list(objs)
+        by_shard = {}
+        for obj in objs:
+            by_shard.setdefault(sharding.shard_for_owner(obj.owner_id), []).append(obj)
+        # Sans signaux : les titres sont réservés ici, comme dans reserve_project_title
+        pending = []
+        try:
+            for obj in objs:
+                titles.reserve(obj.title)
+                pending.append(obj.title)
+            for alias, group in by_shard.items():
+                super(ProjectQuerySet, self.using(alias)).bulk_create(group, *args, **kwargs)
+                written = {obj.title for obj in group}
+                transaction.on_commit(lambda written=written: [titles.confirm(title) for title in written], using=alias)
+                pending = [title for title in pending if title not in written]
+        finally:
+            # Titres des lignes non écrites (doublon, erreur d'un shard)
+            for title in pending:
+                titles.release(title)
+        return objs
+
+    def in_bulk(self, id_list=None, *, field_name='pk'):
+        if self._db is not None or not sharding.is_sharded() or id_list is None or field_name != 'pk':
+            return super().in_bulk(id_list, field_name=field_name)
+        # L'id désigne le shard : une requête IN par shard concerné
+        by_shard = {}
+        for pk in id_list:
+            alias = sharding.shard_for_pk(pk)
+            if alias is not None:
+                by_shard.setdefault(alias, []).append(pk)
+        found = {}
+        for alias, ids in by_shard.items():
+            found.update(super(ProjectQuerySet, self.using(alias)).in_bulk(ids))
+        return found
 
 class Project(models.Model):
     title = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True, null=True) # Description optionnelle
     created_at = models.DateTimeField(auto_now_add=True)
-    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='projects') # Suppression en cascade si owner supprimé
+    updated_at = models.DateTimeField(auto_now=True) # Mis à jour à chaque save(), sert de curseur au flux de synchro
+    # Suppression en cascade si owner supprimé ; pas de contrainte SQL : le projet peut être sur un autre shard que l'owner
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='projects', db_constraint=False)
+
+    objects = ProjectQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='project_updated_idx'),
+            models.Index(fields=['created_at'], name='project_created_idx'),
+            models.Index(Lower('title'), name='project_title_lower_idx'), # Recherche par préfixe du titre
+        ]
 
     def __str__(self):
         return self.title
+
+class ProjectTitle(models.Model):
+    """
+    Registre des titres de projets, réparti par hash du titre : garantit
+    l'unicité globale des titres quand les projets sont shardés.
+    """
+    title = models.CharField(max_length=100, unique=True)
+    # Renseigné tant que la transaction du projet n'a pas été validée (voir titles.py)
+    reserved_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.title
+
+class ProjectTombstone(models.Model):
+    """
+    Trace d'un projet supprimé, exposée par le flux de synchronisation.
+    """
+    project_id = models.BigIntegerField()
+    owner_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at', 'id'], name='tombstone_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"Projet {self.project_id} supprimé"
+
+class AccountPurge(models.Model):
+    """
+    Suivi de la purge en arrière-plan des projets d'un utilisateur supprimé.
+    """
+    user_id = models.BigIntegerField(unique=True)
+    username = models.CharField(max_length=150)
+    total = models.PositiveIntegerField(default=0) # Projets à supprimer au démarrage
+    deleted = models.PositiveIntegerField(default=0) # Projets déjà supprimés
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def progress(self):
+        if not self.total:
+            return 100 if self.finished_at else 0
+        return min(100, round(100 * self.deleted / self.total))
+
+    def __str__(self):
+        return f"Purge de {self.username} ({self.progress}%)"
+
+class Job(models.Model):
+    """
+    Tâche différée, exécutée par ``python manage.py run_worker``.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'En attente'),
+        (RUNNING, 'En cours'),
+        (DONE, 'Terminée'),
+        (FAILED, 'Échouée'),
+    ]
+
+    name = models.CharField(max_length=100) # Nom de la tâche enregistrée avec @task
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    priority = models.SmallIntegerField(default=0) # Plus grand = exécutée en premier
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    timeout = models.PositiveIntegerField(default=300) # Secondes
+    run_at = models.DateTimeField(default=timezone.now) # Pas avant cette date (retries)
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True) # Au-delà, le job est repris par un autre worker
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', '-priority', 'run_at'], name='job_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name}#{self.pk} ({self.status})"
+
+class ProjectDailyStat(models.Model):
+    """
+    Nombre de projets créés par jour et par propriétaire, tenu à jour à
+    chaque création / suppression (voir ``stats.py``).
+    """
+    day = models.DateField()
+    owner_id = models.BigIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'owner_id'], name='unique_stat_bucket'),
+        ]
+        indexes = [
+            models.Index(fields=['owner_id'], name='stat_owner_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} / {self.owner_id} : {self.count}"
+
+class RevokedToken(models.Model):
+    """
+    JWT révoqué avant son expiration (déconnexion), identifié par son ``jti``.
+    """
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True) # Au-delà, la ligne peut être supprimée
+    revoked_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.jti
+
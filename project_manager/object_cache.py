@@ -0,0 +1,188 @@
+"""
+Cache des représentations sérialisées, objet par objet (lecture
+« read-through ») : ``ProjectDetail``, ``UserDetail`` et
+``POST /api/projects/batch-get/``.
+
+Un objet en cache est servi sans requête SQL ni sérialiseur. Chaque entrée
+est enregistrée sous le pk et la version du schéma (empreinte des champs du
+sérialiseur : un déploiement qui les change ne relit pas les anciennes
+entrées). Elle porte aussi deux générations : celle de l'objet et celle de
+toute la catégorie. Une entrée n'est servie que si ces deux générations sont
+toujours à jour.
+
+- Les écritures (signaux ``post_save`` / ``post_delete``, après le commit)
+  incrémentent la génération de l'objet. Une lecture commencée avant
+  l'écriture ne peut donc pas réenregistrer l'ancienne version.
+- ``invalidate_all()`` incrémente la génération de la catégorie (suppression
+  d'un compte : ses projets disparaissent des lectures).
+- La taille est bornée par le cache partagé (``MAX_ENTRIES`` de ``CACHES``,
+  éviction LRU) ; ``OBJECT_CACHE_TTL_SECONDS`` borne la durée de vie d'une
+  entrée.
+- Un cache L1 optionnel, propre au worker (``OBJECT_CACHE_L1_MAX_ENTRIES``,
+  LRU), évite l'aller-retour au cache partagé. Un worker ne voit pas les
+  invalidations faites par les autres : ses entrées L1 vivent au plus
+  ``OBJECT_CACHE_L1_TTL_SECONDS``.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import cached_property
+
+from . import metrics
+from .serializers import ProjectSerializer, UserSerializer
+
+
+class LocalLRU:
+    """
+    Petit cache LRU en mémoire du worker, à durée de vie courte.
+    """
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        size = settings.OBJECT_CACHE_L1_MAX_ENTRIES
+        if size <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + settings.OBJECT_CACHE_L1_TTL_SECONDS, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > size:
+                self.entries.popitem(last=False)
+
+    def discard(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class ObjectCache:
+    """
+    Représentations de ``serializer_class`` en cache, par pk.
+    """
+
+    def __init__(self, name, serializer_class):
+        self.name = name
+        self.serializer_class = serializer_class
+        self.local = LocalLRU()
+
+    @cached_property
+    def prefix(self):
+        fields = sorted(self.serializer_class().fields)
+        schema = hashlib.sha256(f'{self.serializer_class.__name__}:{fields}'.encode()).hexdigest()[:12]
+        return f'object:{self.name}:{schema}'
+
+    def _scope_key(self):
+        return f'{self.prefix}:generation'
+
+    def _generation_key(self, pk):
+        return f'{self.prefix}:{pk}:generation'
+
+    def _key(self, pk):
+        return f'{self.prefix}:{pk}'
+
+    def _generations(self, keys, values):
+        generations = {key: values[key] for key in keys if key in values}
+        missing = [key for key in keys if key not in generations]
+        if missing:
+            # Valeur inédite : les entrées d'une génération évincée ne redeviennent pas valides
+            seed = time.time_ns()
+            for key in missing:
+                cache.add(key, seed, None)
+            generations.update(cache.get_many(missing))
+        return generations
+
+    def get(self, pk, load):
+        """
+        Représentation de l'objet ``pk``, ou ``load()`` (qui la calcule, ou
+        lève une exception : rien n'est alors mis en cache).
+        """
+        return self.get_many([pk], lambda missing: {pk: load()})[pk]
+
+    def get_many(self, pks, load):
+        """
+        Représentations des objets ``pks`` trouvés, par pk. ``load(missing)``
+        calcule celles qui manquent dans le cache, par pk ; les objets
+        qu'elle ne renvoie pas sont absents du résultat.
+        """
+        if not settings.OBJECT_CACHE_ENABLED:
+            return load(list(pks))
+        pks = list(pks)
+        found = {}
+        for pk in pks:
+            data = self.local.get(self._key(pk))
+            if data is not None:
+                found[pk] = data
+        remaining = [pk for pk in pks if pk not in found]
+        if not remaining:
+            metrics.record_cache(self.name, True, len(found))
+            return found
+
+        # Un seul aller-retour : générations et entrées
+        scope_key = self._scope_key()
+        generation_keys = [scope_key] + [self._generation_key(pk) for pk in remaining]
+        values = cache.get_many(generation_keys + [self._key(pk) for pk in remaining])
+        generations = self._generations(generation_keys, values)
+        missing = []
+        for pk in remaining:
+            generation = (generations[scope_key], generations[self._generation_key(pk)])
+            entry = values.get(self._key(pk))
+            if entry is not None and entry['generation'] == generation:
+                found[pk] = entry['data']
+                self.local.set(self._key(pk), entry['data'])
+            else:
+                missing.append(pk)
+        metrics.record_cache(self.name, True, len(found))
+        metrics.record_cache(self.name, False, len(missing))
+        if not missing:
+            return found
+
+        loaded = load(missing)
+        cache.set_many({
+            self._key(pk): {
+                'generation': (generations[scope_key], generations[self._generation_key(pk)]),
+                'data': data,
+            }
+            for pk, data in loaded.items()
+        }, settings.OBJECT_CACHE_TTL_SECONDS)
+        for pk, data in loaded.items():
+            self.local.set(self._key(pk), data)
+        found.update(loaded)
+        return found
+
+    def _increment(self, key):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), None)
+
+    def invalidate(self, pk):
+        self._increment(self._generation_key(pk))
+        self.local.discard(self._key(pk))
+
+    def invalidate_all(self):
+        self._increment(self._scope_key())
+        self.local.clear()
+
+
+project_cache = ObjectCache('project', ProjectSerializer)
+user_cache = ObjectCache('user', UserSerializer)
@@ -1,5 +1,14 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.paginator import InvalidPage
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 class CustomPagination(PageNumberPagination):
     """
@@ -8,6 +17,9 @@ class CustomPagination(PageNumberPagination):
     page_size = 2  # Nombre de projet par page
     page_size_query_param = 'page_size'  # Permet de modifier la taille des pages via un paramètre
     max_page_size = 50  # Limite maximale de la taille des pages
+    stream_query_param = 'stream'  # ?stream=1 : réponse streamée, pour les grandes pages
+    stream_max_page_size = 10000  # Limite de la taille des pages en mode streamé
+    stream_chunk_size = 500  # Projets lus en base et envoyés au client par paquet
 
     def get_paginated_response(self, data):
         """
@@ -20,4 +32,105 @@ class CustomPagination(PageNumberPagination):
             'next': self.get_next_link(),  # Lien vers la page suivante
             'previous': self.get_previous_link(),  # Lien vers la page précédente
             'results': data,  # Données pour la page actuelle
-        })
\ No newline at end of file
+        })
+
+    def get_page_data(self, data):
+        """
+        Contenu de ``get_paginated_response`` sans les liens, qui dépendent
+        de l'URL de la requête (forme mise en cache par ``list_cache``).
+        """
+        return {
+            'total_count': self.page.paginator.count,
+            'total_pages': self.page.paginator.num_pages,
+            'current_page': self.page.number,
+            'results': data,
+        }
+
+    def get_cached_response(self, data, request):
+        """
+        Réponse construite depuis ``get_page_data`` : ``next`` et
+        ``previous`` sont recalculés pour la requête courante.
+        """
+        number, url = data['current_page'], request.build_absolute_uri()
+        next_link = previous_link = None
+        if number < data['total_pages']:
+            next_link = replace_query_param(url, self.page_query_param, number + 1)
+        if number == 2:
+            previous_link = remove_query_param(url, self.page_query_param)
+        elif number > 2:
+            previous_link = replace_query_param(url, self.page_query_param, number - 1)
+        return Response({
+            'total_count': data['total_count'],
+            'total_pages': data['total_pages'],
+            'current_page': number,
+            'next': next_link,
+            'previous': previous_link,
+            'results': data['results'],
+        })
+
+    def wants_stream(self, request):
+        return request.query_params.get(self.stream_query_param, '').lower() in ('1', 'true')
+
+    def get_stream_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.stream_max_page_size)
+
+    def get_streaming_response(self, queryset, request, to_representation):
+        """
+        Même enveloppe que ``get_paginated_response``, mais les résultats sont
+        lus en base et encodés par paquets de ``stream_chunk_size`` : la
+        mémoire utilisée ne dépend pas de la taille de la page.
+        """
+        paginator = self.django_paginator_class(queryset, self.get_stream_page_size(request))
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        self.request = request
+
+        header = {
+            'total_count': paginator.count,
+            'total_pages': paginator.num_pages,
+            'current_page': self.page.number,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+        }
+        chunks = self._stream(header, self.page.object_list, to_representation)
+        if isinstance(request._request, ASGIRequest):
+            chunks = _async_chunks(chunks)
+        return StreamingHttpResponse(chunks, content_type='application/json')
+
+    def _stream(self, header, object_list, to_representation):
+        def dumps(data):
+            return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+        # L'en-tête sans son '}' final, puis la liste des résultats
+        yield (dumps(header)[:-1] + ',"results":[').encode()
+        chunk, first = [], True
+        for obj in object_list.iterator(chunk_size=self.stream_chunk_size):
+            chunk.append(dumps(to_representation(obj)))
+            if len(chunk) >= self.stream_chunk_size:
+                yield (('' if first else ',') + ','.join(chunk)).encode()
+                chunk, first = [], False
+        if chunk:
+            yield (('' if first else ',') + ','.join(chunk)).encode()
+        yield b']}'
+
+
+async def _async_chunks(chunks):
+    """
+    Sous ASGI, Django lit un itérateur synchrone en entier
+    (``sync_to_async(list)``) avant de l'envoyer : chaque paquet est produit
+    à la demande dans le thread des vues synchrones (requêtes SQL comprises).
+    """
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    try:
+        while (chunk := await next_chunk(chunks, None)) is not None:
+            yield chunk
+    finally:
+        # Client déconnecté : libère le curseur de ``iterator()``
+        await sync_to_async(chunks.close, thread_sensitive=True)()
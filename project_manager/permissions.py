@@ -4,4 +4,5 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS:
             return True
-        return obj.owner == request.user
+        # Compare les ids : évite de charger obj.owner (une requête SQL de plus)
+        return obj.owner_id == request.user.id
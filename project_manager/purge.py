@@ -0,0 +1,70 @@
+"""
+Suppression différée des comptes utilisateurs.
+
+``UserDetail.delete`` ne fait qu'un marquage (``deleted_at``) : un job
+``project_manager.purge_user`` supprime ensuite les projets du compte par
+petits lots, chacun dans sa propre transaction, pour ne jamais garder le
+verrou d'écriture SQLite longtemps.
+"""
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import AccountPurge, Project, User
+
+
+def soft_delete_user(user):
+    """
+    Marque le compte comme supprimé et planifie la purge de ses projets.
+    """
+    with transaction.atomic():
+        user.deleted_at = timezone.now()
+        user.is_active = False
+        user.save(update_fields=['deleted_at', 'is_active'])
+        AccountPurge.objects.update_or_create(
+            user_id=user.pk,
+            defaults={'username': user.username, 'total': user.projects.count(), 'deleted': 0},
+        )
+        transaction.on_commit(lambda: start_purge(user.pk))
+
+
+def start_purge(user_id):
+    from .jobs import enqueue
+    enqueue('project_manager.purge_user', user_id, priority=-1, timeout=3600)
+
+
+def purge_user(user_id, batch_size=None, on_progress=None):
+    """
+    Supprime les projets de l'utilisateur par lots de ``batch_size``, puis le
+    compte lui-même. Idempotent : peut être relancé après une interruption.
+    """
+    batch_size = batch_size or settings.PROJECT_PURGE_BATCH_SIZE
+    purge = AccountPurge.objects.filter(user_id=user_id).first()
+    if purge is None:
+        user = User.objects.get(pk=user_id)
+        purge = AccountPurge.objects.create(
+            user_id=user_id, username=user.username, total=user.projects.count(),
+        )
+
+    projects = Project.objects.for_owner(user_id)
+    while True:
+        ids = list(projects.order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        with transaction.atomic(using=projects.db):
+            deleted, _ = projects.filter(id__in=ids).delete()
+            AccountPurge.objects.filter(pk=purge.pk).update(deleted=F('deleted') + deleted)
+        if on_progress:
+            purge.refresh_from_db()
+            on_progress(purge)
+        # Laisse passer les autres écritures entre deux lots
+        time.sleep(settings.PROJECT_PURGE_PAUSE_SECONDS)
+
+    with transaction.atomic():
+        User.objects.filter(pk=user_id, deleted_at__isnull=False).delete()
+        AccountPurge.objects.filter(pk=purge.pk).update(finished_at=timezone.now())
+    purge.refresh_from_db()
+    return purge
@@ -0,0 +1,108 @@
+"""
+Budget de requêtes SQL par vue et par méthode HTTP.
+
+Une vue déclare son budget avec un attribut de classe::
+
+    class ProjectDetail(generics.RetrieveUpdateDestroyAPIView):
+        query_budget = {'GET': 2, 'PUT': 4}
+
+``QueryBudgetMiddleware`` compte les requêtes exécutées pendant la requête
+HTTP. En test (``QUERY_BUDGET_ENFORCE``), un dépassement lève
+``QueryBudgetExceeded`` avec le SQL et la pile d'appel de chaque requête ;
+en production, une fraction ``QUERY_BUDGET_SAMPLE_RATE`` des requêtes est
+contrôlée et les dépassements sont journalisés.
+"""
+import logging
+import random
+import threading
+import traceback
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+# Les savepoints encadrent les transactions imbriquées, ce ne sont pas des lectures cachées
+IGNORED_PREFIXES = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def exempt():
+    """
+    Exclut du budget les requêtes de maintenance amorties sur plusieurs
+    requêtes HTTP (construction ou rattrapage d'un cache de worker).
+    """
+    _local.exempt = getattr(_local, 'exempt', 0) + 1
+    try:
+        yield
+    finally:
+        _local.exempt -= 1
+
+
+class QueryRecorder:
+    def __init__(self, capture_stacks):
+        self.capture_stacks = capture_stacks
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not getattr(_local, 'exempt', 0) and not sql.lstrip().upper().startswith(IGNORED_PREFIXES):
+            stack = self._app_stack() if self.capture_stacks else None
+            self.queries.append((sql, stack))
+        return execute(sql, params, many, context)
+
+    @staticmethod
+    def _app_stack():
+        # Seules les frames du projet aident à trouver l'origine de la requête
+        base_dir = str(settings.BASE_DIR)
+        return [
+            frame for frame in traceback.extract_stack()[:-2]
+            if frame.filename.startswith(base_dir) and 'site-packages' not in frame.filename
+        ]
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        enforce = settings.QUERY_BUDGET_ENFORCE
+        if not enforce and random.random() >= settings.QUERY_BUDGET_SAMPLE_RATE:
+            return self.get_response(request)
+
+        recorder = QueryRecorder(capture_stacks=enforce)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+
+        budget = getattr(request, 'query_budget', None)
+        if budget is not None and len(recorder.queries) > budget:
+            self.report(request, budget, recorder.queries, enforce)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'view_class', None)
+        budgets = getattr(view_class, 'query_budget', None) or {}
+        request.query_budget = budgets.get(request.method)
+        request.query_budget_view = getattr(view_class, '__name__', view_func.__name__)
+
+    def report(self, request, budget, queries, enforce):
+        header = (
+            f"{request.query_budget_view} {request.method} {request.path} : "
+            f"{len(queries)} requêtes SQL pour un budget de {budget}"
+        )
+        if not enforce:
+            logger.warning("%s\n%s", header, "\n".join(sql for sql, _ in queries))
+            return
+        lines = [header]
+        for i, (sql, stack) in enumerate(queries, 1):
+            lines.append(f"{i}. {sql}")
+            lines.extend(f"     {frame.filename}:{frame.lineno} in {frame.name}" for frame in stack)
+        raise QueryBudgetExceeded("\n".join(lines))
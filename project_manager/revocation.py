@@ -0,0 +1,123 @@
+"""
+Révocation des JWT avec un filtre de Bloom par worker.
+
+Chaque worker garde en mémoire un filtre de Bloom des ``jti`` révoqués. Un
+jeton absent du filtre n'est certainement pas révoqué : le cas courant ne
+coûte aucune requête SQL. Seuls les jetons présents dans le filtre (révoqués,
+ou rares faux positifs) sont vérifiés en base.
+
+Le filtre rattrape les révocations des autres workers toutes les
+``REVOCATION_REFRESH_SECONDS`` (lecture des lignes d'id supérieur au dernier
+vu) et est reconstruit toutes les ``REVOCATION_REBUILD_SECONDS`` après
+suppression des révocations expirées (un filtre de Bloom ne sait pas retirer
+un élément).
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from . import query_budget
+from .models import RevokedToken
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # Double hachage : k positions à partir de deux empreintes de 64 bits
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationList:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._filter = None
+        self._last_id = 0
+        self._synced_at = self._built_at = 0.0
+
+    def rebuild(self):
+        """
+        Supprime les révocations expirées puis recharge le filtre depuis la base.
+        """
+        RevokedToken.objects.filter(expires_at__lt=timezone.now()).delete()
+        rows = list(RevokedToken.objects.values_list('id', 'jti'))
+        bloom = BloomFilter(
+            max(settings.REVOCATION_BLOOM_CAPACITY, 2 * len(rows)),
+            settings.REVOCATION_BLOOM_ERROR_RATE,
+        )
+        for _, jti in rows:
+            bloom.add(jti)
+        with self._lock:
+            self._filter = bloom
+            self._last_id = max((pk for pk, _ in rows), default=self._last_id)
+            self._synced_at = self._built_at = time.monotonic()
+
+    def sync(self):
+        """
+        Ajoute au filtre les révocations faites par les autres workers.
+        """
+        rows = list(RevokedToken.objects.filter(id__gt=self._last_id).values_list('id', 'jti'))
+        with self._lock:
+            for pk, jti in rows:
+                self._filter.add(jti)
+                self._last_id = max(self._last_id, pk)
+            self._synced_at = time.monotonic()
+            overfull = self._filter.count > self._filter.capacity
+        if overfull:
+            self.rebuild()
+
+    def _ensure_fresh(self):
+        now = time.monotonic()
+        # Maintenance amortie sur toutes les requêtes du worker
+        with query_budget.exempt():
+            if self._filter is None or now - self._built_at > settings.REVOCATION_REBUILD_SECONDS:
+                self.rebuild()
+            elif now - self._synced_at > settings.REVOCATION_REFRESH_SECONDS:
+                self.sync()
+
+    def is_revoked(self, jti):
+        self._ensure_fresh()
+        if jti not in self._filter:
+            return False
+        return RevokedToken.objects.filter(jti=jti).exists()
+
+    def revoke(self, token):
+        """
+        Révoque un jeton simplejwt (accès ou refresh) jusqu'à son expiration.
+        """
+        jti = token[api_settings.JTI_CLAIM]
+        expires_at = datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc)
+        RevokedToken.objects.get_or_create(jti=jti, defaults={'expires_at': expires_at})
+        self._ensure_fresh()
+        with self._lock:
+            self._filter.add(jti)
+
+    def reset(self):
+        with self._lock:
+            self._filter = None
+            self._last_id = 0
+
+
+revocation_list = RevocationList()
@@ -1,9 +1,16 @@
+from django.conf import settings
 from rest_framework import serializers
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework.exceptions import ValidationError as DRFValidationError
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
 from .models import User, Project
+from . import sharding, titles
+from .revocation import revocation_list
 
 class UserSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
@@ -28,15 +35,26 @@ class ProjectSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Project
-        fields = ['id', 'title', 'description', 'created_at', 'owner']
+        fields = ['id', 'title', 'description', 'created_at', 'updated_at', 'owner']
         read_only_fields = ['id','owner']
+        # L'unicité du titre est vérifiée dans validate_title (registre global si shardé)
+        extra_kwargs = {'title': {'validators': []}}
         
     def validate_title(self, value):
         """
-        Vérifie que le titre comporte au moins 5 caractères.
+        Vérifie que le titre comporte au moins 5 caractères et qu'il n'est
+        pas déjà utilisé par un autre projet.
         """
         if len(value) < 5:
             raise serializers.ValidationError("Le titre doit contenir au moins 5 caractères.")
+        if self.instance is not None and self.instance.title == value:
+            return value
+        if sharding.is_sharded():
+            taken = titles.is_taken(value)
+        else:
+            taken = Project.objects.filter(title=value).exists()
+        if taken:
+            raise serializers.ValidationError("Un projet avec ce titre existe déjà.")
         return value
     def validate_description(self, value):
         """
@@ -50,3 +68,58 @@ class ProjectSerializer(serializers.ModelSerializer):
                     f"Le mot '{word}' est interdit dans le contenu."
                 )
         return value
+
+class OwnerSummarySerializer(serializers.ModelSerializer):
+    """
+    Propriétaire d'un projet (``?include=owner``) ; comme dans ``UserDetail``,
+    l'email n'est visible que de l'utilisateur lui-même (et du staff).
+    """
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'email']
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        request = self.context.get('request')
+        viewer = request.user if request is not None else None
+        if viewer is None or not (viewer.is_staff or viewer.pk == instance.pk):
+            data.pop('email')
+        return data
+
+class RevocableTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refuse de rafraîchir un refresh token révoqué.
+    """
+    def validate(self, attrs):
+        try:
+            refresh = RefreshToken(attrs['refresh'])
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+        if revocation_list.is_revoked(refresh[api_settings.JTI_CLAIM]):
+            raise InvalidToken("Ce jeton a été révoqué.")
+        return super().validate(attrs)
+
+class LogoutSerializer(serializers.Serializer):
+    refresh = serializers.CharField(required=False)
+
+    def validate_refresh(self, value):
+        try:
+            refresh = RefreshToken(value)
+        except TokenError as e:
+            raise serializers.ValidationError(e.args[0])
+        user_id = getattr(self.context['request'].user, api_settings.USER_ID_FIELD)
+        if str(refresh.get(api_settings.USER_ID_CLAIM)) != str(user_id):
+            raise serializers.ValidationError("Ce jeton appartient à un autre utilisateur.")
+        return refresh
+
+
+
+class ProjectBatchGetSerializer(serializers.Serializer):
+    # Borne haute : au-delà d'un entier 64 bits, SQLite lève OverflowError
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1, max_value=2**63 - 1), allow_empty=False)
+
+    def validate_ids(self, value):
+        limit = settings.PROJECT_BATCH_GET_MAX_IDS
+        if len(value) > limit:
+            raise serializers.ValidationError(f"Au plus {limit} id par requête.")
+        return list(dict.fromkeys(value))  # Sans doublons, dans l'ordre demandé
@@ -0,0 +1,236 @@
+"""
+Répartition des projets sur plusieurs bases (shards).
+
+SQLite n'accepte qu'un écrivain à la fois par fichier : pour augmenter le
+débit d'écriture, les données des projets sont réparties sur
+``PROJECT_SHARD_COUNT`` bases. Le shard 0 est l'alias ``default``, le shard
+``n`` l'alias ``shard_<n>``. Les utilisateurs et toutes les autres tables
+restent sur ``default``.
+
+- ``Project``, ``ProjectTombstone`` et ``ProjectDailyStat`` sont placés sur le
+  shard de leur propriétaire (hash de ``owner_id``) : un projet, sa
+  tombstone et ses statistiques sont écrits dans la même transaction.
+- ``ProjectTitle`` est placé selon le hash du titre et garantit l'unicité
+  globale des titres.
+- Les id des projets et tombstones du shard ``n`` commencent à ``n << 48`` :
+  le shard d'un projet se déduit de son id (``shard_for_pk``).
+
+Les requêtes non limitées à un propriétaire sont envoyées à tous les shards
+et leurs résultats fusionnés selon le tri demandé (``fan_out``).
+"""
+import heapq
+import zlib
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+
+SHARD_PREFIX = 'shard_'
+ID_BITS = 48  # 2**48 id par shard
+# Modèles répartis entre les shards (les autres restent sur ``default``)
+OWNER_SHARDED = {'project', 'projecttombstone', 'projectdailystat'}
+TITLE_SHARDED = {'projecttitle'}
+SHARDED = OWNER_SHARDED | TITLE_SHARDED
+
+
+def shard_aliases():
+    return ['default'] + [f'{SHARD_PREFIX}{i}' for i in range(1, settings.PROJECT_SHARD_COUNT)]
+
+
+def is_sharded():
+    return settings.PROJECT_SHARD_COUNT > 1
+
+
+def shard_index(alias):
+    if alias == 'default':
+        return 0
+    if alias.startswith(SHARD_PREFIX):
+        return int(alias[len(SHARD_PREFIX):])
+    return None
+
+
+def _pick(value):
+    aliases = shard_aliases()
+    if len(aliases) == 1:
+        return aliases[0]
+    # crc32 : stable d'un processus à l'autre, contrairement à hash()
+    return aliases[zlib.crc32(str(value).encode()) % len(aliases)]
+
+
+def shard_for_owner(owner_id):
+    return _pick(owner_id)
+
+
+def shard_for_title(title):
+    return _pick(title)
+
+
+def shard_for_pk(pk):
+    """
+    Alias du shard d'un projet d'après son id, ``None`` si l'id est invalide.
+    """
+    try:
+        index = int(pk) >> ID_BITS
+    except (TypeError, ValueError):
+        return None
+    aliases = shard_aliases()
+    return aliases[index] if 0 <= index < len(aliases) else None
+
+
+def each_shard(queryset):
+    """
+    La requête sur chaque shard (ou telle quelle si les projets ne sont pas shardés).
+    """
+    if not is_sharded() or queryset._db is not None:
+        return [queryset]
+    return [queryset.using(alias) for alias in shard_aliases()]
+
+
+def seed_id_sequence(using, **kwargs):
+    """
+    Receiver ``post_migrate`` : fait commencer les id du shard ``n`` à ``n << 48``.
+    """
+    index = shard_index(using)
+    if not index:
+        return
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        raise ImproperlyConfigured("Le sharding des projets ne gère que SQLite.")
+    from .models import Project, ProjectTombstone
+
+    start = index << ID_BITS
+    with connection.cursor() as cursor:
+        for model in (Project, ProjectTombstone):
+            table = model._meta.db_table
+            cursor.execute(
+                "INSERT INTO sqlite_sequence (name, seq) SELECT %s, %s "
+                "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = %s)",
+                [table, start, table],
+            )
+            cursor.execute("UPDATE sqlite_sequence SET seq = %s WHERE name = %s AND seq < %s", [start, table, start])
+
+
+class ShardRouter:
+    """
+    Routeur Django : place les modèles shardés d'après l'instance concernée,
+    tout le reste sur ``default``.
+    """
+
+    def _route(self, model, **hints):
+        if model._meta.app_label != 'project_manager' or model._meta.model_name not in SHARDED:
+            return 'default'
+        instance = hints.get('instance')
+        if instance is None:
+            return None
+        if not isinstance(instance, model):
+            # Manager inverse (``user.projects``) : le shard du propriétaire
+            return shard_for_owner(instance.pk) if model._meta.model_name in OWNER_SHARDED else None
+        if instance._state.db:
+            return instance._state.db
+        if model._meta.model_name in TITLE_SHARDED:
+            return shard_for_title(instance.title)
+        return shard_for_owner(instance.owner_id)
+
+    db_for_read = _route
+    db_for_write = _route
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Un projet sur un shard référence son propriétaire sur ``default``
+        if {obj1._meta.model_name, obj2._meta.model_name} & SHARDED:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if not db.startswith(SHARD_PREFIX):
+            return None
+        return app_label == 'project_manager' and model_name in SHARDED
+
+
+class _Descending:
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+class FanOut:
+    """
+    Requête exécutée sur tous les shards, résultats fusionnés selon son tri
+    (``id`` ajouté pour départager). Fournit ce qu'utilisent la pagination
+    et le streaming : ``count()``, découpage, itération, ``iterator()``.
+
+    Une tranche ``[a:b]`` lit au plus ``b`` lignes par shard : les pages
+    lointaines coûtent plus cher, préférer alors le flux ``changes``.
+    """
+    ordered = True
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+        ordering = [f.replace('pk', 'id') for f in (queryset.query.order_by or ['id'])]
+        if not {'id', '-id'} & set(ordering):
+            ordering.append('id')
+        self.ordering = ordering
+        self._low, self._high = 0, None
+        self._result_cache = None
+
+    def _sort_key(self, obj):
+        key = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            value = obj[name] if isinstance(obj, dict) else getattr(obj, name)
+            key.append(_Descending(value) if field.startswith('-') else value)
+        return key
+
+    def _clone(self, low, high):
+        clone = FanOut.__new__(FanOut)
+        clone.queryset, clone.ordering = self.queryset, self.ordering
+        clone._low, clone._high = low, high
+        clone._result_cache = None
+        return clone
+
+    def count(self):
+        return sum(self.queryset.using(alias).count() for alias in shard_aliases())
+
+    def __getitem__(self, k):
+        if isinstance(k, int):
+            return list(self[k:k + 1])[0]
+        if k.step is not None or (k.start or 0) < 0 or (k.stop is not None and k.stop < 0):
+            raise ValueError("FanOut ne gère que les tranches positives sans pas.")
+        low = self._low + (k.start or 0)
+        high = self._low + k.stop if k.stop is not None else self._high
+        if self._high is not None and high is not None:
+            high = min(high, self._high)
+        return self._clone(low, high)
+
+    def iterator(self, chunk_size=2000):
+        querysets = [self.queryset.using(alias).order_by(*self.ordering) for alias in shard_aliases()]
+        if self._high is not None:
+            querysets = [queryset[:self._high] for queryset in querysets]
+        merged = heapq.merge(*(queryset.iterator(chunk_size=chunk_size) for queryset in querysets), key=self._sort_key)
+        return islice(merged, self._low, self._high)
+
+    def __iter__(self):
+        if self._result_cache is None:
+            self._result_cache = list(self.iterator())
+        return iter(self._result_cache)
+
+    def __len__(self):
+        if self._result_cache is None:
+            self._result_cache = list(self.iterator())
+        return len(self._result_cache)
+
+
+def fan_out(queryset):
+    """
+    ``FanOut`` sur tous les shards, ou la requête telle quelle si un seul shard est concerné.
+    """
+    if not is_sharded() or queryset._db is not None:
+        return queryset
+    return FanOut(queryset)
@@ -0,0 +1,132 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .autocomplete import title_index
+from .events import broadcaster
+from .models import Project, ProjectTombstone, User
+from .serializers import ProjectSerializer
+from . import list_cache, sharding, stats, titles
+from .object_cache import project_cache, user_cache
+
+
+@receiver(post_delete, sender=Project)
+def record_project_tombstone(sender, instance, using, **kwargs):
+    """
+    Garde une trace de la suppression pour le flux de synchronisation.
+    """
+    ProjectTombstone.objects.using(using).create(project_id=instance.pk, owner_id=instance.owner_id)
+
+
+@receiver(post_save, sender=Project)
+def broadcast_project_saved(sender, instance, created, using, **kwargs):
+    if not len(broadcaster):
+        return
+    event = 'created' if created else 'updated'
+    owner_id, data = instance.owner_id, ProjectSerializer(instance).data
+    transaction.on_commit(lambda: broadcaster.publish(event, owner_id, data), using=using)
+
+
+@receiver(post_delete, sender=Project)
+def broadcast_project_deleted(sender, instance, using, **kwargs):
+    if not len(broadcaster):
+        return
+    owner_id, data = instance.owner_id, {'id': instance.pk}
+    transaction.on_commit(lambda: broadcaster.publish('deleted', owner_id, data), using=using)
+
+
+@receiver(post_save, sender=Project)
+def index_project_title(sender, instance, using, **kwargs):
+    pk, title, owner_id = instance.pk, instance.title, instance.owner_id
+    transaction.on_commit(lambda: title_index.add(pk, title, owner_id), using=using)
+
+
+@receiver(post_delete, sender=Project)
+def unindex_project_title(sender, instance, using, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: title_index.remove(pk), using=using)
+
+
+@receiver(post_save, sender=User)
+def unindex_deleted_owner(sender, instance, **kwargs):
+    if instance.deleted_at is not None:
+        owner_id = instance.pk
+        transaction.on_commit(lambda: title_index.remove_owner(owner_id))
+
+
+@receiver(post_save, sender=Project)
+def count_project_created(sender, instance, created, using, **kwargs):
+    if created:
+        stats.record_created(instance, using)
+
+
+@receiver(post_delete, sender=Project)
+def count_project_deleted(sender, instance, using, **kwargs):
+    stats.record_deleted(instance, using)
+
+
+@receiver(pre_save, sender=Project)
+def reserve_project_title(sender, instance, using, **kwargs):
+    """
+    Avec plusieurs shards, la contrainte ``unique`` de chaque base ne suffit
+    plus : le titre est réservé dans ``ProjectTitle`` avant l'écriture.
+    """
+    instance._reserved_title = instance._released_title = None
+    if not sharding.is_sharded():
+        return
+    previous = None
+    if instance.pk is not None:
+        previous = Project.objects.using(using).filter(pk=instance.pk).values_list('title', flat=True).first()
+    if previous == instance.title:
+        return
+    titles.reserve(instance.title)
+    instance._reserved_title, instance._released_title = instance.title, previous
+
+
+@receiver(post_save, sender=Project)
+def settle_project_titles(sender, instance, using, **kwargs):
+    # Au commit de la transaction du projet : si elle est annulée, la
+    # réservation reste en attente et l'ancien titre reste pris
+    reserved = getattr(instance, '_reserved_title', None)
+    released = getattr(instance, '_released_title', None)
+    if reserved is not None:
+        transaction.on_commit(lambda: titles.confirm(reserved), using=using)
+    if released is not None:
+        transaction.on_commit(lambda: titles.release(released), using=using)
+
+
+@receiver(post_delete, sender=Project)
+def release_deleted_title(sender, instance, using, **kwargs):
+    if sharding.is_sharded():
+        title = instance.title
+        transaction.on_commit(lambda: titles.release(title), using=using)
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def invalidate_project_list(sender, using, **kwargs):
+    transaction.on_commit(list_cache.invalidate, using=using)
+
+
+@receiver(post_save, sender=User)
+def invalidate_list_of_deleted_owner(sender, instance, **kwargs):
+    # Les projets d'un compte supprimé disparaissent de la liste
+    if instance.deleted_at is not None:
+        transaction.on_commit(list_cache.invalidate)
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def invalidate_cached_project(sender, instance, using, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: project_cache.invalidate(pk), using=using)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: user_cache.invalidate(pk))
+    if instance.deleted_at is not None:
+        # Les projets d'un compte supprimé ne sont plus servis (rare : toute la catégorie)
+        transaction.on_commit(project_cache.invalidate_all)
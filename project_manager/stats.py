@@ -0,0 +1,117 @@
+"""
+Statistiques de projets maintenues de façon incrémentale.
+
+``ProjectDailyStat`` garde un compteur par (jour de création, propriétaire),
+incrémenté / décrémenté par les signaux de ``Project`` dans la même
+transaction que l'écriture. Les lectures agrègent ces compteurs : leur coût
+dépend du nombre de buckets, pas du nombre de projets.
+
+Les buckets sont sur le shard de leur propriétaire, comme ses projets : les
+lectures somment les résultats de chaque shard.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import sharding
+from .models import Project, ProjectDailyStat, User, deleted_owners
+
+
+def _bucket(project):
+    return timezone.localtime(project.created_at).date(), project.owner_id
+
+
+def record_created(project, using='default'):
+    day, owner_id = _bucket(project)
+    buckets = ProjectDailyStat.objects.using(using).filter(day=day, owner_id=owner_id)
+    if buckets.update(count=F('count') + 1):
+        return
+    try:
+        with transaction.atomic(using=using):
+            ProjectDailyStat.objects.using(using).create(day=day, owner_id=owner_id, count=1)
+    except IntegrityError:
+        # Bucket créé entre-temps par une autre requête
+        buckets.update(count=F('count') + 1)
+
+
+def record_deleted(project, using='default'):
+    day, owner_id = _bucket(project)
+    ProjectDailyStat.objects.using(using).filter(day=day, owner_id=owner_id).update(count=F('count') - 1)
+
+
+def recount(using=None):
+    """
+    Comptage complet depuis la table des projets : ``{(jour, owner_id): nombre}``.
+    Sans ``using``, tous les shards sont comptés.
+    """
+    rows = (
+        Project.objects.annotate(day=TruncDate('created_at'))
+        .values_list('day', 'owner_id').annotate(n=Count('id')).order_by()
+    )
+    queries = [rows.using(using)] if using else sharding.each_shard(rows)
+    return {(day, owner_id): n for query in queries for day, owner_id, n in query}
+
+
+def rebuild():
+    """
+    Recalcule entièrement la table de statistiques (backfill), shard par shard.
+    """
+    for alias in sharding.shard_aliases():
+        with transaction.atomic(using=alias):
+            ProjectDailyStat.objects.using(alias).all().delete()
+            ProjectDailyStat.objects.using(alias).bulk_create(
+                [ProjectDailyStat(day=day, owner_id=owner_id, count=n) for (day, owner_id), n in recount(alias).items()],
+                batch_size=500,
+            )
+
+
+def check_consistency():
+    """
+    Compare la table de statistiques à un comptage complet.
+    Retourne la liste des écarts ``(jour, owner_id, attendu, stocké)``.
+    """
+    stored = Counter({
+        (day, owner_id): n
+        for query in sharding.each_shard(ProjectDailyStat.objects.values_list('day', 'owner_id', 'count'))
+        for day, owner_id, n in query
+        if n
+    })
+    expected = Counter(recount())
+    return [
+        (day, owner_id, expected[day, owner_id], stored[day, owner_id])
+        for day, owner_id in sorted(set(stored) | set(expected))
+        if expected[day, owner_id] != stored[day, owner_id]
+    ]
+
+
+def summary(days=None, top=10):
+    """
+    Projets créés par jour, total et propriétaires les plus actifs.
+    Les comptes en cours de suppression sont ignorés.
+    """
+    buckets = ProjectDailyStat.objects.exclude(owner_id__in=deleted_owners())
+    if days:
+        buckets = buckets.filter(day__gt=timezone.localdate() - timedelta(days=days))
+
+    totals = Counter()
+    owners = []
+    for query in sharding.each_shard(buckets):
+        for row in query.values('day').annotate(total=Sum('count')).order_by('day'):
+            totals[row['day']] += row['total']
+        # Un propriétaire n'est que sur un shard : le top global est parmi les tops locaux
+        owners += query.values('owner_id').annotate(total=Sum('count')).filter(total__gt=0).order_by('-total', 'owner_id')[:top]
+    per_day = [{'day': day, 'count': n} for day, n in sorted(totals.items()) if n]
+    owners = sorted(owners, key=lambda o: (-o['total'], o['owner_id']))[:top]
+    usernames = dict(User.objects.filter(id__in=[o['owner_id'] for o in owners]).values_list('id', 'username'))
+    return {
+        'total': sum(row['count'] for row in per_day),
+        'per_day': per_day,
+        'top_owners': [
+            {'owner': o['owner_id'], 'username': usernames.get(o['owner_id']), 'count': o['total']}
+            for o in owners
+        ],
+    }
@@ -0,0 +1,128 @@
+"""
+Flux de synchronisation incrémental des projets.
+
+Le jeton ``since`` est opaque pour le client : il contient deux curseurs
+``(horodatage, id)``, un pour les projets (``updated_at``) et un pour les
+tombstones (``deleted_at``). Chaque appel ne lit que les lignes situées après
+ces curseurs, via les index ``project_updated_idx`` et ``tombstone_deleted_idx``.
+Avec plusieurs shards, chaque lecture est faite sur tous les shards et
+fusionnée (les id sont uniques entre shards, voir ``sharding``).
+
+Les horodatages sont posés en Python avant la prise du verrou d'écriture :
+les lignes ne sont pas validées dans l'ordre de leur horodatage. Une ligne
+horodatée avant le curseur d'un client mais validée après lui échapperait
+pour toujours. Seules les lignes antérieures à ``now - SYNC_LAG_SECONDS``
+sont donc lues, et les curseurs ne dépassent jamais cet horizon : une
+transaction plus longue que ce délai peut encore être manquée.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Project, ProjectTombstone
+from .sharding import fan_out
+
+TOKEN_SALT = 'project_manager.sync'
+
+
+class InvalidSyncToken(Exception):
+    pass
+
+
+def _dump_cursor(cursor):
+    if cursor is None:
+        return None
+    ts, pk = cursor
+    return [ts.isoformat(), pk]
+
+
+def _load_cursor(raw):
+    if raw is None:
+        return None
+    ts, pk = raw
+    return datetime.fromisoformat(ts), int(pk)
+
+
+def encode_token(project_cursor, tombstone_cursor):
+    return signing.dumps(
+        {'p': _dump_cursor(project_cursor), 't': _dump_cursor(tombstone_cursor)},
+        salt=TOKEN_SALT, compress=True,
+    )
+
+
+def horizon():
+    """
+    Instant avant lequel toutes les écritures sont considérées comme validées.
+    """
+    return timezone.now() - timedelta(seconds=settings.SYNC_LAG_SECONDS)
+
+
+def current_token():
+    """
+    Jeton pointant sur l'horizon : seuls les changements à venir (et ceux
+    encore en cours de validation) seront lus.
+    """
+    since = horizon()
+    return encode_token((since, 0), (since, 0))
+
+
+def decode_token(token):
+    """
+    Retourne ``(curseur_projets, curseur_tombstones)``.
+    Sans jeton, on repart du début pour les projets ; les suppressions
+    antérieures n'ont pas d'intérêt pour un client qui n'a encore rien reçu.
+    """
+    if not token:
+        return None, (horizon(), 0)
+    try:
+        data = signing.loads(token, salt=TOKEN_SALT)
+        return _load_cursor(data['p']), _load_cursor(data['t'])
+    except (signing.BadSignature, KeyError, TypeError, ValueError) as e:
+        raise InvalidSyncToken(str(e))
+
+
+def _after(queryset, field, cursor):
+    if cursor is None:
+        return queryset
+    ts, pk = cursor
+    return queryset.filter(Q(**{f'{field}__gt': ts}) | Q(**{field: ts, 'id__gt': pk}))
+
+
+def get_changes(token, limit):
+    """
+    Retourne ``(changements, nouveau_jeton, has_more)``.
+
+    ``changements`` est une liste de tuples ``('upsert', projet)`` ou
+    ``('delete', tombstone)`` triée par date de modification.
+    """
+    project_cursor, tombstone_cursor = decode_token(token)
+    until = horizon()
+
+    projects = list(fan_out(
+        _after(Project.objects.alive(), 'updated_at', project_cursor)
+        .filter(updated_at__lte=until)
+        .order_by('updated_at', 'id')
+    )[:limit + 1])
+    tombstones = list(fan_out(
+        _after(ProjectTombstone.objects.all(), 'deleted_at', tombstone_cursor)
+        .filter(deleted_at__lte=until)
+        .order_by('deleted_at', 'id')
+    )[:limit + 1])
+
+    merged = sorted(
+        [(p.updated_at, 0, p.id, 'upsert', p) for p in projects]
+        + [(t.deleted_at, 1, t.id, 'delete', t) for t in tombstones]
+    )
+    has_more = len(merged) > limit
+    changes = []
+    for ts, _, pk, action, obj in merged[:limit]:
+        if action == 'upsert':
+            project_cursor = (ts, pk)
+        else:
+            tombstone_cursor = (ts, pk)
+        changes.append((action, obj))
+
+    return changes, encode_token(project_cursor, tombstone_cursor), has_more
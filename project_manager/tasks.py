@@ -0,0 +1,7 @@
+from .jobs import task
+from .purge import purge_user
+
+
+@task('project_manager.purge_user')
+def purge_user_task(user_id):
+    purge_user(user_id)
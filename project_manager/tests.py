@@ -1,5 +1,5 @@
 from django.urls import reverse
-from rest_framework.test import APITestCase
+from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from django.contrib.auth import get_user_model
 from .models import Project, User
@@ -8,6 +8,53 @@ from math import ceil
 from unittest.mock import patch
 from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework.exceptions import ValidationError as DRFValidationError
+from django.conf import settings
+import asyncio
+from .events import broadcaster, RESYNC
+from django.test import override_settings
+from django.core.management import call_command
+from django.utils import timezone
+from io import StringIO
+from datetime import timedelta
+import time
+from .models import Job
+from .jobs import task, enqueue, claim, Worker
+from .autocomplete import title_index
+from . import stats
+from django.core.management.base import CommandError
+from .views import ProjectDetail
+from .query_budget import QueryBudgetExceeded
+from .models import RevokedToken
+from .revocation import revocation_list, BloomFilter
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+import json
+from .pagination import CustomPagination
+from django.db import IntegrityError, transaction
+from .models import ProjectDailyStat, ProjectTombstone, ProjectTitle
+from importlib import import_module
+from types import SimpleNamespace
+from django.apps import apps as django_apps
+from . import sharding, titles
+from .sync import current_token, get_changes
+from .purge import purge_user
+from django.contrib.admin import site
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from datetime import datetime, timezone as dt_timezone
+from django.db.models import Max, Min
+from .admin import CappedCountPaginator, DateProbeQuerySet
+from django.core.cache import cache
+from . import idempotency
+from . import list_cache
+from .object_cache import project_cache, user_cache
+from . import metrics
+import os
+import tempfile
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from .filters import ProjectFilter
+from django.db import connections
+import threading
 
 
 User = get_user_model()
@@ -544,3 +591,1548 @@ class ProjectSerializerErrorTests(APITestCase):
         self.assertNotIn("owner", ser.validated_data)
 
 
+
+
+#Test incremental sync feed
+@override_settings(SYNC_LAG_SECONDS=0)
+class ProjectChangesTests(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='syncer', email='syncer@example.com', password='pass123')
+        self.client.force_authenticate(user=self.owner)
+        self.p1 = Project.objects.create(title='Sync One', description='d', owner=self.owner)
+        self.p2 = Project.objects.create(title='Sync Two', description='d', owner=self.owner)
+        self.url = reverse('project-changes')
+
+    def test_initial_sync_returns_all_rows(self):
+        info(f"GET {self.url} sans jeton")
+        resp = self.client.get(self.url)
+        ids = [c['id'] for c in resp.data['changes']]
+        if resp.status_code == 200 and ids == [self.p1.id, self.p2.id]:
+            ok("Synchro initiale renvoie tous les projets dans l'ordre")
+        else:
+            fail("Synchro initiale incorrecte", resp.data)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(ids, [self.p1.id, self.p2.id])
+        self.assertTrue(all(c['action'] == 'upsert' for c in resp.data['changes']))
+        self.assertFalse(resp.data['has_more'])
+
+    def test_only_changes_after_token(self):
+        token = self.client.get(self.url).data['since']
+        self.p1.title = 'Sync One bis'
+        self.p1.save()
+        deleted_id = self.p2.id
+        self.p2.delete()
+        p3 = Project.objects.create(title='Sync Three', description='d', owner=self.owner)
+
+        info(f"GET {self.url}?since=<jeton> après update, delete et create")
+        resp = self.client.get(self.url, {'since': token})
+        changes = [(c['action'], c['id']) for c in resp.data['changes']]
+        if changes == [('upsert', self.p1.id), ('delete', deleted_id), ('upsert', p3.id)]:
+            ok("Seuls les changements postérieurs au jeton sont renvoyés")
+        else:
+            fail("Changements inattendus", changes)
+        self.assertEqual(changes, [('upsert', self.p1.id), ('delete', deleted_id), ('upsert', p3.id)])
+        self.assertEqual(resp.data['changes'][0]['data']['title'], 'Sync One bis')
+
+        again = self.client.get(self.url, {'since': resp.data['since']})
+        self.assertEqual(again.data['changes'], [])
+
+    def test_limit_paginates_with_token(self):
+        first = self.client.get(self.url, {'limit': 1})
+        self.assertEqual([c['id'] for c in first.data['changes']], [self.p1.id])
+        self.assertTrue(first.data['has_more'])
+        second = self.client.get(self.url, {'since': first.data['since'], 'limit': 1})
+        self.assertEqual([c['id'] for c in second.data['changes']], [self.p2.id])
+
+    def test_late_commit_is_not_skipped(self):
+        now = timezone.now()
+        with self.settings(SYNC_LAG_SECONDS=60):
+            token = current_token()  # Curseur à now - 60 s
+            # B validé, encore dans le délai de sécurité : pas renvoyé, le curseur n'avance pas
+            Project.objects.filter(pk=self.p2.pk).update(updated_at=now - timedelta(seconds=30))
+            resp = self.client.get(self.url, {'since': token})
+            self.assertEqual(resp.data['changes'], [])
+            token = resp.data['since']
+            # A, horodaté avant B, n'est validé qu'ensuite
+            Project.objects.filter(pk=self.p1.pk).update(updated_at=now - timedelta(seconds=45))
+        resp = self.client.get(self.url, {'since': token})
+        info(f"Validation tardive → {[(c['action'], c['id']) for c in resp.data['changes']]}")
+        self.assertEqual([c['id'] for c in resp.data['changes']], [self.p1.id, self.p2.id])
+
+    def test_invalid_token_rejected(self):
+        info(f"GET {self.url}?since=garbage")
+        resp = self.client.get(self.url, {'since': 'garbage'})
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('since', resp.data)
+
+
+#Test SSE stream of project events
+class ProjectEventsTests(APITestCase):
+    url = '/api/projects/events/'
+
+    async def test_stream_filters_by_owner(self):
+        info(f"GET {self.url}?owner=1 via ASGI")
+        response = await self.async_client.get(self.url, {'owner': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = aiter(response.streaming_content)
+        self.assertEqual(await anext(chunks), b'retry: 5000\n\n')
+
+        broadcaster.publish('created', 2, {'id': 20})
+        broadcaster.publish('created', 1, {'id': 10})
+        chunk = await anext(chunks)
+        if chunk == b'event: created\ndata: {"id": 10}\n\n':
+            ok("Seuls les événements du propriétaire demandé sont reçus")
+        else:
+            fail("Événement inattendu", chunk)
+        self.assertEqual(chunk, b'event: created\ndata: {"id": 10}\n\n')
+
+        # Déconnexion du client : le serveur ASGI annule la lecture en cours
+        reader = asyncio.ensure_future(anext(chunks))
+        await asyncio.sleep(0)
+        reader.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await reader
+        self.assertEqual(len(broadcaster), 0)
+
+    def test_slow_consumer_gets_resync(self):
+        async def scenario():
+            subscription = broadcaster.subscribe()
+            try:
+                for i in range(settings.PROJECT_EVENTS_QUEUE_SIZE + 1):
+                    broadcaster.publish('updated', 1, {'id': i})
+                await asyncio.sleep(0)
+                return subscription.queue.qsize(), subscription.queue.get_nowait()
+            finally:
+                broadcaster.unsubscribe(subscription)
+
+        info("Abonné lent : la file déborde")
+        size, payload = asyncio.run(scenario())
+        self.assertEqual(size, 1)
+        self.assertEqual(payload, RESYNC)
+
+    def test_signals_publish_after_commit(self):
+        owner = User.objects.create_user(username='evt', email='evt@example.com', password='pass123')
+        with patch('project_manager.signals.broadcaster') as mocked:
+            mocked.__len__.return_value = 1
+            with self.captureOnCommitCallbacks(execute=True):
+                project = Project.objects.create(title='Evented', description='d', owner=owner)
+            mocked.publish.assert_called_once()
+            event, owner_id, data = mocked.publish.call_args.args
+            self.assertEqual((event, owner_id, data['id']), ('created', owner.id, project.id))
+
+            mocked.publish.reset_mock()
+            with self.captureOnCommitCallbacks(execute=True):
+                project_id = project.id
+                project.delete()
+            mocked.publish.assert_called_once_with('deleted', owner.id, {'id': project_id})
+
+    def test_wsgi_request_is_rejected(self):
+        info(f"GET {self.url} via WSGI")
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 501)
+
+
+#Test deferred account deletion
+@override_settings(PROJECT_PURGE_PAUSE_SECONDS=0)
+class UserSoftDeleteTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='leaver', email='leaver@example.com', password='pass123')
+        self.other = User.objects.create_user(username='stayer', email='stayer@example.com', password='pass123')
+        Project.objects.bulk_create([
+            Project(title=f'Leaver {i}', description='d', owner=self.user) for i in range(5)
+        ])
+        self.kept = Project.objects.create(title='Stayer project', description='d', owner=self.other)
+
+    def test_delete_marks_user_and_hides_projects(self):
+        self.client.force_authenticate(user=self.user)
+        url = reverse('user-detail', kwargs={'username': self.user.username})
+        info(f"DELETE {url}")
+        with patch('project_manager.purge.start_purge') as start:
+            with self.captureOnCommitCallbacks(execute=True):
+                resp = self.client.delete(url)
+        self.assertEqual(resp.status_code, 204)
+        start.assert_called_once_with(self.user.id)
+
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.deleted_at)
+        self.assertFalse(self.user.is_active)
+        self.assertEqual(Project.objects.filter(owner=self.user).count(), 5)
+
+        listing = self.client.get(reverse('project-list'), {'page_size': 50})
+        titles = [p['title'] for p in listing.data['results']]
+        if titles == ['Stayer project']:
+            ok("Projets du compte supprimé masqués en lecture")
+        else:
+            fail("Projets du compte supprimé encore visibles", titles)
+        self.assertEqual(titles, ['Stayer project'])
+        hidden = Project.objects.filter(owner=self.user).first()
+        self.assertEqual(self.client.get(f"{reverse('project-list')}{hidden.id}/").status_code, 404)
+
+    def test_purge_deletes_in_batches_with_progress(self):
+        from .purge import soft_delete_user, purge_user
+        from .models import AccountPurge
+        with patch('project_manager.purge.start_purge'):
+            soft_delete_user(self.user)
+
+        seen = []
+        info("Purge par lots de 2")
+        purge = purge_user(self.user.id, batch_size=2, on_progress=lambda p: seen.append(p.deleted))
+        if seen == [2, 4, 5]:
+            ok("Progression enregistrée après chaque lot")
+        else:
+            fail("Progression inattendue", seen)
+        self.assertEqual(seen, [2, 4, 5])
+        self.assertEqual((purge.total, purge.deleted, purge.progress), (5, 5, 100))
+        self.assertIsNotNone(AccountPurge.objects.get(user_id=self.user.id).finished_at)
+        self.assertFalse(User.objects.filter(pk=self.user.id).exists())
+        self.assertTrue(Project.objects.filter(pk=self.kept.pk).exists())
+
+    def test_purge_command_resumes_pending_users(self):
+        User.objects.filter(pk=self.user.pk).update(deleted_at=timezone.now(), is_active=False)
+        out = StringIO()
+        call_command('purge_deleted_users', '--batch-size', '3', stdout=out)
+        info(out.getvalue())
+        self.assertIn('3/5 projets (60%)', out.getvalue())
+        self.assertIn('5 projets supprimés', out.getvalue())
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertEqual(Project.objects.count(), 1)
+
+
+#Test DB-backed job queue
+job_calls = []
+
+@task('tests.record')
+def record_task(value):
+    job_calls.append(value)
+
+@task('tests.boom')
+def boom_task():
+    raise ValueError('boom')
+
+@task('tests.sleep')
+def sleep_task(seconds, fail=False):
+    time.sleep(seconds)
+    if fail:
+        raise ValueError('lent et en échec')
+
+running_overlap = []
+
+@task('tests.overlap')
+def overlap_task(seconds):
+    running_overlap.append(seconds)
+    job_calls.append(len(running_overlap))
+    time.sleep(seconds)
+    running_overlap.pop()
+    raise ValueError('essai en échec')
+
+
+class JobQueueTests(APITestCase):
+    def setUp(self):
+        job_calls.clear()
+
+    def test_claim_is_exclusive_and_ordered_by_priority(self):
+        low = enqueue('tests.record', 'low')
+        high = enqueue('tests.record', 'high', priority=10)
+        later = enqueue('tests.record', 'later', delay=60)
+
+        info("Réclamation par deux workers")
+        first = claim('w1', 1)
+        second = claim('w2', 5)
+        if [j.id for j in first] == [high.id] and [j.id for j in second] == [low.id]:
+            ok("Chaque job réclamé par un seul worker, priorité respectée")
+        else:
+            fail("Réclamation incorrecte", (first, second))
+        self.assertEqual([j.id for j in first], [high.id])
+        self.assertEqual([j.id for j in second], [low.id])
+        self.assertEqual(claim('w3', 5), [])
+        self.assertEqual(Job.objects.get(pk=later.pk).status, Job.QUEUED)
+        self.assertEqual(first[0].attempts, 1)
+        self.assertIsNotNone(first[0].locked_until)
+
+    def test_worker_runs_jobs_in_thread_pool(self):
+        for i in range(5):
+            enqueue('tests.record', i)
+        info("run_worker --burst --concurrency 3")
+        out = StringIO()
+        call_command('run_worker', '--burst', '--concurrency', '3', '--poll-interval', '0.01', stdout=out)
+        info(out.getvalue())
+        self.assertEqual(sorted(job_calls), [0, 1, 2, 3, 4])
+        self.assertEqual(Job.objects.filter(status=Job.DONE).count(), 5)
+        self.assertIn('jobs/s', out.getvalue())
+
+    @override_settings(JOB_RETRY_BACKOFF_SECONDS=10)
+    def test_failures_are_retried_with_backoff_then_abandoned(self):
+        job = enqueue('tests.boom', max_attempts=2)
+        Worker(poll_interval=0.01).run(burst=True)
+        job.refresh_from_db()
+        info(f"Après 1 échec : status={job.status}, attempts={job.attempts}")
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=5))
+        self.assertIn('ValueError: boom', job.last_error)
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        Worker(poll_interval=0.01).run(burst=True)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def test_timeout_and_unknown_task(self):
+        slow = enqueue('tests.sleep', 0.5, fail=True, timeout=0, max_attempts=1)
+        late = enqueue('tests.sleep', 0.3, timeout=0, max_attempts=2)
+        unknown = enqueue('tests.missing')
+        Worker(poll_interval=0.01).run(burst=True)
+        slow.refresh_from_db()
+        late.refresh_from_db()
+        unknown.refresh_from_db()
+        self.assertEqual(slow.status, Job.FAILED)
+        self.assertIn('Timeout', slow.last_error)
+        # Terminé sans erreur après son timeout : pas relancé
+        self.assertEqual((late.status, late.attempts), (Job.DONE, 1))
+        self.assertEqual((unknown.status, unknown.attempts), (Job.FAILED, 1))
+
+    @override_settings(JOB_RETRY_BACKOFF_SECONDS=0)
+    def test_timed_out_job_keeps_its_slot_until_it_ends(self):
+        job = enqueue('tests.overlap', 0.3, timeout=0, max_attempts=2)
+        waiting = enqueue('tests.record', 'suivant', timeout=1, priority=-1)
+        info("Job en timeout avec 2 slots : pas de second essai en parallèle")
+        Worker(concurrency=2, poll_interval=0.01).run(burst=True)
+        job.refresh_from_db()
+        waiting.refresh_from_db()
+        self.assertEqual(job_calls.count(1), 2)  # Deux essais, jamais en même temps
+        self.assertNotIn(2, job_calls)
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertIn('Timeout', job.last_error)
+        self.assertEqual(waiting.status, Job.DONE)
+
+    def test_stale_running_job_is_reclaimed(self):
+        job = enqueue('tests.record', 'again')
+        claim('crashed-worker', 1)
+        Job.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        reclaimed = claim('w2', 1)
+        self.assertEqual([j.id for j in reclaimed], [job.id])
+        self.assertEqual(reclaimed[0].attempts, 2)
+
+    def test_job_killing_its_worker_is_not_retried_forever(self):
+        job = enqueue('tests.record', 'oom', max_attempts=2)
+        for worker in ('w1', 'w2'):
+            self.assertEqual([j.id for j in claim(worker, 1)], [job.id])
+            # Le worker meurt pendant l'exécution : le bail expire
+            Job.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        info("Bail expiré après le dernier essai")
+        self.assertEqual(claim('w3', 1), [])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertIn('bail expiré', job.last_error)
+
+
+#Test title autocomplete
+class ProjectAutocompleteTests(APITestCase):
+    def setUp(self):
+        title_index.clear()
+        self.owner = User.objects.create_user(username='auto', email='auto@example.com', password='pass123')
+        for title in ['Django Pro', 'django tips', 'Dashboard', 'React App']:
+            Project.objects.create(title=title, description='d', owner=self.owner)
+        self.url = reverse('project-autocomplete')
+
+    def test_prefix_search_is_served_from_memory(self):
+        self.client.get(self.url, {'q': 'x'})  # Construction de l'index
+        info(f"GET {self.url}?q=dj")
+        with self.assertNumQueries(0):
+            resp = self.client.get(self.url, {'q': 'dj'})
+        titles = [r['title'] for r in resp.data['results']]
+        if titles == ['Django Pro', 'django tips']:
+            ok("Préfixe insensible à la casse, sans requête SQL")
+        else:
+            fail("Résultats inattendus", titles)
+        self.assertEqual(titles, ['Django Pro', 'django tips'])
+        self.assertEqual(len(self.client.get(self.url, {'q': 'd', 'limit': 2}).data['results']), 2)
+        self.assertEqual(self.client.get(self.url).data['results'], [])
+
+    def test_index_follows_signals(self):
+        title_index.ensure_fresh()
+        project = Project.objects.get(title='React App')
+        with self.captureOnCommitCallbacks(execute=True):
+            project.title = 'Dart Tool'
+            project.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            Project.objects.get(title='Dashboard').delete()
+        titles = [r['title'] for r in title_index.search('da', 10)]
+        self.assertEqual(titles, ['Dart Tool'])
+        self.assertEqual(title_index.search('react', 10), [])
+
+    @override_settings(AUTOCOMPLETE_REFRESH_SECONDS=0, SYNC_LAG_SECONDS=0)
+    def test_refresh_catches_up_with_other_workers(self):
+        title_index.ensure_fresh()
+        # Écriture faite "ailleurs" : aucun signal ne parvient à cet index
+        Project.objects.bulk_create([Project(title='Data Lake', description='d', owner=self.owner)])
+        resp = self.client.get(self.url, {'q': 'data'})
+        self.assertEqual([r['title'] for r in resp.data['results']], ['Data Lake'])
+
+    @override_settings(AUTOCOMPLETE_MAX_ENTRIES=2)
+    def test_truncated_index_falls_back_to_database(self):
+        title_index.ensure_fresh()
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(self.url, {'q': 'react'})
+        self.assertFalse(title_index.complete)
+        self.assertEqual([r['title'] for r in resp.data['results']], ['React App'])
+        # Intervalle sur LOWER(title), servi par project_title_lower_idx, plutôt que LIKE
+        self.assertFalse([q['sql'] for q in queries.captured_queries if 'LIKE' in q['sql']])
+
+    @override_settings(AUTOCOMPLETE_MAX_ENTRIES=2, AUTOCOMPLETE_REFRESH_SECONDS=0, SYNC_LAG_SECONDS=0)
+    def test_truncated_index_rebuilt_once_under_the_cap(self):
+        info("Index tronqué, puis ramené sous le plafond par des suppressions")
+        title_index.ensure_fresh()
+        self.assertFalse(title_index.complete)
+        with self.captureOnCommitCallbacks(execute=True):
+            Project.objects.filter(title__in=['Django Pro', 'React App']).delete()
+        resp = self.client.get(self.url, {'q': 'd'})
+        self.assertTrue(title_index.complete)
+        self.assertEqual([r['title'] for r in resp.data['results']], ['Dashboard', 'django tips'])
+        ok("Index reconstruit au rattrapage suivant")
+
+
+#Test incremental project statistics
+class ProjectStatsTests(APITestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='pass123')
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com', password='pass123')
+        for i in range(3):
+            Project.objects.create(title=f'Alice {i}', description='d', owner=self.alice)
+        self.bob_project = Project.objects.create(title='Bob 0', description='d', owner=self.bob)
+        self.url = reverse('project-stats')
+
+    def test_stats_follow_creates_and_deletes(self):
+        self.bob_project.delete()
+        info(f"GET {self.url}")
+        with self.assertNumQueries(3):
+            resp = self.client.get(self.url)
+        today = str(timezone.localdate())
+        if resp.data['total'] == 3 and resp.data['top_owners'][0]['username'] == 'alice':
+            ok("Statistiques lues dans la table de synthèse")
+        else:
+            fail("Statistiques incorrectes", resp.data)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data['total'], 3)
+        self.assertEqual([(str(d['day']), d['count']) for d in resp.data['per_day']], [(today, 3)])
+        self.assertEqual(resp.data['top_owners'], [{'owner': self.alice.id, 'username': 'alice', 'count': 3}])
+        self.assertEqual(stats.check_consistency(), [])
+
+    def test_check_and_rebuild_commands(self):
+        # bulk_create ne déclenche pas les signaux : la synthèse dérive
+        Project.objects.bulk_create([Project(title='Bulk one', description='d', owner=self.bob)])
+        out = StringIO()
+        info("rebuild_project_stats --check")
+        with self.assertRaises(CommandError):
+            call_command('rebuild_project_stats', '--check', stdout=out)
+        self.assertIn('attendu 2, stocké 1', out.getvalue())
+
+        call_command('rebuild_project_stats', stdout=StringIO())
+        self.assertEqual(stats.check_consistency(), [])
+        top = self.client.get(self.url, {'top': 1}).data['top_owners']
+        self.assertEqual([o['username'] for o in top], ['alice'])
+
+
+#Test query budgets
+class QueryBudgetTests(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='budget', email='budget@example.com', password='pass123')
+        self.other = User.objects.create_user(username='nobudget', email='nobudget@example.com', password='pass123')
+        self.project = Project.objects.create(title='Budgeted', description='d', owner=self.owner)
+        self.url_detail = reverse('project-detail', kwargs={'id': self.project.id})
+
+    def test_permission_does_not_load_owner(self):
+        self.client.force_authenticate(user=self.other)
+        info(f"PUT {self.url_detail} en tant que non-propriétaire")
+        with self.assertNumQueries(1):
+            resp = self.client.put(self.url_detail, {'title': 'Hacked title', 'description': 'x'})
+        self.assertEqual(resp.status_code, 403)
+
+    def test_views_stay_within_budget_with_jwt(self):
+        login = self.client.post(reverse('token_obtain_pair'), {'username': 'budget', 'password': 'pass123'})
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {login.data['access']}")
+        info("Vues parcourues avec un vrai jeton JWT (une requête d'authentification en plus)")
+        self.assertEqual(self.client.get(reverse('project-list')).status_code, 200)
+        self.assertEqual(self.client.post(reverse('project-list'), {'title': 'Budget two'}).status_code, 201)
+        self.assertEqual(self.client.get(self.url_detail).status_code, 200)
+        self.assertEqual(self.client.patch(self.url_detail, {'description': 'y'}).status_code, 200)
+        self.assertEqual(self.client.delete(self.url_detail).status_code, 204)
+
+    def test_exceeding_budget_fails_with_sql_and_stack(self):
+        info(f"GET {self.url_detail} avec un budget de 0")
+        with patch.object(ProjectDetail, 'query_budget', {'GET': 0}):
+            with self.assertRaises(QueryBudgetExceeded) as ctx:
+                self.client.get(self.url_detail)
+        message = str(ctx.exception)
+        if 'ProjectDetail GET' in message and 'SELECT' in message:
+            ok("Dépassement signalé avec le SQL fautif")
+        else:
+            fail("Message de dépassement incomplet", message)
+        self.assertIn('1 requêtes SQL pour un budget de 0', message)
+        self.assertIn('project_manager_project', message)
+        self.assertIn('tests.py', message)
+
+    @override_settings(QUERY_BUDGET_ENFORCE=False, QUERY_BUDGET_SAMPLE_RATE=1)
+    def test_production_mode_logs_instead_of_failing(self):
+        with patch.object(ProjectDetail, 'query_budget', {'GET': 0}):
+            with self.assertLogs('project_manager.query_budget', level='WARNING') as logs:
+                resp = self.client.get(self.url_detail)
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn('budget de 0', logs.output[0])
+
+
+#Test lean middleware path for the API
+class APIMiddlewarePathTests(APITestCase):
+    def test_api_skips_session_csrf_and_clickjacking(self):
+        info("GET /api/projects/ : pile allégée")
+        resp = self.client.get(reverse('project-list'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse(hasattr(resp.wsgi_request, 'session'))
+        self.assertFalse(hasattr(resp.wsgi_request, '_messages'))
+        self.assertNotIn('X-Frame-Options', resp.headers)
+
+    def test_api_post_needs_no_csrf_token(self):
+        client = APIClient(enforce_csrf_checks=True)
+        resp = client.post(reverse('user-register'), {
+            'username': 'nocsrf', 'email': 'nocsrf@example.com', 'password': 'Str0ngPassw0rd!'
+        }, format='json')
+        self.assertEqual(resp.status_code, 201)
+
+    def test_admin_keeps_full_stack(self):
+        info("GET /admin/login/ : pile complète")
+        resp = self.client.get('/admin/login/')
+        if resp.status_code == 200 and resp.headers.get('X-Frame-Options') == 'DENY':
+            ok("L'admin garde sessions, CSRF et clickjacking")
+        else:
+            fail("Pile admin incomplète", resp.headers)
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(hasattr(resp.wsgi_request, 'session'))
+        self.assertIn('csrftoken', resp.cookies)
+        self.assertEqual(resp.headers['X-Frame-Options'], 'DENY')
+
+
+#Test JWT revocation
+class TokenRevocationTests(APITestCase):
+    def setUp(self):
+        revocation_list.reset()
+        self.user = User.objects.create_user(username='revoker', email='revoker@example.com', password='pass123')
+        login = self.client.post(reverse('token_obtain_pair'), {'username': 'revoker', 'password': 'pass123'})
+        self.access, self.refresh = login.data['access'], login.data['refresh']
+        self.me = reverse('user-detail', kwargs={'username': 'revoker'})
+
+    def test_valid_token_checked_without_extra_query(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access}")
+        self.client.get(self.me)  # Construction du filtre (hors budget)
+        info(f"GET {self.me} avec un jeton non révoqué")
+        with self.assertNumQueries(1):  # Chargement de l'utilisateur uniquement
+            resp = self.client.get(self.me)
+        self.assertEqual(resp.status_code, 200)
+
+    def test_logout_revokes_access_and_refresh(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access}")
+        info("POST /api/users/logout/")
+        resp = self.client.post(reverse('user-logout'), {'refresh': self.refresh})
+        self.assertEqual(resp.status_code, 204)
+
+        after = self.client.get(self.me)
+        if after.status_code == 401:
+            ok("Jeton d'accès refusé après déconnexion")
+        else:
+            fail("Jeton d'accès encore accepté", after.status_code)
+        self.assertEqual(after.status_code, 401)
+
+        self.client.credentials()
+        refreshed = self.client.post(reverse('token_refresh'), {'refresh': self.refresh})
+        self.assertEqual(refreshed.status_code, 401)
+
+    def test_revocation_from_another_worker_is_synced(self):
+        revocation_list.is_revoked('warmup')
+        # Révocation écrite par un autre worker : seul le rattrapage la fait connaître
+        token = AccessToken(self.access)
+        RevokedToken.objects.create(jti=token['jti'], expires_at=timezone.now() + timedelta(minutes=5))
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access}")
+        with override_settings(REVOCATION_REFRESH_SECONDS=0):
+            self.assertEqual(self.client.get(self.me).status_code, 401)
+
+    def test_cannot_revoke_someone_else_refresh(self):
+        other = User.objects.create_user(username='victim', email='victim@example.com', password='pass123')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access}")
+        resp = self.client.post(reverse('user-logout'), {'refresh': str(RefreshToken.for_user(other))})
+        self.assertEqual(resp.status_code, 400)
+
+    def test_rebuild_compacts_expired_entries(self):
+        RevokedToken.objects.create(jti='old', expires_at=timezone.now() - timedelta(seconds=1))
+        RevokedToken.objects.create(jti='live', expires_at=timezone.now() + timedelta(hours=1))
+        revocation_list.rebuild()
+        self.assertEqual(list(RevokedToken.objects.values_list('jti', flat=True)), ['live'])
+        self.assertTrue(revocation_list.is_revoked('live'))
+        self.assertFalse(revocation_list.is_revoked('old'))
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(1000, 0.01)
+        for i in range(1000):
+            bloom.add(f'jti-{i}')
+        self.assertTrue(all(f'jti-{i}' in bloom for i in range(1000)))
+        false_positives = sum(f'other-{i}' in bloom for i in range(10000))
+        info(f"Faux positifs : {false_positives}/10000")
+        self.assertLess(false_positives, 300)
+
+
+#Test streamed large pages
+class ProjectStreamingPaginationTests(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='streamer', email='streamer@example.com', password='pass123')
+        self.client.force_authenticate(user=self.owner)
+        Project.objects.bulk_create([
+            Project(title=f'Projet Stream {i}', description='desc', owner=self.owner)
+            for i in range(1, 121)
+        ])
+        self.url_list = reverse('project-list')
+
+    def get_streamed(self, params):
+        response = self.client.get(self.url_list, {'stream': 1, **params})
+        self.assertTrue(response.streaming)
+        return response, json.loads(b''.join(response.streaming_content))
+
+    def test_stream_allows_pages_above_50(self):
+        response, data = self.get_streamed({'page_size': 100, 'ordering': 'id'})
+        info(f"GET {self.url_list}?stream=1&page_size=100 → status={response.status_code}")
+        if len(data['results']) == 100:
+            ok("Streamed page of 100 results")
+        else:
+            fail("Streamed page size mismatch", len(data['results']))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(data['total_count'], 120)
+        self.assertEqual(data['total_pages'], 2)
+        self.assertIsNotNone(data['next'])
+        self.assertIsNone(data['previous'])
+
+    def test_stream_matches_buffered_response(self):
+        buffered = self.client.get(self.url_list, {'page_size': 50, 'page': 2, 'ordering': 'id'})
+        _, streamed = self.get_streamed({'page_size': 50, 'page': 2, 'ordering': 'id'})
+        expected = json.loads(buffered.content)
+        for key in ['total_count', 'total_pages', 'current_page', 'results']:
+            self.assertEqual(streamed[key], expected[key])
+        # Les liens conservent le mode streamé
+        self.assertIn('stream=1', streamed['previous'])
+
+    def test_stream_chunks_do_not_hold_the_whole_page(self):
+        with patch.object(CustomPagination, 'stream_chunk_size', 25):
+            response = self.client.get(self.url_list, {'stream': 1, 'page_size': 120})
+            chunks = list(response.streaming_content)
+        # En-tête, 120 / 25 paquets de résultats, fermeture
+        self.assertEqual(len(chunks), 1 + 5 + 1)
+        self.assertEqual(len(json.loads(b''.join(chunks))['results']), 120)
+
+    def test_stream_empty_page_and_invalid_page(self):
+        Project.objects.all().delete()
+        _, data = self.get_streamed({})
+        self.assertEqual(data['results'], [])
+        self.assertEqual(data['total_count'], 0)
+        response = self.client.get(self.url_list, {'stream': 1, 'page': 9})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_stream_is_async_under_asgi(self):
+        # Un itérateur synchrone serait lu en entier avant l'envoi
+        with patch.object(CustomPagination, 'stream_chunk_size', 40):
+            response = await self.async_client.get(self.url_list, {'stream': 1, 'page_size': 120, 'ordering': 'id'})
+            self.assertTrue(response.is_async)
+            chunks = [chunk async for chunk in response.streaming_content]
+        info(f"GET {self.url_list}?stream=1 via ASGI → {len(chunks)} paquets")
+        self.assertEqual(len(chunks), 5)  # En-tête, 3 paquets de 40, ']}'
+        data = json.loads(b''.join(chunks))
+        self.assertEqual([p['title'] for p in data['results']][:2], ['Projet Stream 1', 'Projet Stream 2'])
+        self.assertEqual(data['total_count'], 120)
+
+    def test_stream_page_size_capped(self):
+        with patch.object(CustomPagination, 'stream_max_page_size', 30):
+            _, data = self.get_streamed({'page_size': 999})
+        self.assertEqual(len(data['results']), 30)
+
+
+#Test sharding of projects by owner
+# Budgets de requêtes calibrés pour un seul shard : non contrôlés ici
+@override_settings(PROJECT_SHARD_COUNT=2, QUERY_BUDGET_ENFORCE=False, QUERY_BUDGET_SAMPLE_RATE=0)
+class ProjectShardingTests(APITestCase):
+    databases = {'default', 'shard_1'}
+
+    def setUp(self):
+        users = [
+            User.objects.create_user(username=f'shard{i}', email=f'shard{i}@example.com', password='pass123')
+            for i in range(6)
+        ]
+        by_shard = {}
+        for user in users:
+            by_shard.setdefault(sharding.shard_for_owner(user.pk), user)
+        self.assertEqual(set(by_shard), {'default', 'shard_1'})
+        self.alice, self.bob = by_shard['default'], by_shard['shard_1']
+        self.url_list = reverse('project-list')
+
+    def create(self, user, title):
+        self.client.force_authenticate(user=user)
+        return self.client.post(self.url_list, {'title': title, 'description': 'desc'})
+
+    def test_project_written_on_owner_shard(self):
+        resp = self.create(self.bob, 'Projet de Bob')
+        info(f"POST {self.url_list} par un owner du shard 1 → status={resp.status_code}")
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        pk = resp.data['id']
+        if Project.objects.using('shard_1').filter(pk=pk).exists():
+            ok("Projet écrit sur shard_1")
+        else:
+            fail("Projet absent de shard_1")
+        self.assertFalse(Project.objects.using('default').filter(pk=pk).exists())
+        self.assertEqual(sharding.shard_for_pk(pk), 'shard_1')
+        self.assertEqual(
+            ProjectDailyStat.objects.using('shard_1').get(owner_id=self.bob.pk).count, 1
+        )
+
+    def test_detail_update_and_delete_on_shard(self):
+        pk = self.create(self.bob, 'Projet détaillé').data['id']
+        url = reverse('project-detail', kwargs={'id': pk})
+        self.assertEqual(self.client.get(url).data['title'], 'Projet détaillé')
+        resp = self.client.patch(url, {'title': 'Projet renommé'})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(Project.objects.using('shard_1').get(pk=pk).title, 'Projet renommé')
+
+        resp = self.client.delete(url)
+        self.assertEqual(resp.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertTrue(ProjectTombstone.objects.using('shard_1').filter(project_id=pk).exists())
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(reverse('project-detail', kwargs={'id': 3 << 48})).status_code, 404)
+
+    def test_list_fans_out_and_merge_sorts(self):
+        for i, user in enumerate([self.alice, self.bob] * 3):
+            self.create(user, f'Projet {"ECADBF"[i]} {i}')
+        self.client.force_authenticate(user=None)
+        titles = sorted(
+            title for alias in ('default', 'shard_1')
+            for title in Project.objects.using(alias).values_list('title', flat=True)
+        )
+
+        resp = self.client.get(self.url_list, {'ordering': 'title', 'page_size': 4})
+        info(f"GET {self.url_list}?ordering=title → {[p['title'] for p in resp.data['results']]}")
+        self.assertEqual(resp.data['total_count'], 6)
+        self.assertEqual([p['title'] for p in resp.data['results']], titles[:4])
+        page2 = self.client.get(self.url_list, {'ordering': 'title', 'page_size': 4, 'page': 2})
+        self.assertEqual([p['title'] for p in page2.data['results']], titles[4:])
+
+        desc = self.client.get(self.url_list, {'ordering': '-title', 'page_size': 50})
+        self.assertEqual([p['title'] for p in desc.data['results']], titles[::-1])
+        resp = self.client.get(self.url_list, {'ordering': '-title', 'page_size': 50, 'stream': 1})
+        streamed = json.loads(b''.join(resp.streaming_content))
+        self.assertEqual(streamed['results'], json.loads(desc.content)['results'])
+
+    def test_title_unique_across_shards(self):
+        self.assertEqual(self.create(self.alice, 'Titre partagé').status_code, 201)
+        resp = self.create(self.bob, 'Titre partagé')
+        info(f"POST même titre depuis l'autre shard → status={resp.status_code}")
+        if resp.status_code == 400:
+            ok("Titre refusé sur l'autre shard")
+        else:
+            fail("Titre dupliqué accepté", resp.status_code)
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        with self.assertRaises(IntegrityError):
+            Project.objects.create(title='Titre partagé', owner=self.bob)
+
+        # Un renommage libère l'ancien titre, au commit
+        project = Project.objects.using('default').get(title='Titre partagé')
+        project.title = 'Titre libéré'
+        with self.captureOnCommitCallbacks(execute=True):
+            project.save()
+        self.assertEqual(self.create(self.bob, 'Titre partagé').status_code, 201)
+
+    def test_title_kept_when_release_rolls_back(self):
+        pk = self.create(self.bob, 'Titre conservé').data['id']
+
+        def rolled_back(action):
+            project = Project.objects.using('shard_1').get(pk=pk)
+            with self.captureOnCommitCallbacks(execute=True), self.assertRaises(RuntimeError):
+                with transaction.atomic(using='shard_1'):
+                    action(project)
+                    raise RuntimeError
+
+        def rename(project):
+            project.title = 'Titre abandonné'
+            project.save()
+
+        rolled_back(rename)
+        rolled_back(lambda project: project.delete())
+        self.assertEqual(Project.objects.using('shard_1').get(pk=pk).title, 'Titre conservé')
+        self.assertEqual(self.create(self.alice, 'Titre conservé').status_code, status.HTTP_400_BAD_REQUEST)
+
+        # La réservation du renommage annulé reste en attente, puis est reprise
+        self.assertEqual(self.create(self.alice, 'Titre abandonné').status_code, status.HTTP_400_BAD_REQUEST)
+        with self.settings(PROJECT_TITLE_RESERVATION_TIMEOUT=0):
+            self.assertEqual(self.create(self.alice, 'Titre abandonné').status_code, status.HTTP_201_CREATED)
+            self.assertEqual(self.create(self.bob, 'Titre abandonné').status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(self.create(self.bob, 'Titre conservé').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_orphan_reservation_reclaimed_by_save(self):
+        alias = sharding.shard_for_title('Titre orphelin')
+        ProjectTitle.objects.using(alias).create(title='Titre orphelin', reserved_at=timezone.now())
+        with self.assertRaises(IntegrityError):
+            Project.objects.create(title='Titre orphelin', owner=self.bob)
+        with self.settings(PROJECT_TITLE_RESERVATION_TIMEOUT=0):
+            Project.objects.create(title='Titre orphelin', owner=self.bob)
+        self.assertEqual(ProjectTitle.objects.using(alias).filter(title='Titre orphelin').count(), 1)
+
+    @override_settings(SYNC_LAG_SECONDS=0)
+    def test_sync_stats_and_purge_span_shards(self):
+        self.create(self.alice, 'Projet sync A')
+        self.create(self.bob, 'Projet sync B')
+        changes, token, _ = get_changes(None, 10)
+        self.assertEqual({obj.title for _, obj in changes}, {'Projet sync A', 'Projet sync B'})
+        self.assertEqual(get_changes(token, 10)[0], [])
+
+        summary = stats.summary()
+        self.assertEqual(summary['total'], 2)
+        self.assertEqual({o['owner'] for o in summary['top_owners']}, {self.alice.pk, self.bob.pk})
+        self.assertEqual(stats.check_consistency(), [])
+
+        purge_user(self.bob.pk)
+        self.assertFalse(Project.objects.using('shard_1').exists())
+        self.assertEqual(stats.summary()['total'], 1)
+        self.assertEqual([c[0] for c in get_changes(token, 10)[0]], ['delete'])
+
+    def test_bulk_create_reserves_titles(self):
+        with self.assertRaises(IntegrityError):
+            Project.objects.bulk_create([
+                Project(title='Même titre', owner=self.alice), Project(title='Même titre', owner=self.bob),
+            ])
+        self.assertFalse(any(Project.objects.using(alias).exists() for alias in ('default', 'shard_1')))
+        self.assertFalse(ProjectTitle.objects.using(sharding.shard_for_title('Même titre')).exists())
+
+        Project.objects.bulk_create([Project(title='Titre en lot', owner=self.bob)])
+        resp = self.create(self.alice, 'Titre en lot')
+        info(f"POST d'un titre écrit par bulk_create sur l'autre shard → status={resp.status_code}")
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.create(self.alice, 'Même titre').status_code, status.HTTP_201_CREATED)
+
+    def test_title_registry_backfilled_by_migration(self):
+        # Projets écrits avant le registre (bulk_create : sans signaux)
+        Project.objects.using('default').bulk_create([Project(title=f'Ancien {i}', owner=self.alice) for i in range(6)])
+        Project.objects.using('shard_1').bulk_create([Project(title=f'Vieux {i}', owner=self.bob) for i in range(6)])
+        self.assertFalse(ProjectTitle.objects.using('default').exists())
+        migration = import_module('project_manager.migrations.0010_backfill_project_titles')
+        for alias in ('default', 'shard_1'):
+            migration.backfill_project_titles(django_apps, SimpleNamespace(connection=connections[alias]))
+        for title in [f'Ancien {i}' for i in range(6)] + [f'Vieux {i}' for i in range(6)]:
+            self.assertTrue(ProjectTitle.objects.using(sharding.shard_for_title(title)).filter(title=title).exists())
+        self.assertEqual(self.create(self.bob, 'Ancien 0').status_code, status.HTTP_400_BAD_REQUEST)
+
+
+    def test_title_registry_rebuilt_after_enabling_shards(self):
+        # Avec un seul shard, le registre n'est pas tenu à jour : 0010 l'a rempli, puis il a dérivé
+        ProjectTitle.objects.using('default').create(title='Titre supprimé')
+        with self.settings(PROJECT_SHARD_COUNT=1):
+            Project.objects.create(title='Titre supprimé', owner=self.alice).delete()
+            Project.objects.create(title='Titre récent', owner=self.alice)
+        self.assertIn(('Titre récent', 'manquant'), titles.check_consistency())
+        out = StringIO()
+        info("rebuild_project_titles --check")
+        with self.assertRaises(CommandError):
+            call_command('rebuild_project_titles', '--check', stdout=out)
+        self.assertIn("'Titre récent' : manquant", out.getvalue())
+
+        call_command('rebuild_project_titles', stdout=StringIO())
+        self.assertEqual(titles.check_consistency(), [])
+        self.assertEqual(self.create(self.bob, 'Titre récent').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.create(self.bob, 'Titre supprimé').status_code, status.HTTP_201_CREATED)
+
+
+#Test admin on large tables
+class ProjectAdminTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='root', email='root@example.com', password='pass123')
+        self.client.force_login(self.admin)
+        self.url = reverse('admin:project_manager_project_changelist')
+
+    def add_projects(self, count, start=0):
+        owners = [
+            User.objects.create_user(username=f'adm{start + i}', email=f'adm{start + i}@example.com', password='x')
+            for i in range(count)
+        ]
+        Project.objects.bulk_create([
+            Project(title=f'Admin {start + i}', description='desc', owner=owner) for i, owner in enumerate(owners)
+        ])
+
+    def count_queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(url, params or {})
+        self.assertEqual(resp.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        self.add_projects(3)
+        small = self.count_queries(self.url)
+        self.add_projects(40, start=3)
+        large = self.count_queries(self.url)
+        info(f"GET {self.url} : {small} requêtes pour 3 projets, {large} pour 43")
+        if small == large:
+            ok("Nombre de requêtes constant (owner chargé par jointure)")
+        else:
+            fail("Requêtes par ligne", large - small)
+        self.assertEqual(small, large)
+
+    def test_count_is_capped(self):
+        self.add_projects(15)
+        with patch.object(CappedCountPaginator, 'max_count', 10):
+            resp = self.client.get(self.url)
+        self.assertEqual(resp.context['cl'].result_count, 10)
+        self.assertIsNone(resp.context['cl'].full_result_count)
+
+    def test_search_uses_indexes(self):
+        self.add_projects(5)
+        resp = self.client.get(self.url, {'q': 'admin 3'})
+        self.assertEqual([p.title for p in resp.context['cl'].result_list], ['Admin 3'])
+
+        model_admin = site._registry[Project]
+        queryset, _ = model_admin.get_search_results(None, Project.objects.all(), 'adm')
+        plan = queryset.explain()
+        info(f"Plan de la recherche par préfixe : {plan}")
+        self.assertIn('project_title_lower_idx', plan)
+        self.assertEqual(queryset.count(), 5)
+
+        users, _ = site._registry[User].get_search_results(None, User.objects.all(), 'adm1')
+        self.assertEqual(list(users.values_list('username', flat=True)), ['adm1'])
+        self.assertNotIn('SCAN', users.explain().replace('SCAN CONSTANT', ''))
+
+    def test_date_hierarchy_probes_match_datetimes(self):
+        self.add_projects(4)
+        dates = [datetime(2023, 5, 2, tzinfo=dt_timezone.utc), datetime(2024, 1, 9, tzinfo=dt_timezone.utc),
+                 datetime(2024, 3, 30, tzinfo=dt_timezone.utc), datetime(2024, 3, 31, tzinfo=dt_timezone.utc)]
+        for project, created in zip(Project.objects.order_by('id'), dates):
+            Project.objects.filter(pk=project.pk).update(created_at=created)
+
+        probed = DateProbeQuerySet(Project)
+        for kind in ('year', 'month', 'day'):
+            self.assertEqual(list(probed.datetimes('created_at', kind)), list(Project.objects.datetimes('created_at', kind)))
+        bounds = {'first': Min('created_at'), 'last': Max('created_at')}
+        self.assertEqual(probed.aggregate(**bounds), Project.objects.aggregate(**bounds))
+        self.assertIn('project_created_idx', probed.filter(created_at__gte=dates[1]).explain())
+
+        resp = self.client.get(self.url, {'created_at__year': 2024, 'created_at__month': 3})
+        self.assertEqual(len(resp.context['cl'].result_list), 2)
+
+    def test_owner_widget_does_not_load_users(self):
+        self.add_projects(1)
+        url = reverse('admin:project_manager_project_change', args=[Project.objects.get().pk])
+        self.client.get(url)
+        few = self.count_queries(url)
+        self.add_projects(30, start=1)
+        self.assertEqual(self.count_queries(url), few)
+
+
+#Test clés d'idempotence
+class IdempotencyKeyTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='idem', email='idem@example.com', password='pass12345')
+        self.other = User.objects.create_user(username='idem2', email='idem2@example.com', password='pass12345')
+        self.url = reverse('project-list')
+        self.login(self.owner)
+
+    def login(self, user):
+        self.authorization = f'Bearer {AccessToken.for_user(user)}'
+        self.client.credentials(HTTP_AUTHORIZATION=self.authorization)
+
+    def post(self, data, key='cle-1'):
+        return self.client.post(self.url, data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_duplicate_is_replayed_without_writes(self):
+        first = self.post({'title': 'Idempotent', 'description': 'd'})
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('Idempotent-Replayed', first)
+
+        with self.assertNumQueries(1):  # Authentification seulement
+            second = self.post({'title': 'Idempotent', 'description': 'd'})
+        info(f"Rejeu → status={second.status_code}, body={second.content}")
+        if second.status_code == 201 and second.content == first.content:
+            ok("Première réponse rejouée à l'identique, sans écriture")
+        else:
+            fail("Rejeu incorrect", second.content)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Project.objects.count(), 1)
+
+    def test_other_body_with_same_key_is_rejected(self):
+        self.post({'title': 'Idempotent', 'description': 'd'})
+        resp = self.post({'title': 'Autre projet', 'description': 'd'})
+        self.assertEqual(resp.status_code, 422)
+        self.assertEqual(Project.objects.count(), 1)
+
+    def test_key_is_scoped_to_client(self):
+        self.post({'title': 'Idempotent A', 'description': 'd'})
+        self.login(self.other)
+        resp = self.post({'title': 'Idempotent B', 'description': 'd'})
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('Idempotent-Replayed', resp)
+        self.assertEqual(Project.objects.count(), 2)
+
+    def test_retry_after_token_refresh_is_replayed(self):
+        first = self.post({'title': 'Idempotent', 'description': 'd'})
+        token = AccessToken.for_user(self.owner)
+        token['jti'] = 'jeton-rafraichi'
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        second = self.post({'title': 'Idempotent', 'description': 'd'})
+        info(f"Rejeu avec un nouveau jeton → status={second.status_code}")
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(Project.objects.count(), 1)
+
+    def test_replay_requires_valid_token_and_auth_errors_are_not_stored(self):
+        self.post({'title': 'Idempotent', 'description': 'd'})
+        expired = AccessToken.for_user(self.owner)
+        expired.set_exp(lifetime=-timedelta(seconds=1))
+        for authorization in (f'Bearer {expired}', 'Bearer invalide', None):
+            if authorization is None:
+                self.client.credentials()
+            else:
+                self.client.credentials(HTTP_AUTHORIZATION=authorization)
+            resp = self.post({'title': 'Idempotent', 'description': 'd'}, key='cle-2')
+            self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED, authorization)
+            self.assertNotIn('Idempotent-Replayed', resp)
+            resp = self.post({'title': 'Idempotent', 'description': 'd'})
+            self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED, authorization)
+
+        self.login(self.owner)
+        resp = self.post({'title': 'Autre titre', 'description': 'd'}, key='cle-2')
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('Idempotent-Replayed', resp)
+
+    def test_registration_retry_does_not_fail_on_uniqueness(self):
+        self.client.credentials()
+        url = reverse('user-register')
+        data = {'email': 'retry@example.com', 'username': 'retry', 'password': 'strongpassword123'}
+        first = self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='inscription')
+        second = self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='inscription')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(User.objects.filter(username='retry').count(), 1)
+
+    def test_server_errors_are_not_stored(self):
+        with patch.object(ProjectSerializer, 'save', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.post({'title': 'Idempotent', 'description': 'd'})
+        resp = self.post({'title': 'Idempotent', 'description': 'd'})
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('Idempotent-Replayed', resp)
+
+    def test_duplicate_waits_for_in_flight_request(self):
+        first = self.post({'title': 'Idempotent', 'description': 'd'})
+        cache_key = idempotency.cache_key(self.owner, self.url, 'cle-1')
+        record = cache.get(cache_key)
+        # Simule l'original encore en cours : verrou posé, réponse pas encore enregistrée
+        cache.delete(cache_key)
+        cache.add(f'{cache_key}:lock', record['fingerprint'])
+
+        with override_settings(IDEMPOTENCY_WAIT_SECONDS=0.2):
+            resp = self.post({'title': 'Idempotent', 'description': 'd'})
+        self.assertEqual(resp.status_code, status.HTTP_409_CONFLICT)
+
+        timer = threading.Timer(0.1, lambda: (cache.set(cache_key, record), cache.delete(f'{cache_key}:lock')))
+        timer.start()
+        resp = self.post({'title': 'Idempotent', 'description': 'd'})
+        timer.join()
+        info(f"Doublon concurrent → status={resp.status_code}")
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(resp.content, first.content)
+        self.assertEqual(Project.objects.count(), 1)
+
+
+
+#Test cache de la liste des projets
+@override_settings(LIST_CACHE_ENABLED=True)
+class ProjectListCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='cache', email='cache@example.com', password='pass12345')
+        Project.objects.bulk_create([Project(title=f'Cache {i:02d}', description='d', owner=self.owner) for i in range(7)])
+        self.url = reverse('project-list')
+
+    def key(self, params=None):
+        return list_cache.key_for(Request(APIRequestFactory().get(self.url, params)))
+
+    def test_hit_matches_uncached_response_without_queries(self):
+        params = {'ordering': 'title', 'page': 2}
+        with override_settings(LIST_CACHE_ENABLED=False):
+            expected = self.client.get(self.url, params).content
+        self.assertEqual(self.client.get(self.url, params).content, expected)
+        with self.assertNumQueries(0):
+            resp = self.client.get(self.url, params)
+        info(f"Page en cache → {resp.data['next']} / {resp.data['previous']}")
+        if resp.content == expected:
+            ok("Page servie depuis le cache, identique à la réponse non cachée")
+        else:
+            fail("Réponse cachée différente", resp.content)
+        self.assertEqual(resp.content, expected)
+
+    def test_writes_invalidate_cached_pages(self):
+        self.assertEqual(self.client.get(self.url).data['total_count'], 7)
+        self.client.force_authenticate(user=self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.url, {'title': 'Cache nouveau', 'description': 'd'}, format='json')
+        self.assertEqual(self.client.get(self.url).data['total_count'], 8)
+
+    def test_stale_page_served_while_refreshing(self):
+        self.client.get(self.url)
+        Project.objects.filter(title='Cache 00').delete()
+        list_cache.invalidate()
+        # Une autre requête recalcule la page : la version périmée est servie sans requête SQL
+        cache.add(f'{self.key()}:lock', 1)
+        with self.assertNumQueries(0):
+            stale = self.client.get(self.url)
+        self.assertEqual(stale.data['total_count'], 7)
+        cache.delete(f'{self.key()}:lock')
+        self.assertEqual(self.client.get(self.url).data['total_count'], 6)
+
+    def test_cold_miss_waits_for_in_flight_computation(self):
+        self.client.get(self.url)
+        entry = cache.get(self.key())
+        cache.delete(self.key())
+        cache.add(f'{self.key()}:lock', 1)
+        timer = threading.Timer(0.1, lambda: cache.set(self.key(), entry))
+        timer.start()
+        with self.assertNumQueries(0):
+            resp = self.client.get(self.url)
+        timer.join()
+        self.assertEqual(resp.data['total_count'], 7)
+
+    def test_warm_cache_command(self):
+        with self.assertRaises(CommandError):
+            call_command('warm_cache', stdout=StringIO())  # LocMemCache : propre au processus de la commande
+        out = StringIO()
+        with patch.object(list_cache, 'is_shared', return_value=True):
+            call_command('warm_cache', stdout=out)
+        info(out.getvalue().strip())
+        self.assertIn('pages en cache', out.getvalue())
+        for params in ({}, {'page': 3}, {'ordering': 'title', 'page': 2}):
+            with self.assertNumQueries(0):
+                self.client.get(self.url, params)
+        self.assertIsNone(self.key({'page': settings.LIST_CACHE_MAX_PAGE + 1}))
+
+
+#Test filtres de la liste des projets
+class ProjectFilterSetTests(APITestCase):
+    databases = {'default', 'shard_1'}
+
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='pass12345')
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com', password='pass12345')
+        self.carol = User.objects.create_user(username='carol', email='carol@example.com', password='pass12345')
+        Project.objects.bulk_create([
+            Project(title='Alpha One', owner=self.alice),
+            Project(title='alpine Two', owner=self.alice),
+            Project(title='Beta Three', owner=self.bob),
+            Project(title='Gamma Four', owner=self.carol),
+        ])
+        Project.objects.filter(title='Alpha One').update(created_at=datetime(2024, 1, 10, tzinfo=dt_timezone.utc))
+        Project.objects.filter(title='Beta Three').update(created_at=datetime(2024, 2, 10, tzinfo=dt_timezone.utc))
+        self.url = reverse('project-list')
+
+    def titles(self, params):
+        resp = self.client.get(self.url, {**params, 'page_size': 50})
+        self.assertEqual(resp.status_code, 200, resp.data)
+        return sorted(p['title'] for p in resp.data['results'])
+
+    def test_filters(self):
+        cases = [
+            ({'owner': self.alice.id}, ['Alpha One', 'alpine Two']),
+            ({'owner__in': f'{self.bob.id},{self.carol.id}'}, ['Beta Three', 'Gamma Four']),
+            ({'owner__username': 'bob'}, ['Beta Three']),
+            ({'created_at__gte': '2024-01-01T00:00:00Z', 'created_at__lt': '2024-02-01T00:00:00Z'}, ['Alpha One']),
+            ({'title__istartswith': 'ALP'}, ['Alpha One', 'alpine Two']),
+            ({'title': 'ta Th'}, ['Beta Three']),
+        ]
+        for params, expected in cases:
+            titles = self.titles(params)
+            info(f"GET {self.url} {params} → {titles}")
+            self.assertEqual(titles, expected)
+
+    def test_invalid_owner_is_rejected(self):
+        resp = self.client.get(self.url, {'owner': 'abc'})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('owner', resp.data)
+        # Au-delà d'un entier 64 bits : 400, pas OverflowError
+        for name, value in (('owner', str(2**63)), ('owner__in', f'{self.alice.id},99999999999999999999')):
+            resp = self.client.get(self.url, {name: value})
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST, name)
+            self.assertIn(name, resp.data)
+        resp = self.client.get(self.url, {'owner': str(2**63 - 1)})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+
+    def test_owner_id_is_not_searched_as_text(self):
+        self.assertEqual(self.titles({'search': str(self.alice.id)}), [])
+
+    def test_filters_use_indexes(self):
+        cases = [
+            ({'owner': self.alice.id}, 'project_manager_project_owner_id'),
+            ({'owner__in': f'{self.alice.id},{self.bob.id}'}, 'project_manager_project_owner_id'),
+            ({'owner__username': 'bob'}, 'sqlite_autoindex_project_manager_user'),
+            ({'created_at__gte': '2024-01-01T00:00:00Z', 'created_at__lt': '2024-02-01T00:00:00Z'}, 'project_created_idx'),
+            ({'title__istartswith': 'alp'}, 'project_title_lower_idx'),
+        ]
+        for params, index in cases:
+            plan = ProjectFilter(params, queryset=Project.objects.alive()).qs.explain()
+            info(f"{params} : {plan}")
+            if 'SCAN project_manager_project' in plan or index not in plan:
+                fail(f"Filtre {params} non servi par {index}", plan)
+            else:
+                ok(f"{params} servi par {index}")
+            self.assertIn(index, plan)
+            self.assertNotIn('SCAN project_manager_project', plan)
+
+    @override_settings(PROJECT_SHARD_COUNT=2, QUERY_BUDGET_ENFORCE=False, QUERY_BUDGET_SAMPLE_RATE=0)
+    def test_owner_filter_reads_a_single_shard(self):
+        owner = User.objects.create_user(username='dave', email='dave@example.com', password='pass12345')
+        Project.objects.create(title='Sharded dave', owner=owner)
+        alias = sharding.shard_for_owner(owner.id)
+        other = connections['shard_1' if alias == 'default' else 'default']
+        for params in ({'owner': owner.id}, {'owner__username': 'dave'}):
+            with CaptureQueriesContext(other) as queries:
+                titles = self.titles(params)
+            self.assertEqual(titles, ['Sharded dave'])
+            self.assertEqual([q['sql'] for q in queries if 'project_manager_project' in q['sql']], [])
+
+
+#Test lecture groupée de projets par id
+class ProjectBatchGetTests(APITestCase):
+    databases = {'default', 'shard_1'}
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username='batch', email='batch@example.com', password='pass12345')
+        Project.objects.bulk_create([Project(title=f'Batch {i}', owner=self.owner) for i in range(5)])
+        self.ids = list(Project.objects.order_by('id').values_list('id', flat=True))
+        self.url = reverse('project-batch-get')
+
+    def test_results_follow_requested_order_and_missing_are_reported(self):
+        requested = [self.ids[3], 999999, self.ids[0], self.ids[3], self.ids[4]]
+        with self.assertNumQueries(1):
+            resp = self.client.post(self.url, {'ids': requested}, format='json')
+        info(f"POST {self.url} {requested} → {resp.data}")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([p['id'] for p in resp.data['results']], [self.ids[3], self.ids[0], self.ids[4]])
+        self.assertEqual(resp.data['missing'], [999999])
+        detail = self.client.get(reverse('project-detail', args=[self.ids[0]]))
+        self.assertEqual(resp.data['results'][1], detail.data)
+
+    def test_projects_of_deleted_owner_are_missing(self):
+        User.objects.filter(pk=self.owner.pk).update(deleted_at=timezone.now())
+        resp = self.client.post(self.url, {'ids': self.ids[:2]}, format='json')
+        self.assertEqual(resp.data['results'], [])
+        self.assertEqual(resp.data['missing'], self.ids[:2])
+
+    @override_settings(PROJECT_BATCH_GET_MAX_IDS=3)
+    def test_invalid_requests(self):
+        for payload in ({'ids': [1, 2, 3, 4]}, {'ids': []}, {'ids': ['a']}, {'ids': [2**63]}, {'ids': [10**23]}, {}):
+            resp = self.client.post(self.url, payload, format='json')
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST, payload)
+            self.assertIn('ids', resp.data)
+        resp = self.client.post(self.url, {'ids': [2**63 - 1]}, format='json')
+        self.assertEqual(resp.data['missing'], [2**63 - 1])
+
+    @override_settings(PROJECT_SHARD_COUNT=2, QUERY_BUDGET_ENFORCE=False, QUERY_BUDGET_SAMPLE_RATE=0)
+    def test_one_query_per_shard(self):
+        owners = [User.objects.create_user(username=f'sharded{i}', email=f's{i}@example.com', password='pass12345')
+                  for i in range(6)]
+        projects = [Project.objects.create(title=f'Sharded {i}', owner=owner) for i, owner in enumerate(owners)]
+        self.assertEqual({sharding.shard_for_pk(p.pk) for p in projects}, {'default', 'shard_1'})
+        requested = [p.pk for p in reversed(projects)]
+        with CaptureQueriesContext(connections['default']) as default, \
+                CaptureQueriesContext(connections['shard_1']) as shard:
+            resp = self.client.post(self.url, {'ids': requested}, format='json')
+        self.assertEqual([p['id'] for p in resp.data['results']], requested)
+        for queries in (default, shard):
+            self.assertEqual(len([q for q in queries if 'project_manager_project' in q['sql']]), 1)
+
+
+#Test cache des objets (détail d'un projet, profil, batch-get)
+@override_settings(OBJECT_CACHE_ENABLED=True)
+class ObjectCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        project_cache.local.clear()
+        user_cache.local.clear()
+        self.owner = User.objects.create_user(username='objcache', email='objcache@example.com', password='pass12345')
+        self.project = Project.objects.create(title='Objet en cache', description='d', owner=self.owner)
+        self.url = reverse('project-detail', args=[self.project.pk])
+
+    def test_detail_hit_skips_query_and_matches_uncached_response(self):
+        with override_settings(OBJECT_CACHE_ENABLED=False):
+            expected = self.client.get(self.url).content
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            resp = self.client.get(self.url)
+        if resp.content == expected:
+            ok("Projet servi depuis le cache sans requête SQL")
+        else:
+            fail("Réponse cachée différente", resp.content)
+        self.assertEqual(resp.content, expected)
+        self.assertEqual(self.client.get(reverse('project-detail', args=[999999])).status_code, 404)
+
+    def test_writes_invalidate_cached_project(self):
+        self.client.get(self.url)
+        self.client.force_authenticate(user=self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(self.url, {'title': 'Objet modifié'}, format='json')
+        self.assertEqual(self.client.get(self.url).data['title'], 'Objet modifié')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(self.url)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_read_started_before_write_is_not_served(self):
+        def load_then_write():
+            # Lecture de la base, puis écriture concurrente validée avant l'enregistrement
+            data = {'title': 'ancien'}
+            project_cache.invalidate(self.project.pk)
+            return data
+        self.assertEqual(project_cache.get(self.project.pk, load_then_write)['title'], 'ancien')
+        fresh = project_cache.get(self.project.pk, lambda: {'title': 'nouveau'})
+        self.assertEqual(fresh['title'], 'nouveau')
+
+    def test_projects_of_deleted_owner_are_no_longer_served(self):
+        self.client.get(self.url)
+        self.client.force_authenticate(user=self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('user-detail', args=[self.owner.username]))
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_batch_get_reads_only_missing_projects(self):
+        others = [Project.objects.create(title=f'Objet {i}', owner=self.owner) for i in range(3)]
+        ids = [self.project.pk] + [p.pk for p in others]
+        self.client.get(self.url)
+        batch_url = reverse('project-batch-get')
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.post(batch_url, {'ids': ids + [999999]}, format='json')
+        info(f"batch-get, 1 projet en cache sur 4 → {len(queries)} requête(s) SQL")
+        self.assertEqual([p['id'] for p in resp.data['results']], ids)
+        self.assertEqual(resp.data['missing'], [999999])
+        self.assertEqual(len(queries), 1)
+        missing = ', '.join(str(pk) for pk in [p.pk for p in others] + [999999])
+        self.assertIn(f'"id" IN ({missing})', queries[0]['sql'])  # Le projet en cache n'est pas relu
+        with self.assertNumQueries(0):
+            cached = self.client.post(batch_url, {'ids': ids}, format='json')
+        self.assertEqual(cached.data['results'], resp.data['results'])
+        self.assertEqual(cached.data['results'][0], self.client.get(self.url).data)
+
+    @override_settings(OBJECT_CACHE_L1_MAX_ENTRIES=2, OBJECT_CACHE_L1_TTL_SECONDS=60)
+    def test_local_lru_in_front_of_shared_cache(self):
+        loads = []
+        def load(pk):
+            return lambda: loads.append(pk) or {'id': pk}
+        for pk in (1, 2, 3):
+            project_cache.get(pk, load(pk))
+        cache.clear()  # Le cache partagé est vide : seul le L1 répond
+        for pk in (2, 3):
+            project_cache.get(pk, load(pk))
+        project_cache.get(1, load(1))  # Évincé du L1 (LRU de 2 entrées)
+        self.assertEqual(loads, [1, 2, 3, 1])
+        project_cache.invalidate(3)
+        project_cache.get(3, load(3))
+        self.assertEqual(loads, [1, 2, 3, 1, 3])
+
+    def test_user_detail_cached_and_invalidated(self):
+        token = AccessToken.for_user(self.owner)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        url = reverse('user-detail', args=[self.owner.username])
+        self.client.get(url)
+        with patch.object(UserSerializer, 'to_representation') as to_representation:
+            resp = self.client.get(url)
+        to_representation.assert_not_called()
+        self.assertEqual(resp.data['email'], 'objcache@example.com')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(url, {'email': 'nouveau@example.com'}, format='json')
+        self.assertEqual(self.client.get(url).data['email'], 'nouveau@example.com')
+
+
+#Test documents composés (?include=owner)
+class ProjectIncludeOwnerTests(APITestCase):
+    databases = {'default', 'shard_1'}
+
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='pass12345')
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com', password='pass12345')
+        Project.objects.bulk_create(
+            [Project(title=f'Alice {i}', owner=self.alice) for i in range(4)]
+            + [Project(title=f'Bobby {i}', owner=self.bob) for i in range(3)]
+        )
+        self.url = reverse('project-list')
+
+    def test_list_embeds_each_owner_once_with_one_query(self):
+        with CaptureQueriesContext(connection) as plain:
+            self.client.get(self.url, {'page_size': 50})
+        with CaptureQueriesContext(connection) as compound:
+            resp = self.client.get(self.url, {'include': 'owner', 'page_size': 50})
+        info(f"GET {self.url}?include=owner → included = {resp.data['included']}")
+        self.assertEqual(len(compound), len(plain) + 1)
+        owners = resp.data['included']['owners']
+        self.assertEqual(set(owners), {str(self.alice.pk), str(self.bob.pk)})
+        self.assertEqual(owners[str(self.bob.pk)], {'id': self.bob.pk, 'username': 'bob'})
+        self.assertEqual(len(resp.data['results']), 7)
+        self.assertNotIn('included', self.client.get(self.url).data)
+
+    def test_email_only_for_the_owner_and_staff(self):
+        self.client.force_authenticate(user=self.bob)
+        resp = self.client.get(self.url, {'include': 'owner', 'page_size': 50})
+        info(f"GET {self.url}?include=owner par bob → {resp.data['included']['owners']}")
+        self.assertEqual(resp.data['included']['owners'], {
+            str(self.alice.pk): {'id': self.alice.pk, 'username': 'alice'},
+            str(self.bob.pk): {'id': self.bob.pk, 'username': 'bob', 'email': 'bob@example.com'},
+        })
+
+        staff = User.objects.create_user(username='staff', email='staff@example.com', password='pass12345', is_staff=True)
+        self.client.force_authenticate(user=staff)
+        resp = self.client.get(self.url, {'include': 'owner', 'owner': self.alice.pk})
+        self.assertEqual(resp.data['included']['owners'][str(self.alice.pk)]['email'], 'alice@example.com')
+
+    def test_detail_and_batch_get(self):
+        project = Project.objects.get(title='Alice 0')
+        detail = self.client.get(reverse('project-detail', args=[project.pk]), {'include': 'owner'})
+        self.assertEqual(detail.data['title'], 'Alice 0')
+        self.assertEqual(list(detail.data['included']['owners']), [str(self.alice.pk)])
+        ids = list(Project.objects.order_by('id').values_list('id', flat=True))
+        with self.assertNumQueries(2):
+            batch = self.client.post(
+                f"{reverse('project-batch-get')}?include=owner", {'ids': ids + [999999]}, format='json'
+            )
+        self.assertEqual(len(batch.data['included']['owners']), 2)
+        self.assertEqual(batch.data['missing'], [999999])
+
+    def test_invalid_include_is_rejected(self):
+        for params in ({'include': 'owner,tags'}, {'include': 'owner', 'stream': 1}):
+            resp = self.client.get(self.url, params)
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST, params)
+            self.assertIn('include', resp.data)
+
+    @override_settings(PROJECT_SHARD_COUNT=2, QUERY_BUDGET_ENFORCE=False, QUERY_BUDGET_SAMPLE_RATE=0)
+    def test_owners_read_from_default_database_when_sharded(self):
+        owners = [User.objects.create_user(username=f'sharded{i}', email=f's{i}@example.com', password='pass12345')
+                  for i in range(4)]
+        for i, owner in enumerate(owners):
+            Project.objects.create(title=f'Sharded {i}', owner=owner)
+        resp = self.client.get(self.url, {'include': 'owner', 'title__istartswith': 'sharded', 'page_size': 50})
+        self.assertEqual(len(resp.data['results']), 4)
+        self.assertEqual(set(resp.data['included']['owners']), {str(owner.pk) for owner in owners})
+
+
+#Test métriques Prometheus (/metrics)
+class MetricsTests(APITestCase):
+    def setUp(self):
+        metrics.reset()
+        self.owner = User.objects.create_user(username='metrics', email='metrics@example.com', password='pass12345')
+        self.project = Project.objects.create(title='Projet mesuré', owner=self.owner)
+
+    def scrape(self):
+        resp = self.client.get('/metrics')
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return resp.content.decode()
+
+    def test_requests_latency_and_queries_per_view(self):
+        for _ in range(2):
+            self.client.get(reverse('project-list'))
+        self.client.get(reverse('project-detail', args=[999999]))
+        text = self.scrape()
+        info("\n".join(line for line in text.splitlines() if 'project-list' in line)[:600])
+        self.assertIn('exam_http_requests_total{view="project-list",method="GET",status="200"} 2', text)
+        self.assertIn('exam_http_requests_total{view="project-detail",method="GET",status="404"} 1', text)
+        self.assertIn('exam_http_request_duration_seconds_bucket{view="project-list",le="+Inf"} 2', text)
+        self.assertIn('exam_http_request_duration_seconds_count{view="project-list"} 2', text)
+        self.assertRegex(text, r'exam_db_queries_total\{view="project-list"\} [1-9]')
+        self.assertRegex(text, r'exam_db_query_duration_seconds_total\{view="project-list"\} \d')
+        self.assertRegex(text, rf'exam_process_resident_memory_bytes\{{pid="{os.getpid()}"\}} [1-9]')
+        for name, (kind, _) in metrics.METRICS.items():
+            self.assertIn(f'# TYPE {name} {kind}', text)
+
+    @override_settings(OBJECT_CACHE_ENABLED=True)
+    def test_cache_hit_ratio(self):
+        cache.clear()
+        url = reverse('project-detail', args=[self.project.pk])
+        for _ in range(4):
+            self.client.get(url)
+        text = self.scrape()
+        self.assertIn('exam_cache_requests_total{cache="project",result="hit"} 3', text)
+        self.assertIn('exam_cache_requests_total{cache="project",result="miss"} 1', text)
+        self.assertIn('exam_cache_hit_ratio{cache="project"} 0.75', text)
+
+    def test_counters_are_per_thread_and_summed(self):
+        def work():
+            for _ in range(1000):
+                metrics.inc('exam_db_queries_total', (('view', 'threads'),))
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(metrics.snapshot()['counters'][('exam_db_queries_total', (('view', 'threads'),))], 8000)
+
+    def test_counters_of_finished_threads_are_folded(self):
+        def work():
+            metrics.inc('exam_db_queries_total', (('view', 'churn'),))
+        for _ in range(10):
+            threads = [threading.Thread(target=work) for _ in range(100)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        # Un thread par connexion : les compteurs des threads terminés ne s'accumulent pas
+        self.assertLessEqual(len(metrics._registry['stores']), 2)
+        self.assertEqual(metrics.snapshot()['counters'][('exam_db_queries_total', (('view', 'churn'),))], 1000)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_access_restricted_to_internal_addresses_or_token(self):
+        outside = {'REMOTE_ADDR': '203.0.113.7'}
+        self.assertEqual(self.client.get('/metrics', **outside).status_code, 403)
+        resp = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong', **outside)
+        self.assertEqual(resp.status_code, 403)
+        resp = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret', **outside)
+        self.assertEqual(resp.status_code, 200)
+        with override_settings(METRICS_TOKEN=None):
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer ', **outside).status_code, 403)
+
+    def test_workers_aggregated_through_metrics_dir(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            self.client.get(reverse('project-list'))
+            metrics.flush(force=True)
+            pid, started = metrics._identity()
+            self.assertTrue(os.path.exists(os.path.join(directory, f'metrics-{pid}-{started}.json')))
+            # Instantané d'un autre worker, arrêté depuis : ses compteurs restent, pas sa mémoire
+            self.write_worker(directory, 999999999, 1, 5)
+            text = self.scrape()
+        self.assertIn('exam_http_requests_total{view="project-list",method="GET",status="200"} 6', text)
+        self.assertIn('exam_http_request_duration_seconds_count{view="project-list"} 6', text)
+        self.assertNotIn('pid="999999999"', text)
+
+    def write_worker(self, directory, pid, started, requests):
+        labels = [['view', 'project-list'], ['method', 'GET'], ['status', '200']]
+        with open(os.path.join(directory, f'metrics-{pid}-{started}.json'), 'w') as file:
+            json.dump({
+                'pid': pid, 'started': started, 'memory': 123,
+                'counters': [['exam_http_requests_total', labels, requests]],
+                'histograms': [['exam_http_request_duration_seconds', [['view', 'project-list']],
+                                [requests] + [0] * len(metrics.BUCKETS) + [0.01]]],
+            }, file)
+
+    def test_dead_workers_folded_into_retired_file(self):
+        info("Fichiers des workers arrêtés repliés ; un pid réutilisé ne les écrase pas")
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            # Deux workers arrêtés, dont l'un avait le pid de ce processus
+            pid, started = metrics._identity()
+            self.write_worker(directory, 999999999, 1, 5)
+            self.write_worker(directory, pid, started + 1, 7)
+            text = self.scrape()
+            self.assertIn('exam_http_requests_total{view="project-list",method="GET",status="200"} 12', text)
+            files = sorted(n for n in os.listdir(directory) if n.endswith('.json'))
+            self.assertEqual(files, [f'metrics-{pid}-{started}.json', 'metrics-retired.json'])
+            self.assertNotIn(f'pid="{pid}"}} 123', text)
+            # Totaux stables d'une exposition à l'autre, repliés une seule fois
+            self.client.get(reverse('project-list'))
+            metrics.flush(force=True)
+            text = self.scrape()
+            self.assertIn('exam_http_requests_total{view="project-list",method="GET",status="200"} 13', text)
+            self.assertIn('exam_http_request_duration_seconds_count{view="project-list"} 13', text)
+        ok("Compteurs conservés, fichiers supprimés")
@@ -0,0 +1,132 @@
+"""
+Registre global des titres de projets (``ProjectTitle``).
+
+Avec plusieurs shards, la contrainte ``unique`` de chaque base ne suffit
+plus : le titre est réservé sur le shard de son hash, alors que le projet est
+écrit sur le shard de son propriétaire. Les deux bases ne partagent pas de
+transaction, d'où le cycle de vie d'une réservation :
+
+- ``reserve`` crée la ligne *en attente* (``reserved_at`` renseigné), validée
+  tout de suite dans sa propre transaction ;
+- ``confirm`` la confirme (``reserved_at`` à ``NULL``) au commit de la
+  transaction du projet, ``release`` supprime l'ancien titre ;
+- si cette transaction est annulée, la ligne reste en attente. Un titre
+  qu'aucun projet ne porte est repris une fois la réservation plus vieille
+  que ``PROJECT_TITLE_RESERVATION_TIMEOUT`` secondes, ou tout de suite si
+  elle était confirmée (libération perdue).
+
+Le registre n'est tenu à jour qu'avec plusieurs shards : ``rebuild`` le
+recalcule depuis les projets, à lancer à chaque changement de
+``PROJECT_SHARD_COUNT``.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import sharding
+from .models import Project, ProjectTitle
+
+
+def _registry(title):
+    return ProjectTitle.objects.using(sharding.shard_for_title(title)).filter(title=title)
+
+
+def _cutoff():
+    return timezone.now() - timedelta(seconds=settings.PROJECT_TITLE_RESERVATION_TIMEOUT)
+
+
+def _held(title):
+    """
+    Un projet porte-t-il ce titre, sur l'un des shards ?
+    """
+    return any(query.exists() for query in sharding.each_shard(Project.objects.filter(title=title)))
+
+
+def is_taken(title):
+    row = _registry(title).values('reserved_at').first()
+    if row is None:
+        return False
+    if row['reserved_at'] is not None and row['reserved_at'] > _cutoff():
+        # Écriture peut-être en cours sur un autre shard
+        return True
+    return _held(title)
+
+
+def reserve(title):
+    """
+    Réserve le titre (en attente) ; ``IntegrityError`` s'il est déjà pris.
+    """
+    alias = sharding.shard_for_title(title)
+    now = timezone.now()
+    try:
+        with transaction.atomic(using=alias):
+            ProjectTitle.objects.using(alias).create(title=title, reserved_at=now)
+        return
+    except IntegrityError:
+        pass
+    # Réservation orpheline : reprise si aucun projet ne porte le titre
+    if not _held(title):
+        stale = _registry(title).filter(Q(reserved_at__isnull=True) | Q(reserved_at__lte=_cutoff()))
+        if stale.update(reserved_at=now):
+            return
+    raise IntegrityError(f"Le titre {title!r} est déjà utilisé.")
+
+
+def confirm(title):
+    _registry(title).update(reserved_at=None)
+
+
+def release(title):
+    _registry(title).delete()
+
+
+def recount():
+    """
+    Titres portés par les projets de tous les shards : ``{titre: nombre de projets}``.
+    """
+    titles = Project.objects.values_list('title', flat=True).order_by()
+    return Counter(
+        title for query in sharding.each_shard(titles) for title in query.iterator(chunk_size=2000)
+    )
+
+
+def rebuild():
+    """
+    Recalcule le registre, shard par shard, depuis les titres des projets.
+    Les réservations en attente récentes (écritures en cours) sont gardées.
+    """
+    by_shard = {alias: [] for alias in sharding.shard_aliases()}
+    for title in recount():
+        by_shard[sharding.shard_for_title(title)].append(ProjectTitle(title=title))
+    for alias, registry in by_shard.items():
+        with transaction.atomic(using=alias):
+            ProjectTitle.objects.using(alias).exclude(reserved_at__gt=_cutoff()).delete()
+            ProjectTitle.objects.using(alias).bulk_create(registry, batch_size=500, ignore_conflicts=True)
+
+
+def check_consistency():
+    """
+    Compare le registre aux projets. Retourne la liste des écarts
+    ``(titre, problème)`` : ``manquant`` (titre porté mais non réservé),
+    ``orphelin`` (réservé sans projet, hors réservations en cours),
+    ``mal placé`` (ligne sur un autre shard que celui du titre) ou
+    ``doublon`` (titre porté par plusieurs projets, à renommer à la main).
+    """
+    held = recount()
+    cutoff = _cutoff()
+    stored, diffs = set(), []
+    for alias in sharding.shard_aliases():
+        for title, reserved_at in ProjectTitle.objects.using(alias).values_list('title', 'reserved_at'):
+            if sharding.shard_for_title(title) != alias:
+                diffs.append((title, 'mal placé'))
+            elif title in held or (reserved_at is not None and reserved_at > cutoff):
+                stored.add(title)
+            else:
+                diffs.append((title, 'orphelin'))
+    diffs += [(title, 'manquant') for title in held if title not in stored]
+    diffs += [(title, 'doublon') for title, n in held.items() if n > 1]
+    return sorted(diffs)
@@ -6,7 +6,13 @@ urlpatterns = [
     path('users/register/', views.RegisterUser.as_view(), name='user-register'),
     path('users/login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('users/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('users/logout/', views.Logout.as_view(), name='user-logout'),
     path('users/<str:username>/', views.UserDetail.as_view(), name='user-detail'),
     path('projects/', views.ProjectListCreate.as_view(), name='project-list'),
+    path('projects/autocomplete/', views.ProjectAutocomplete.as_view(), name='project-autocomplete'),
+    path('projects/stats/', views.ProjectStats.as_view(), name='project-stats'),
+    path('projects/events/', views.project_events, name='project-events'),
+    path('projects/changes/', views.ProjectChanges.as_view(), name='project-changes'),
+    path('projects/batch-get/', views.ProjectBatchGet.as_view(), name='project-batch-get'),
     path('projects/<int:id>/', views.ProjectDetail.as_view(), name='project-detail'),   
 ]
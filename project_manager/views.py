@@ -1,36 +1,87 @@
 from rest_framework import generics, permissions, filters, status
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
 
 from .models import User, Project
-from .serializers import UserSerializer, ProjectSerializer
+from .serializers import UserSerializer, ProjectSerializer, LogoutSerializer, ProjectBatchGetSerializer
 from .permissions import IsOwnerOrReadOnly
+from .filters import ProjectFilter
 from .pagination import CustomPagination
+from .sync import get_changes, InvalidSyncToken
+from .events import broadcaster, stream, TooManySubscribers
+from .purge import soft_delete_user
+from .autocomplete import title_index
+from . import stats
+from .revocation import revocation_list
+from . import list_cache, metrics, sharding
+from .object_cache import project_cache, user_cache
+from .idempotency import IdempotentMixin
+from .includes import IncludeMixin, INCLUDE_PARAM
 
-class RegisterUser(generics.CreateAPIView):
+# En-tête des POST rejouables
+idempotency_param = openapi.Parameter(
+    'Idempotency-Key', openapi.IN_HEADER,
+    description="Clé unique par opération : un POST rejoué avec la même clé renvoie la première réponse",
+    type=openapi.TYPE_STRING
+)
+
+class RegisterUser(IdempotentMixin, generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.AllowAny]
+    query_budget = {'POST': 3}
 
     @swagger_auto_schema(
         operation_description="Créer un utilisateur",
         request_body=UserSerializer,
+        manual_parameters=[idempotency_param],
         responses={201: UserSerializer}
     )
     def post(self, request, *args, **kwargs):
         return super().post(request, *args, **kwargs)
 
+class Logout(generics.GenericAPIView):
+    """
+    Révoque le jeton d'accès courant et, s'il est fourni, le refresh token.
+    """
+    serializer_class = LogoutSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    query_budget = {'POST': 5}
+
+    @swagger_auto_schema(
+        operation_description="Se déconnecter : révoque les jetons JWT",
+        request_body=LogoutSerializer,
+        responses={204: 'No Content'}
+    )
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        revocation_list.revoke(request.auth)
+        if 'refresh' in serializer.validated_data:
+            revocation_list.revoke(serializer.validated_data['refresh'])
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 class UserDetail(generics.RetrieveUpdateDestroyAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     lookup_field = 'username'
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = {'GET': 1, 'PUT': 4, 'PATCH': 4, 'DELETE': 6}
 
     def get_object(self):
         return self.request.user
+
+    def retrieve(self, request, *args, **kwargs):
+        # L'utilisateur est déjà chargé par l'authentification : le cache évite le sérialiseur
+        return Response(user_cache.get(request.user.pk, lambda: self.get_serializer(request.user).data))
+
     @swagger_auto_schema(
         operation_description="Récupérer le profil de l’utilisateur courant",
         responses={200: UserSerializer}
@@ -55,12 +106,22 @@ class UserDetail(generics.RetrieveUpdateDestroyAPIView):
         return super().patch(request, *args, **kwargs)
 
     @swagger_auto_schema(
-        operation_description="Supprimer le profil de l’utilisateur courant",
+        operation_description="Supprimer le profil de l’utilisateur courant (projets purgés en arrière-plan)",
         responses={204: 'No Content'}
     )
     def delete(self, request, *args, **kwargs):
         return super().delete(request, *args, **kwargs)
 
+    def perform_destroy(self, instance):
+        soft_delete_user(instance)
+
+# Documents composés (liste, détail, batch-get)
+include_param = openapi.Parameter(
+    INCLUDE_PARAM, openapi.IN_QUERY,
+    description="owner : ajoute les propriétaires dans included.owners (email : le sien seulement)",
+    type=openapi.TYPE_STRING
+)
+
 # Paramètres de requête documentés pour la liste
 title_param = openapi.Parameter(
     'title', openapi.IN_QUERY, description="Filtrer par sous-chaîne du titre",
@@ -70,13 +131,18 @@ search_param = openapi.Parameter(
     'search', openapi.IN_QUERY, description="Recherche plein‑texte (SearchFilter) sur title",
     type=openapi.TYPE_STRING
 )
+stream_param = openapi.Parameter(
+    'stream', openapi.IN_QUERY,
+    description="1 : réponse streamée, autorise page_size jusqu'à 10000",
+    type=openapi.TYPE_BOOLEAN
+)
 ordering_param = openapi.Parameter(
     'ordering', openapi.IN_QUERY,
     description="Tri: 'title' ou 'created_at' (préfixer par '-' pour décroissant)",
     type=openapi.TYPE_STRING
 )
 
-class ProjectListCreate(generics.ListCreateAPIView):
+class ProjectListCreate(IdempotentMixin, IncludeMixin, generics.ListCreateAPIView):
     """
     Vue combinée pour lister (avec pagination, tri et filtre par titre)
     et créer des projets.
@@ -84,23 +150,49 @@ class ProjectListCreate(generics.ListCreateAPIView):
     serializer_class = ProjectSerializer
     pagination_class = CustomPagination
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    query_budget = {'GET': 4, 'POST': 5}
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filterset_class = ProjectFilter
     ordering_fields = ['title', 'created_at']
-    search_fields = ['owner__id'  , 'title']
+    search_fields = ['title']
     
     def get_queryset(self):
-        queryset = Project.objects.all()
-        title_query = self.request.query_params.get('title')
-        if title_query:
-            queryset = queryset.filter(title__icontains=title_query)
-        return queryset
+        return Project.objects.alive()
+
+    def filter_queryset(self, queryset):
+        # Sans filtre par propriétaire (owner, owner__username), la liste est lue sur tous les shards
+        return sharding.fan_out(super().filter_queryset(queryset))
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
+
+    def list(self, request, *args, **kwargs):
+        if self.paginator.wants_stream(request):
+            if self.includes:
+                raise ValidationError({INCLUDE_PARAM: ["Indisponible avec une réponse streamée."]})
+            queryset = self.filter_queryset(self.get_queryset())
+            return self.paginator.get_streaming_response(
+                queryset, request, self.get_serializer().to_representation
+            )
+        key = list_cache.key_for(request, self.paginator.page_query_param)
+        if key is None:
+            response = super().list(request, *args, **kwargs)
+        else:
+            data = list_cache.get_or_compute(key, self.get_page_data)
+            response = self.paginator.get_cached_response(data, request)
+        self.add_included(response.data, response.data['results'])
+        return response
+
+    def get_page_data(self):
+        """
+        Page de la liste sans ses liens, telle que mise en cache.
+        """
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        return self.paginator.get_page_data(self.get_serializer(page, many=True).data)
         
     @swagger_auto_schema(
         operation_description="Liste paginée des projets",
-        manual_parameters=[title_param, search_param, ordering_param],
+        manual_parameters=[title_param, search_param, ordering_param, stream_param, include_param],
         responses={200: ProjectSerializer(many=True)}
     )
     def get(self, request, *args, **kwargs):
@@ -109,18 +201,34 @@ class ProjectListCreate(generics.ListCreateAPIView):
     @swagger_auto_schema(
         operation_description="Créer un projet",
         request_body=ProjectSerializer,
+        manual_parameters=[idempotency_param],
         responses={201: ProjectSerializer}
     )
     def post(self, request, *args, **kwargs):
         return super().post(request, *args, **kwargs)
 
-class ProjectDetail(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Project.objects.all()
+class ProjectDetail(IncludeMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = ProjectSerializer
     permission_classes = [IsOwnerOrReadOnly]
+    query_budget = {'GET': 3, 'PUT': 4, 'PATCH': 4, 'DELETE': 5}
     lookup_field = 'id'
-    
-    @swagger_auto_schema(responses={200: ProjectSerializer})
+
+    def get_queryset(self):
+        queryset = Project.objects.alive()
+        if not sharding.is_sharded():
+            return queryset
+        # L'id du projet désigne son shard
+        alias = sharding.shard_for_pk(self.kwargs.get(self.lookup_field))
+        return queryset.using(alias) if alias else queryset.none()
+
+    def retrieve(self, request, *args, **kwargs):
+        # Lecture publique (IsOwnerOrReadOnly) : un projet en cache est servi sans requête SQL
+        pk = self.kwargs[self.lookup_field]
+        data = project_cache.get(pk, lambda: self.get_serializer(self.get_object()).data)
+        # Copie : la représentation en cache est partagée entre les requêtes
+        return Response(self.add_included(dict(data), [data]))
+
+    @swagger_auto_schema(manual_parameters=[include_param], responses={200: ProjectSerializer})
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
 
@@ -136,3 +244,198 @@ class ProjectDetail(generics.RetrieveUpdateDestroyAPIView):
     def delete(self, request, *args, **kwargs):
         return super().delete(request, *args, **kwargs)
 
+
+class ProjectBatchGet(IncludeMixin, generics.GenericAPIView):
+    """
+    Plusieurs projets par id en un seul appel : lus dans le cache des objets,
+    puis une requête ``IN`` par shard concerné pour les absents, au lieu d'un
+    ``GET /api/projects/<id>/`` par projet.
+    """
+    serializer_class = ProjectBatchGetSerializer
+    # Lecture seule, publique comme le détail d'un projet
+    permission_classes = [permissions.AllowAny]
+    query_budget = {'POST': 3}
+
+    @swagger_auto_schema(
+        operation_description="Projets demandés, dans l'ordre des id ; les id inconnus sont listés dans missing",
+        request_body=ProjectBatchGetSerializer,
+        manual_parameters=[include_param],
+        responses={200: openapi.Response('results, missing', ProjectSerializer(many=True))}
+    )
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        found = project_cache.get_many(ids, self.load)
+        results = [found[pk] for pk in ids if pk in found]
+        return Response(self.add_included({
+            'results': results,
+            'missing': [pk for pk in ids if pk not in found],
+        }, results))
+
+    def load(self, ids):
+        """
+        Représentations des projets absents du cache, par id.
+        """
+        found = Project.objects.alive().in_bulk(ids)
+        # Un seul sérialiseur pour tous : l'instancier copie ses champs
+        return dict(zip(found, ProjectSerializer(list(found.values()), many=True).data))
+
+
+since_param = openapi.Parameter(
+    'since', openapi.IN_QUERY,
+    description="Jeton renvoyé par l'appel précédent (vide pour une synchro complète)",
+    type=openapi.TYPE_STRING
+)
+limit_param = openapi.Parameter(
+    'limit', openapi.IN_QUERY, description="Nombre maximum de changements (1 à 1000)",
+    type=openapi.TYPE_INTEGER
+)
+
+class ProjectChanges(generics.GenericAPIView):
+    """
+    Flux incrémental : projets créés, modifiés ou supprimés depuis un jeton.
+    """
+    serializer_class = ProjectSerializer
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    query_budget = {'GET': 3}
+    default_limit = 100
+    max_limit = 1000
+
+    def get_limit(self):
+        try:
+            limit = int(self.request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            raise ValidationError({'limit': ["Doit être un entier."]})
+        return max(1, min(limit, self.max_limit))
+
+    @swagger_auto_schema(
+        operation_description="Changements sur les projets depuis le jeton `since`",
+        manual_parameters=[since_param, limit_param],
+    )
+    def get(self, request, *args, **kwargs):
+        try:
+            changes, token, has_more = get_changes(request.query_params.get('since'), self.get_limit())
+        except InvalidSyncToken:
+            raise ValidationError({'since': ["Jeton de synchronisation invalide."]})
+
+        results = []
+        for action, obj in changes:
+            if action == 'upsert':
+                results.append({'action': action, 'id': obj.id, 'data': self.get_serializer(obj).data})
+            else:
+                results.append({'action': action, 'id': obj.project_id})
+        return Response({'changes': results, 'since': token, 'has_more': has_more})
+
+
+q_param = openapi.Parameter(
+    'q', openapi.IN_QUERY, description="Début du titre (insensible à la casse)",
+    type=openapi.TYPE_STRING
+)
+
+class ProjectAutocomplete(generics.GenericAPIView):
+    """
+    Autocomplétion des titres servie par l'index en mémoire du worker.
+    """
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    query_budget = {'GET': 2}
+    default_limit = 10
+    max_limit = 50
+
+    @swagger_auto_schema(
+        operation_description="Titres de projets commençant par `q`",
+        manual_parameters=[q_param, limit_param],
+    )
+    def get(self, request, *args, **kwargs):
+        prefix = request.query_params.get('q', '').strip()
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            raise ValidationError({'limit': ["Doit être un entier."]})
+        limit = max(1, min(limit, self.max_limit))
+        if not prefix:
+            return Response({'results': []})
+
+        title_index.ensure_fresh()
+        if title_index.complete:
+            results = title_index.search(prefix, limit)
+        else:
+            # Index tronqué par AUTOCOMPLETE_MAX_ENTRIES : la base fait foi
+            results = list(sharding.fan_out(
+                Project.objects.alive().title_startswith(prefix)
+                .order_by('title').values('id', 'title')
+            )[:limit])
+        return Response({'results': results})
+
+
+days_param = openapi.Parameter(
+    'days', openapi.IN_QUERY, description="Limiter aux N derniers jours",
+    type=openapi.TYPE_INTEGER
+)
+top_param = openapi.Parameter(
+    'top', openapi.IN_QUERY, description="Nombre de propriétaires les plus actifs (10 par défaut, 100 max)",
+    type=openapi.TYPE_INTEGER
+)
+
+class ProjectStats(generics.GenericAPIView):
+    """
+    Statistiques lues dans la table de synthèse ``ProjectDailyStat``.
+    """
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    query_budget = {'GET': 4}
+
+    def get_int_param(self, name, default, maximum):
+        try:
+            value = int(self.request.query_params.get(name, default or 0))
+        except ValueError:
+            raise ValidationError({name: ["Doit être un entier."]})
+        return max(0, min(value, maximum)) or default
+
+    @swagger_auto_schema(
+        operation_description="Projets créés par jour et propriétaires les plus actifs",
+        manual_parameters=[days_param, top_param],
+    )
+    def get(self, request, *args, **kwargs):
+        days = self.get_int_param('days', None, 3650)
+        top = self.get_int_param('top', 10, 100)
+        return Response(stats.summary(days=days, top=top))
+
+
+@require_GET
+async def project_events(request):
+    """
+    Flux Server-Sent Events des créations, modifications et suppressions
+    de projets, filtrable par propriétaire (``?owner=<id>``).
+    Nécessite un serveur ASGI (``exam.asgi:application``).
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'detail': "Le flux d'événements nécessite un serveur ASGI."}, status=501)
+
+    owner = request.GET.get('owner')
+    if owner is not None:
+        try:
+            owner = int(owner)
+        except ValueError:
+            return JsonResponse({'owner': ["Doit être un entier."]}, status=400)
+
+    try:
+        subscription = broadcaster.subscribe(owner)
+    except TooManySubscribers:
+        return JsonResponse({'detail': "Trop de connexions ouvertes, réessayez plus tard."}, status=503)
+
+    response = StreamingHttpResponse(stream(subscription), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Pas de buffering côté proxy (nginx)
+    return response
+
+
+@require_GET
+def prometheus_metrics(request):
+    """
+    Métriques de tous les workers (voir ``project_manager/metrics.py``), au
+    format texte Prometheus. Réservées au réseau interne ou aux détenteurs de
+    ``METRICS_TOKEN`` : elles décrivent le trafic de chaque vue et les workers.
+    """
+    if not metrics.is_allowed(request):
+        return JsonResponse({'detail': "Accès aux métriques refusé."}, status=403)
+    return HttpResponse(metrics.render(metrics.collect()), content_type='text/plain; version=0.0.4; charset=utf-8')